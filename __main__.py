@@ -1,16 +1,32 @@
 from dotenv import load_dotenv
+import logging
 import os
 from utils.bot import Bot
+from utils.multi_bot import MultiSymbolBot
+from utils.metrics.latency import LatencyRecorder
 
 # import necessary libraries and modules
 
 if __name__ == "__main__":
+    # logging and the .env file are set up by the entry point, importing the package does neither
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
     load_dotenv()
     api_key = os.getenv('BINANCE_API_KEY')
     api_secret = os.getenv('BINANCE_SECRET_KEY')
-    symbol = input("Enter the symbol you want to trade: ").upper() + 'USDT'
+    symbols = [symbol.strip().upper() + 'USDT' for symbol in input("Enter the symbol(s) you want to trade, comma separated: ").split(',') if symbol.strip()]
     interval = '15m'
-    bot = Bot(symbol, interval, api_key, api_secret )
+    # LATENCY_PORT serves per-stage timings at http://127.0.0.1:<port>/latency, LATENCY_DUMP logs them every N seconds
+    latency = None
+    if os.getenv('LATENCY_PORT') or os.getenv('LATENCY_DUMP'):
+        latency = LatencyRecorder()
+        if os.getenv('LATENCY_PORT'):
+            latency.serve(int(os.getenv('LATENCY_PORT')))
+        if os.getenv('LATENCY_DUMP'):
+            latency.start_dump(float(os.getenv('LATENCY_DUMP')))
+    if len(symbols) == 1:
+        bot = Bot(symbols[0], interval, api_key, api_secret, latency=latency)
+    else:
+        bot = MultiSymbolBot(symbols, interval, api_key, api_secret, latency=latency)
     #bot.fetch_historical_data()  # Fetch historical data before starting the WebSocket stream
     bot.start()
 
@@ -0,0 +1,117 @@
+"""
+Backtester vs live per-tick path: throughput.
+
+Builds a synthetic kline series, runs it through the vectorized Backtester and
+through Bot.handle_socket_message one message at a time (with a PaperClient in
+place of binance) and prints candles/second for each. That both produce the
+same indicators, trigger candles and trades is checked by tests/test_backtest.py.
+
+    python -m benchmarks.backtest_parity --candles 20000
+"""
+import argparse
+import logging
+import os
+import sys
+import tempfile
+import time
+import numpy as np
+from utils.backtest.engine import Backtester, PaperClient
+from utils.bot import Bot
+from utils.safety.order_executor import OrderExecutor
+
+INTERVAL_MS = 15 * 60 * 1000
+
+
+def synthetic_klines(candles, seed=0):
+    # random walk with volatility bursts, so the oversold/expansion setups actually occur
+    rng = np.random.default_rng(seed)
+    vol = np.where(rng.random(candles) < 0.02, 6.0, 1.0)
+    vol = np.convolve(vol, np.ones(8) / 8, mode='same')
+    close = np.round(30000 * np.exp(np.cumsum(rng.normal(0, 0.004, candles) * vol)), 2)
+    open_ = np.round(np.r_[close[0], close[:-1]] * (1 + rng.normal(0, 0.001, candles)), 2)
+    high = np.maximum(open_, close) * (1 + np.abs(rng.normal(0, 0.001, candles)))
+    low = np.minimum(open_, close) * (1 - np.abs(rng.normal(0, 0.001, candles)))
+    return {
+        'timestamp': 1_600_000_000_000 + np.arange(candles, dtype=np.int64) * INTERVAL_MS,
+        'open': open_,
+        'high': np.round(high, 2),
+        'low': np.round(low, 2),
+        'close': close,
+        'volume': np.round(rng.random(candles) * 10, 3),
+    }
+
+
+def replay_live(klines, strategies=None):
+    client = PaperClient()
+    # orders are sent inline so fills land on the candle that triggered them, like the backtester
+    bot = Bot('BTCUSDT', '15m', None, None, client=client, executor=OrderExecutor(client, max_workers=0),
+              strategies=strategies)
+    signals, trades = [], []
+    evaluate = bot.graph.evaluate
+
+    def recording_evaluate():
+        fired = evaluate()
+        if fired:
+            signals.append(len(seen) - 1)
+        return fired
+    bot.graph.evaluate = recording_evaluate
+
+    seen = []
+    indicators = np.empty((len(klines['close']), 4))
+    for i in range(len(klines['close'])):
+        seen.append(i)
+        before = bot.order_calculator.active_order
+        bot.handle_socket_message({'k': {
+            't': int(klines['timestamp'][i]),
+            'o': repr(float(klines['open'][i])),
+            'h': repr(float(klines['high'][i])),
+            'l': repr(float(klines['low'][i])),
+            'c': repr(float(klines['close'][i])),
+            'v': repr(float(klines['volume'][i])),
+            'T': int(klines['timestamp'][i]) + INTERVAL_MS - 1,
+            'x': True,
+        }})
+        after = bot.order_calculator.active_order
+        if before is not None and after is not before:
+            trades[-1]['exit_index'] = i
+        if after is not None and after is not before:
+            trades.append({'entry_index': i, 'quantity': after['quantity'], 'stop_loss': after['stop_loss'],
+                           'take_profit': after['take_profit'], 'exit_index': -1})
+        row = bot.kline_data.row()
+        indicators[i] = row['rsi'], row['UpperBB'], row['MiddleBB'], row['LowerBB']
+    bot.close()
+    return signals, trades, indicators
+
+
+def main(candles, seed):
+    klines = synthetic_klines(candles, seed)
+
+    start = time.perf_counter()
+    result = Backtester().run(klines)
+    batch_seconds = time.perf_counter() - start
+
+    logging.disable(logging.INFO)
+    with tempfile.TemporaryDirectory() as workdir:
+        cwd = os.getcwd()
+        os.chdir(workdir)  # the live path persists klines and orders under ./data
+        try:
+            start = time.perf_counter()
+            live_signals, live_trades, _ = replay_live(klines)
+            live_seconds = time.perf_counter() - start
+        finally:
+            os.chdir(cwd)
+    logging.disable(logging.NOTSET)
+
+    print(f"candles: {candles}  signals: {len(live_signals)}  trades: {len(live_trades)}")
+    print(f"live path:  {live_seconds:8.3f}s  {candles / live_seconds:>12,.0f} candles/s")
+    print(f"backtester: {batch_seconds:8.3f}s  {candles / batch_seconds:>12,.0f} candles/s")
+    print("summary:", result.summary())
+    return 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--candles', type=int, default=20_000)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+    sys.exit(main(args.candles, args.seed))
@@ -0,0 +1,150 @@
+"""
+End-to-end throughput and tick-to-order latency for 1 to 500 symbols.
+
+Replays synthetic 15m klines for N symbols through ReplayFeed into a
+MultiSymbolBot whose REST client is a ReplayExchange (history fetch, fills)
+and whose orders go through a threaded OrderExecutor, klines and orders
+persisted to a temporary directory. For every N it first replays as fast as
+possible and reports messages per second, then replays again paced at half
+that rate and reports tick-to-order latency (feed hands over a candle ->
+order arrives at the exchange); every symbol's candle closes at the same
+moment, as on binance, so the latency includes working through that burst.
+Strategies are loosened so every symbol trades. Then checks the pipeline is
+deterministic: every message handled, no order left in flight, and with
+inline orders each symbol's fills match the same symbol run alone through
+Bot.start. Exits non-zero if not.
+
+    python -m benchmarks.end_to_end --symbols 1 10 100 500 --candles 500
+"""
+import argparse
+import logging
+import os
+import sys
+import tempfile
+import time
+from benchmarks.backtest_parity import synthetic_klines
+from utils.bot import Bot
+from utils.data.feeds import ReplayFeed
+from utils.data.kline_cache import KlineCache
+from utils.data.store import PersistenceWriter
+from utils.multi_bot import MultiSymbolBot
+from utils.safety.mock_exchange import ReplayExchange
+from utils.safety.order_executor import OrderExecutor
+from utils.signals.graph import RsiBbExpansion
+
+HISTORY = 60
+CANDLE_SECONDS = 15 * 60
+
+
+def strategies():
+    return [RsiBbExpansion('loose', rsi_oversold=35, rsi_reentry_low=35, rsi_reentry_high=55, bandwidth_roc_threshold=0.0)]
+
+
+def market(count, candles, seed):
+    return {f'S{i:03d}USDT': synthetic_klines(HISTORY + candles, seed + i) for i in range(count)}
+
+
+def new_feed(klines, speed):
+    symbol = next(iter(klines))
+    feed = ReplayFeed(speed=speed, start=int(klines[symbol]['timestamp'][HISTORY]))
+    for symbol, data in klines.items():
+        feed.add_klines(symbol, '15m', data)
+    return feed
+
+
+def replay(klines, speed, workers, root, risk=None):
+    # -> (feed, exchange, bot, seconds from the first message until everything was handled)
+    feed = new_feed(klines, speed)
+    exchange = ReplayExchange(feed)
+    bot = MultiSymbolBot(list(klines), '15m', None, None, client=exchange, writer=PersistenceWriter(root=os.path.join(root, 'data')),
+                         order_executor=OrderExecutor(exchange, max_workers=workers, method='create_order'),
+                         kline_cache=KlineCache(exchange, root=os.path.join(root, 'cache')), feed=feed, strategies=strategies,
+                         risk=risk)
+    run, started = feed.run, []
+
+    def timed_run():
+        started.append(time.perf_counter())
+        run()
+    feed.run = timed_run
+    bot.start()
+    return feed, exchange, bot, time.perf_counter() - started[0]
+
+
+def fills(exchange):
+    by_symbol = {}
+    for order in exchange.fills.values():
+        by_symbol.setdefault(order['symbol'], []).append((order['side'], order['executedQty']))
+    return by_symbol
+
+
+def check(klines, feed, bot, candles):
+    failures = []
+    if feed.sent != len(klines) * candles:
+        failures.append(f"{feed.sent} messages sent, expected {len(klines) * candles}")
+    for symbol, data in klines.items():
+        window = bot.bots[symbol].kline_data
+        if len(window) == 0 or window['timestamp'][-1] != data['timestamp'][-1]:
+            failures.append(f"{symbol} didn't handle its last candle")
+        stuck = [order for order in bot.bots[symbol].order_calculator.positions.open_orders(symbol) if order['status'] != 'NEW']
+        if stuck:
+            failures.append(f"{symbol} has {len(stuck)} order(s) still in flight")
+    return failures
+
+
+def alone(symbol, klines, root):
+    # one symbol through Bot.start, inline orders
+    feed = new_feed({symbol: klines}, None)
+    exchange = ReplayExchange(feed)
+    bot = Bot(symbol, '15m', None, None, client=exchange, writer=PersistenceWriter(root=os.path.join(root, 'data')),
+              kline_cache=KlineCache(exchange, root=os.path.join(root, 'cache')),
+              executor=OrderExecutor(exchange, max_workers=0, method='create_order'), strategies=strategies(), feed=feed)
+    bot.start()
+    return fills(exchange).get(symbol, [])
+
+
+def main(symbol_counts, candles, workers, parity_symbols, seed):
+    logging.disable(logging.INFO)
+    failures = []
+    print(f"{candles} candles per symbol, {workers} order worker(s)")
+    print(f"{'symbols':>8} {'messages':>9} {'msgs/s':>10} {'orders':>7} {'tick-to-order p50':>18} {'p99':>9} {'max':>9}")
+    with tempfile.TemporaryDirectory() as root:
+        for count in symbol_counts:
+            klines = market(count, candles, seed)
+            feed, exchange, bot, seconds = replay(klines, None, workers, os.path.join(root, f'fast_{count}'))
+            rate = feed.sent / seconds
+            failures += [f"{count} symbols: {failure}" for failure in check(klines, feed, bot, candles)]
+
+            # paced at half the rate it can take, so the latency isn't queueing behind the replay
+            speed = 0.5 * rate * CANDLE_SECONDS / count
+            feed, exchange, bot, _ = replay(klines, speed, workers, os.path.join(root, f'paced_{count}'))
+            failures += [f"{count} symbols paced: {failure}" for failure in check(klines, feed, bot, candles)]
+            latency = exchange.latency.summary()
+            print(f"{count:>8} {feed.sent:>9} {rate:>10,.0f} {len(exchange.fills):>7} "
+                  + (f"{latency['p50_us']:>15,.0f} µs {latency['p99_us']:>6,.0f} µs {latency['max_us']:>6,.0f} µs"
+                     if latency['count'] else f"{'-':>18}"))
+
+        klines = market(parity_symbols, candles, seed)
+        feed, exchange, bot, _ = replay(klines, None, 0, os.path.join(root, 'parity'))
+        together = fills(exchange)
+        for symbol, data in klines.items():
+            expected = alone(symbol, data, os.path.join(root, 'alone', symbol))
+            if together.get(symbol, []) != expected:
+                failures.append(f"{symbol}: fills with {parity_symbols} symbols differ from the symbol alone")
+    logging.disable(logging.NOTSET)
+
+    if failures:
+        print("MISMATCH:\n  " + "\n  ".join(failures))
+        return 1
+    print(f"every message handled, no order left in flight, {parity_symbols} symbols fill as they do alone")
+    return 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--symbols', type=int, nargs='+', default=[1, 10, 100, 500])
+    parser.add_argument('--candles', type=int, default=500)
+    parser.add_argument('--workers', type=int, default=4, help='order executor threads')
+    parser.add_argument('--parity-symbols', type=int, default=10)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+    sys.exit(main(args.symbols, args.candles, args.workers, args.parity_symbols, args.seed))
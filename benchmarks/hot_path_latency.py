@@ -0,0 +1,66 @@
+"""
+Per-stage latency of the live tick-to-order path.
+
+Replays synthetic klines through Bot.handle_socket_message (PaperClient in place
+of binance, klines persisted to a temporary directory) with a LatencyRecorder
+attached, prints the p50/p99/max of every stage, then replays again with the
+recorder disabled to show what the instrumentation itself costs per message.
+
+    python -m benchmarks.hot_path_latency --candles 50000
+"""
+import argparse
+import logging
+import os
+import tempfile
+import time
+from benchmarks.backtest_parity import INTERVAL_MS, synthetic_klines
+from utils.backtest.engine import PaperClient
+from utils.bot import Bot
+from utils.data.store import PersistenceWriter
+from utils.metrics.latency import LatencyRecorder
+
+
+def messages(klines):
+    return [{'k': {
+        't': int(klines['timestamp'][i]),
+        'o': repr(float(klines['open'][i])),
+        'h': repr(float(klines['high'][i])),
+        'l': repr(float(klines['low'][i])),
+        'c': repr(float(klines['close'][i])),
+        'v': repr(float(klines['volume'][i])),
+        'T': int(klines['timestamp'][i]) + INTERVAL_MS - 1,
+        'x': True,
+    }} for i in range(len(klines['close']))]
+
+
+def replay(msgs, latency, root):
+    writer = PersistenceWriter(root=root)
+    bot = Bot('BTCUSDT', '15m', None, None, client=PaperClient(), writer=writer, latency=latency)
+    start = time.perf_counter_ns()
+    for msg in msgs:
+        bot.handle_socket_message(msg)
+    elapsed = time.perf_counter_ns() - start
+    bot.close()
+    return elapsed / len(msgs)
+
+
+def main(candles, seed):
+    msgs = messages(synthetic_klines(candles, seed))
+    logging.disable(logging.INFO)
+    with tempfile.TemporaryDirectory() as workdir:
+        latency = LatencyRecorder()
+        enabled = replay(msgs, latency, os.path.join(workdir, 'enabled'))
+        disabled = replay(msgs, LatencyRecorder(enabled=False), os.path.join(workdir, 'disabled'))
+    logging.disable(logging.NOTSET)
+
+    print(latency.report())
+    print(f"\nper message: {enabled:,.0f} ns instrumented, {disabled:,.0f} ns disabled "
+          f"({enabled - disabled:+,.0f} ns)")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--candles', type=int, default=50_000)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+    main(args.candles, args.seed)
@@ -0,0 +1,110 @@
+"""
+Import cost and side effects of the package, and worker cold start, before and after.
+
+For every module in MODULES starts fresh interpreters that import only that
+module and reports the median import time, which heavy dependencies it
+pulled in (pandas, binance, requests, dotenv) and whether importing it
+configured logging. Then times a process-pool worker cold start: a spawned
+worker that imports utils.backtest.sweep and answers one task. Everything is
+measured on this tree and on --baseline, a git revision extracted to a
+temporary directory (by default the tree before imports were made lazy).
+Exits non-zero if importing any module of this tree loads a heavy
+dependency or touches logging.
+
+    python -m benchmarks.import_time --runs 5
+    python -m benchmarks.import_time --baseline HEAD~3
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import numpy as np
+
+MODULES = ('utils.bot', 'utils.multi_bot', 'utils.backtest.sweep', 'utils.backtest.engine', 'utils.signals.graph',
+           'utils.safety.order_calculation')
+HEAVY = ('pandas', 'binance', 'requests', 'dotenv')
+
+_IMPORT = """
+import json, logging, sys, time
+start = time.perf_counter()
+import {module}
+seconds = time.perf_counter() - start
+print(json.dumps({{'seconds': seconds, 'loaded': [name for name in {heavy!r} if name in sys.modules],
+                  'logging': bool(logging.getLogger().handlers)}}))
+"""
+
+_WORKER = """
+import json, multiprocessing, time
+from concurrent.futures import ProcessPoolExecutor
+if __name__ == '__main__':
+    start = time.perf_counter()
+    with ProcessPoolExecutor(1, mp_context=multiprocessing.get_context('spawn')) as pool:
+        pool.submit(exec, 'import utils.backtest.sweep').result()
+    print(json.dumps({'seconds': time.perf_counter() - start}))
+"""
+
+
+def child(root, code):
+    # run `code` in a fresh interpreter with `root` as the working directory and import path
+    result = subprocess.run([sys.executable, '-c', code], cwd=root, env={**os.environ, 'PYTHONPATH': root},
+                            capture_output=True, text=True, check=True)
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def measure(root, runs):
+    modules = {}
+    for module in MODULES:
+        results = [child(root, _IMPORT.format(module=module, heavy=HEAVY)) for _ in range(runs)]
+        modules[module] = (float(np.median([r['seconds'] for r in results])), results[-1]['loaded'], results[-1]['logging'])
+    worker = float(np.median([child(root, _WORKER)['seconds'] for _ in range(runs)]))
+    return modules, worker
+
+
+def effects(loaded, configured_logging):
+    return ', '.join(loaded + ['logging'] * configured_logging) or '-'
+
+
+def default_baseline():
+    # the parent of the commit that added this file, i.e. the tree with eager imports
+    added = subprocess.run(['git', 'log', '--diff-filter=A', '--format=%H', '--', 'benchmarks/import_time.py'],
+                           capture_output=True, text=True).stdout.split()
+    return f'{added[-1]}^' if added else 'HEAD'
+
+
+def extract(revision, directory):
+    archive = subprocess.run(['git', 'archive', '--format=tar', revision], capture_output=True, check=True).stdout
+    subprocess.run(['tar', '-x', '-C', directory], input=archive, check=True)
+
+
+def main(runs, baseline):
+    here = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    current, current_worker = measure(here, runs)
+    with tempfile.TemporaryDirectory() as directory:
+        extract(baseline, directory)
+        before, before_worker = measure(directory, runs)
+
+    print(f"median of {runs} fresh interpreters, baseline {baseline}")
+    print(f"{'':<32} {'before (s)':>10} {'after (s)':>10}  loaded before -> after")
+    for module in MODULES:
+        seconds, loaded, configured = current[module]
+        old_seconds, old_loaded, old_configured = before[module]
+        print(f"{module:<32} {old_seconds:>10.3f} {seconds:>10.3f}  {effects(old_loaded, old_configured)} -> "
+              f"{effects(loaded, configured)}")
+    print(f"{'spawned sweep worker cold start':<32} {before_worker:>10.3f} {current_worker:>10.3f}")
+
+    failures = [module for module, (_, loaded, configured) in current.items() if loaded or configured]
+    if failures:
+        print("SIDE EFFECTS on import: " + ", ".join(failures))
+        return 1
+    print("no module loads pandas, binance, requests or dotenv or configures logging on import")
+    return 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--baseline', default=None, help='git revision to compare with')
+    args = parser.parse_args()
+    sys.exit(main(args.runs, args.baseline or default_baseline()))
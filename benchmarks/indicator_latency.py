@@ -0,0 +1,48 @@
+"""
+Per-tick latency of the streaming indicators over a long run.
+
+Feeds a random walk through BollingerBands, WilderRSI and calculate_bandwidth_roc one
+price at a time and prints the mean cost per update for each slice of the run.
+With the ring-buffer backed indicators the numbers should stay flat from the
+first slice to the last and max RSS should not grow with the tick count.
+
+    python -m benchmarks.indicator_latency              # 10M updates
+    python -m benchmarks.indicator_latency --ticks 1000000 --slices 20
+"""
+import argparse
+import resource
+import time
+import numpy as np
+from utils.indicators.bollinger_bands import BollingerBands
+from utils.indicators.rsi import WilderRSI
+
+
+def run(ticks, slices, seed=0):
+    rng = np.random.default_rng(seed)
+    bbands = BollingerBands(window=20, num_of_std=2)
+    rsi = WilderRSI(period=14)
+    slice_len = ticks // slices
+    previous_price = 30000.0
+
+    print(f"{'slice':>6} {'ticks':>12} {'ns/update':>10} {'maxrss KiB':>10}")
+    for s in range(slices):
+        # generate outside the timed section so only indicator work is measured
+        prices = (previous_price + np.cumsum(rng.normal(0, 15, slice_len))).tolist()
+        previous_price = prices[-1]
+        start = time.perf_counter_ns()
+        for price in prices:
+            bbands.update(price)
+            bbands.calculate_bandwidth_roc()
+            rsi.update(price)
+        elapsed = time.perf_counter_ns() - start
+        maxrss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        print(f"{s:>6} {(s + 1) * slice_len:>12} {elapsed / slice_len:>10.0f} {maxrss:>10}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--ticks', type=int, default=10_000_000)
+    parser.add_argument('--slices', type=int, default=10)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+    run(args.ticks, args.slices, args.seed)
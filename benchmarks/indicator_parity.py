@@ -0,0 +1,101 @@
+"""
+Streaming vs batch throughput of every indicator.
+
+For each indicator (SMA, EMA, Wilder RSI, MACD, ATR, stochastic, Bollinger
+bands with bandwidth ROC) times the *_batch function over --candles (1M by
+default) and update() one candle at a time over --stream-candles, on a
+random walk with gaps. That the two modes agree is checked by
+tests/test_indicators.py.
+
+    python -m benchmarks.indicator_parity --candles 1000000
+"""
+import argparse
+import sys
+import time
+import numpy as np
+from utils.indicators.atr import ATR, atr_batch
+from utils.indicators.bollinger_bands import BollingerBands, bollinger_bands_batch, bandwidth_roc_batch
+from utils.indicators.macd import MACD, macd_batch
+from utils.indicators.moving_average import EMA, SMA, ema_batch, sma_batch
+from utils.indicators.rsi import WilderRSI, wilder_rsi_batch
+from utils.indicators.stochastic import Stochastic, stochastic_batch
+
+
+def _bollinger_update(bands, high, low, close):
+    upper, middle, lower = bands.update(close)
+    if upper is None:
+        return np.nan, np.nan, np.nan, np.nan
+    roc = bands.calculate_bandwidth_roc()
+    return upper, middle, lower, np.nan if roc is None else roc
+
+
+def _bollinger_batch(high, low, close, window, num_of_std):
+    upper, middle, lower, band_width = bollinger_bands_batch(close, window, num_of_std)
+    return upper, middle, lower, bandwidth_roc_batch(band_width)
+
+
+# name -> (parameters, new streaming instance, update on one candle, batch on arrays)
+INDICATORS = {
+    'sma': ({'period': 20}, lambda p: SMA(p['period']), lambda o, h, l, c: o.update(c),
+            lambda h, l, c, p: sma_batch(c, p['period'])),
+    'ema': ({'period': 20}, lambda p: EMA(p['period']), lambda o, h, l, c: o.update(c),
+            lambda h, l, c, p: ema_batch(c, p['period'])),
+    'wilder_rsi': ({'period': 14}, lambda p: WilderRSI(p['period']), lambda o, h, l, c: o.update(c),
+                   lambda h, l, c, p: wilder_rsi_batch(c, p['period'])),
+    'macd': ({'fast': 12, 'slow': 26, 'signal': 9}, lambda p: MACD(p['fast'], p['slow'], p['signal']),
+             lambda o, h, l, c: o.update(c), lambda h, l, c, p: macd_batch(c, p['fast'], p['slow'], p['signal'])),
+    'atr': ({'period': 14}, lambda p: ATR(p['period']), lambda o, h, l, c: o.update(h, l, c),
+            lambda h, l, c, p: atr_batch(h, l, c, p['period'])),
+    'stochastic': ({'k_period': 14, 'd_period': 3}, lambda p: Stochastic(p['k_period'], p['d_period']),
+                   lambda o, h, l, c: o.update(h, l, c), lambda h, l, c, p: stochastic_batch(h, l, c, p['k_period'], p['d_period'])),
+    'bollinger': ({'window': 20, 'num_of_std': 2}, lambda p: BollingerBands(p['window'], p['num_of_std']),
+                  _bollinger_update, lambda h, l, c, p: _bollinger_batch(h, l, c, p['window'], p['num_of_std'])),
+}
+
+
+def candles(count, rng):
+    # random walk with a drift, occasional gaps and flat stretches
+    steps = rng.normal(rng.normal(0, 2), rng.choice([1, 10, 50]), count)
+    steps[rng.random(count) < 0.01] *= 20
+    close = 30000 + np.cumsum(steps)
+    spread = np.abs(rng.normal(0, 5, count))
+    high, low = close + spread, close - spread
+    if count > 10 and rng.random() < 0.5:
+        start = int(rng.integers(0, count - 5))
+        stop = start + int(rng.integers(1, count - start))
+        high[start:stop] = low[start:stop] = close[start:stop] = close[start]
+    return high, low, close
+
+
+def throughput(name, count, stream_count, rng):
+    params, make, update, batch = INDICATORS[name]
+    high, low, close = candles(count, rng)
+    start = time.perf_counter()
+    batch(high, low, close, params)
+    batch_seconds = time.perf_counter() - start
+
+    indicator = make(params)
+    rows = list(zip(high[:stream_count].tolist(), low[:stream_count].tolist(), close[:stream_count].tolist()))
+    start = time.perf_counter()
+    for h, l, c in rows:
+        update(indicator, h, l, c)
+    stream_seconds = time.perf_counter() - start
+    return batch_seconds, stream_seconds / len(rows)
+
+
+def main(count, stream_count, seed):
+    rng = np.random.default_rng(seed)
+    print(f"{'':<12} {f'batch {count:,} (ms)':>20} {'batch ns/candle':>16} {'update ns':>10}")
+    for name in INDICATORS:
+        batch_seconds, per_update = throughput(name, count, stream_count, rng)
+        print(f"{name:<12} {batch_seconds * 1e3:>20.1f} {batch_seconds / count * 1e9:>16.1f} {per_update * 1e9:>10.0f}")
+    return 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--candles', type=int, default=1_000_000)
+    parser.add_argument('--stream-candles', type=int, default=100_000)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+    sys.exit(main(args.candles, args.stream_candles, args.seed))
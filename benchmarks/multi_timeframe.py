@@ -0,0 +1,140 @@
+"""
+Multi-timeframe strategies from one base stream: roll-up cost and parity.
+
+Streams synthetic 15m candles through a StrategyGraph whose strategies also
+read 1h, 4h and 1d indicators (RsiBbExpansion confirmed on a higher RSI,
+plus bands and RSI on every timeframe as outputs), so all of it comes out
+of the single 15m stream. Prints the per-candle cost next to the same graph
+without the higher timeframes, and the cost of the candles that close a 4h
+candle next to recomputing the 4h indicators over the whole history there.
+Checks the streamed higher timeframe values against the same indicators
+over candles resampled by pandas, the streamed signals against signals()
+and a graph seeded on the first half then streamed against the rest.
+Exits non-zero on any mismatch.
+
+    python -m benchmarks.multi_timeframe --candles 50000
+"""
+import argparse
+import logging
+import sys
+import time
+import numpy as np
+import pandas as pd
+from benchmarks.backtest_parity import synthetic_klines
+from utils.data.intervals import interval_to_ms
+from utils.indicators.bollinger_bands import bollinger_bands_batch
+from utils.indicators.rsi import wilder_rsi_batch
+from utils.signals.graph import StrategyGraph, RsiBbExpansion, band, bollinger, rsi, source
+
+BASE = '15m'
+TIMEFRAMES = ('1h', '4h', '1d')
+
+
+def klines_for(count, seed):
+    klines = synthetic_klines(count, seed)
+    day = interval_to_ms('1d')
+    klines['timestamp'] = klines['timestamp'] - klines['timestamp'][0] % day  # start on a day boundary
+    return klines
+
+
+def outputs(timeframes):
+    nodes = {}
+    for timeframe in timeframes:
+        close = source('close', timeframe)
+        nodes[timeframe, 'rsi'] = rsi(close, 14)
+        nodes[timeframe, 'middle'] = band(bollinger(close, 20, 2), 'middle')
+    return nodes
+
+
+def new_graph(timeframes):
+    strategies = [RsiBbExpansion()] + [RsiBbExpansion(f'confirm_{timeframe}', confirm_timeframe=timeframe, confirm_rsi=45)
+                                       for timeframe in timeframes]
+    return StrategyGraph(strategies, outputs(timeframes).values(), base_interval=BASE)
+
+
+def candle(klines, i):
+    return {'time': int(klines['timestamp'][i]), 'open': float(klines['open'][i]), 'high': float(klines['high'][i]),
+            'low': float(klines['low'][i]), 'close': float(klines['close'][i]), 'volume': float(klines['volume'][i])}
+
+
+def stream(graph, klines, start, nodes):
+    # per candle: seconds, values of `nodes`; and the candles each strategy fired on
+    timings, values, fired = [], [], {strategy.name: [] for strategy in graph.strategies}
+    candles = [candle(klines, i) for i in range(start, len(klines['timestamp']))]
+    for i, bar in enumerate(candles, start):
+        begin = time.perf_counter()
+        graph.update(bar)
+        for name in graph.evaluate():
+            fired[name].append(i)
+        timings.append(time.perf_counter() - begin)
+        values.append([graph.value(node) for node in nodes])
+    return np.array(timings), np.array(values, dtype=np.float64).reshape(len(candles), len(nodes)), fired
+
+
+def resampled_reference(klines, timeframe):
+    # the timeframe's candles as pandas builds them, indicators on those, held until the next one closes
+    frame = pd.DataFrame({'close': klines['close']}, index=pd.to_datetime(klines['timestamp'], unit='ms'))
+    close = frame['close'].resample(pd.Timedelta(milliseconds=interval_to_ms(timeframe))).last()
+    values = {'rsi': wilder_rsi_batch(close.to_numpy(), 14), 'middle': bollinger_bands_batch(close.to_numpy(), 20, 2)[1]}
+    # a higher candle is known on the base candle that closes it
+    closes_at = close.index.as_unit('ms').asi8 + interval_to_ms(timeframe) - interval_to_ms(BASE)
+    latest = np.searchsorted(closes_at, klines['timestamp'], side='right') - 1
+    return {name: np.where(latest >= 0, column[np.maximum(latest, 0)], np.nan) for name, column in values.items()}
+
+
+def main(count, seed):
+    klines = klines_for(count, seed)
+    logging.disable(logging.INFO)
+    nodes = outputs(TIMEFRAMES)
+    graph = new_graph(TIMEFRAMES)
+    timings, values, fired = stream(graph, klines, 0, list(nodes.values()))
+    base_timings, _, _ = stream(new_graph(()), klines, 0, [])
+
+    four_hours = interval_to_ms('4h')
+    closes_4h = (klines['timestamp'] + interval_to_ms(BASE)) % four_hours == 0
+    start = time.perf_counter()
+    close = pd.Series(klines['close'], index=pd.to_datetime(klines['timestamp'], unit='ms')).resample('4h').last().to_numpy()
+    wilder_rsi_batch(close, 14), bollinger_bands_batch(close, 20, 2)
+    recompute = time.perf_counter() - start
+
+    half = count // 2
+    seeded = new_graph(TIMEFRAMES)
+    seeded.seed({name: column[:half] for name, column in klines.items()})
+    _, seeded_values, seeded_fired = stream(seeded, klines, half, list(nodes.values()))
+    batch_fired = new_graph(TIMEFRAMES).signals(klines)
+    logging.disable(logging.NOTSET)
+
+    print(f"{count} {BASE} candles, higher timeframes {', '.join(TIMEFRAMES)}, {len(graph)} nodes")
+    print(f"update + evaluate: {np.median(base_timings) * 1e6:.1f} µs base only, {np.median(timings) * 1e6:.1f} µs with "
+          f"{len(TIMEFRAMES)} higher timeframes")
+    print(f"candles closing a 4h candle: {np.median(timings[closes_4h]) * 1e6:.1f} µs, "
+          f"recomputing the 4h indicators over the history instead: {recompute * 1e6:.0f} µs")
+    print("signals: " + ", ".join(f"{name} {len(indices)}" for name, indices in fired.items()))
+
+    failures = []
+    for timeframe in TIMEFRAMES:
+        reference = resampled_reference(klines, timeframe)
+        for name in ('rsi', 'middle'):
+            column = list(nodes).index((timeframe, name))
+            if not np.allclose(values[:, column], reference[name], rtol=1e-9, equal_nan=True):
+                failures.append(f"streamed {timeframe} {name} differs from the resampled candles")
+            if not np.allclose(seeded_values[:, column], reference[name][half:], rtol=1e-9, equal_nan=True):
+                failures.append(f"seeded {timeframe} {name} differs from the resampled candles")
+    for name, indices in fired.items():
+        if indices != batch_fired[name].tolist():
+            failures.append(f"{name}: streamed signals {indices[:5]} batch {batch_fired[name][:5].tolist()}")
+        if seeded_fired[name] != [i for i in indices if i >= half]:
+            failures.append(f"{name}: seeded then streamed signals differ")
+    if failures:
+        print("MISMATCH:\n  " + "\n  ".join(failures))
+        return 1
+    print("higher timeframes match resampled candles, streamed, seeded and batch signals agree")
+    return 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--candles', type=int, default=50_000)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+    sys.exit(main(args.candles, args.seed))
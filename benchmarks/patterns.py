@@ -0,0 +1,78 @@
+"""
+Candlestick patterns: one NumPy pass vs per-candle checks.
+
+Scans random OHLC candles with scan_patterns (all registered patterns at
+once), with PatternScanner one candle at a time, and, for bullish engulfing,
+with the old row-wise EngulfingPatternDetector logic (iloc on a DataFrame
+window). All three must find the same candles; exits non-zero if they don't.
+
+    python -m benchmarks.patterns --candles 100000
+"""
+import argparse
+import sys
+import time
+import numpy as np
+import pandas as pd
+from utils.indicators.patterns import PATTERNS, PatternScanner, scan_patterns
+
+
+def candles(count, seed):
+    rng = np.random.default_rng(seed)
+    close = 30000 * np.exp(np.cumsum(rng.normal(0, 0.003, count)))
+    open_ = np.r_[close[0], close[:-1]] * (1 + rng.normal(0, 0.002, count))
+    high = np.maximum(open_, close) * (1 + np.abs(rng.normal(0, 0.002, count)))
+    low = np.minimum(open_, close) * (1 - np.abs(rng.normal(0, 0.002, count)))
+    return open_, high, low, close
+
+
+def iloc_bullish_engulfing(frame):
+    # what EngulfingPatternDetector did per call, on the last two rows of a window
+    last_candle = frame.iloc[-1]
+    prev_candle = frame.iloc[-2]
+    return (prev_candle['close'] < prev_candle['open'] and last_candle['close'] > last_candle['open']
+            and last_candle['open'] < prev_candle['close'] and last_candle['close'] > prev_candle['open'])
+
+
+def main(count, seed):
+    open_, high, low, close = candles(count, seed)
+    start = time.perf_counter()
+    masks = scan_patterns(open_, high, low, close)
+    batch_seconds = time.perf_counter() - start
+
+    scanner = PatternScanner()
+    streamed = {name: np.zeros(count, dtype=bool) for name in PATTERNS}
+    start = time.perf_counter()
+    for i, values in enumerate(zip(open_.tolist(), high.tolist(), low.tolist(), close.tolist())):
+        for name, matched in scanner.update(*values).items():
+            streamed[name][i] = matched
+    stream_seconds = time.perf_counter() - start
+
+    # the row-wise version is slow, time it on a slice
+    rows = min(count, 5000)
+    frame = pd.DataFrame({'open': open_[:rows], 'high': high[:rows], 'low': low[:rows], 'close': close[:rows]})
+    start = time.perf_counter()
+    iloc = np.array([False] + [iloc_bullish_engulfing(frame.iloc[i - 1:i + 1]) for i in range(1, rows)])
+    iloc_seconds = time.perf_counter() - start
+
+    print(f"{'':<30} {'us/candle':>10}")
+    print(f"{f'scan_patterns ({len(PATTERNS)} patterns)':<30} {batch_seconds / count * 1e6:>10.3f}")
+    print(f"{'PatternScanner.update':<30} {stream_seconds / count * 1e6:>10.3f}")
+    print(f"{'iloc bullish engulfing only':<30} {iloc_seconds / rows * 1e6:>10.3f}")
+    print("matches: " + ", ".join(f"{name} {int(mask.sum())}" for name, mask in masks.items()))
+
+    failures = [name for name in PATTERNS if not np.array_equal(masks[name], streamed[name])]
+    if not np.array_equal(masks['bullish_engulfing'][:rows], iloc):
+        failures.append('bullish_engulfing vs iloc')
+    if failures:
+        print("MISMATCH: " + ", ".join(failures))
+        return 1
+    print("batch, incremental and row-wise agree")
+    return 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--candles', type=int, default=100_000)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+    sys.exit(main(args.candles, args.seed))
@@ -0,0 +1,91 @@
+"""
+Stop-loss / take-profit checks with many open positions: PositionBook vs a scan.
+
+Opens `--positions` orders on one symbol around a starting price, then feeds a
+random walk of prices (per tick) and of candles (low/high, intrabar) to both
+PositionBook.triggered and a linear scan over every order that applies the
+manage_orders rules. Triggered orders are closed in both, so the two must
+agree on every step. Prints the cost per update; exits non-zero on a mismatch.
+
+    python -m benchmarks.position_book --positions 10000 --updates 20000
+"""
+import argparse
+import sys
+import time
+import numpy as np
+from utils.safety.position_book import PositionBook
+
+
+def open_positions(count, price, rng):
+    orders = []
+    for i in range(count):
+        entry = price * (1 + rng.normal(0, 0.01))
+        orders.append({
+            'order_id': f'order-{i}',
+            'symbol': 'BTCUSDT',
+            'stop_loss': entry * (1 - rng.uniform(0.005, 0.05)),
+            'take_profit': entry * (1 + rng.uniform(0.005, 0.05)),
+            'status': 'NEW',
+        })
+    return orders
+
+
+def scan(orders, low, high):
+    hits = []
+    for order in orders.values():
+        if order['stop_loss'] >= low:
+            hits.append((order['order_id'], 'stop_loss'))
+        elif order['take_profit'] <= high:
+            hits.append((order['order_id'], 'take_profit'))
+    return hits
+
+
+def run(mode, positions, updates, seed):
+    rng = np.random.default_rng(seed)
+    price = 30000.0
+    orders = open_positions(positions, price, rng)
+    book = PositionBook()
+    for order in orders:
+        book.add(order)
+        book.arm(order)
+    scanned = {order['order_id']: dict(order) for order in orders}
+
+    closes = price * np.exp(np.cumsum(rng.normal(0, 0.0005, updates)))
+    spread = np.abs(rng.normal(0, 0.001, updates)) * closes
+    lows, highs = (closes, closes) if mode == 'tick' else (closes - spread, closes + spread)
+    book_seconds = scan_seconds = 0.0
+    triggered = 0
+    for low, high in zip(lows.tolist(), highs.tolist()):
+        start = time.perf_counter()
+        hits = book.triggered('BTCUSDT', low, high)
+        for order, _ in hits:
+            book.remove(order['order_id'])
+        book_seconds += time.perf_counter() - start
+
+        start = time.perf_counter()
+        expected = scan(scanned, low, high)
+        for order_id, _ in expected:
+            del scanned[order_id]
+        scan_seconds += time.perf_counter() - start
+
+        if sorted((order['order_id'], reason) for order, reason in hits) != sorted(expected):
+            print(f"MISMATCH in {mode} mode at low={low} high={high}")
+            return False
+        triggered += len(hits)
+    print(f"{mode:<9} {triggered:>10} {book_seconds / updates * 1e6:>12.2f} {scan_seconds / updates * 1e6:>12.2f} {len(book):>8}")
+    return True
+
+
+def main(positions, updates, seed):
+    print(f"{'mode':<9} {'triggered':>10} {'book us':>12} {'scan us':>12} {'left':>8}")
+    ok = run('tick', positions, updates, seed) and run('intrabar', positions, updates, seed)
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--positions', type=int, default=10_000)
+    parser.add_argument('--updates', type=int, default=20_000)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+    sys.exit(main(args.positions, args.updates, args.seed))
@@ -0,0 +1,188 @@
+"""
+Portfolio risk engine: update and sizing cost for 10 to 500 symbols, and parity.
+
+Streams synthetic, correlated 15m candles (one market factor plus noise,
+about 2% of the candles missing) for N symbols through a RiskEngine,
+symbol by symbol within each period as they'd come off the feeds. Reports
+the cost of one symbol's candle, of the first candle of a period (which
+also clears a row of the ring), of sizing one order and of sizing one order
+for every symbol in a single call, next to recomputing the covariance with
+np.cov on every signal. Checks the incremental covariance against np.cov
+over the same returns window, the stop distances against atr_batch, that a
+book filled with the sized orders stays within every limit, and that
+MultiSymbolBot with a shared engine buys exactly what the engine sized,
+within the per-symbol limit. Exits non-zero on any mismatch.
+
+    python -m benchmarks.risk_engine --symbols 10 100 500 --candles 1000
+"""
+import argparse
+import logging
+import math
+import sys
+import tempfile
+import time
+import numpy as np
+from benchmarks.end_to_end import market, replay
+from utils.data.intervals import interval_to_ms
+from utils.indicators.atr import atr_batch
+from utils.safety.order_calculation import TradeConfig
+from utils.safety.position_book import PositionBook
+from utils.safety.risk import RiskEngine
+
+INTERVAL = '15m'
+
+
+def correlated_klines(count, candles, seed):
+    # -> timestamps, (candles, count) arrays of highs, lows, closes, and which candles exist
+    rng = np.random.default_rng(seed)
+    factor = rng.normal(0, 0.004, (candles, 1))
+    returns = rng.uniform(0.3, 1.5, count) * factor + rng.normal(0, 0.003, (candles, count))
+    closes = rng.uniform(1, 1000, count) * np.exp(np.cumsum(returns, axis=0))
+    highs = closes * (1 + np.abs(rng.normal(0, 0.002, closes.shape)))
+    lows = closes * (1 - np.abs(rng.normal(0, 0.002, closes.shape)))
+    present = rng.random(closes.shape) > 0.02
+    present[0] = True
+    timestamps = 1_700_000_100_000 // interval_to_ms(INTERVAL) * interval_to_ms(INTERVAL) + np.arange(candles) * interval_to_ms(INTERVAL)
+    return timestamps, highs, lows, closes, present
+
+
+def reference_returns(closes, present):
+    # the returns matrix the engine should hold: a symbol's return lands on the period of its candle
+    returns = np.zeros(closes.shape)
+    for s in range(closes.shape[1]):
+        rows = np.flatnonzero(present[:, s])
+        returns[rows[1:], s] = np.log(closes[rows[1:], s] / closes[rows[:-1], s])
+    return returns
+
+
+def stream(engine, symbols, timestamps, highs, lows, closes, present, seed):
+    # -> seconds per candle, and whether that candle was the first of its period
+    rng = np.random.default_rng(seed)
+    timings, firsts = [], []
+    for i, timestamp in enumerate(timestamps.tolist()):
+        first = True
+        for s in rng.permutation(len(symbols)).tolist():
+            if not present[i, s]:
+                continue
+            high, low, close = float(highs[i, s]), float(lows[i, s]), float(closes[i, s])
+            begin = time.perf_counter()
+            engine.update(symbols[s], timestamp, high, low, close)
+            timings.append(time.perf_counter() - begin)
+            firsts.append(first)
+            first = False
+    return np.array(timings), np.array(firsts)
+
+
+def fill(engine, symbols, prices):
+    # open every sized order in a fresh book, as the bots would
+    book = PositionBook()
+    engine.books = [book]
+    begin = time.perf_counter()
+    quantities, stops = engine.size(symbols, prices)
+    seconds = time.perf_counter() - begin
+    for i, (symbol, quantity) in enumerate(zip(symbols, quantities.tolist())):
+        if quantity > 0:
+            order = {'order_id': str(i), 'symbol': symbol, 'quantity': quantity, 'entry_price': float(prices[i]),
+                     'stop_loss': float(stops[i]), 'take_profit': float(prices[i]) * 1.01, 'status': 'NEW'}
+            book.add(order)
+    return seconds
+
+
+def check_limits(engine, symbols):
+    failures = []
+    held, at_risk = engine.exposure()
+    capital, tolerance = engine.capital, 1e-6 * engine.capital
+    cov = engine.covariance()
+    if held.max(initial=0) > engine.max_symbol_exposure * capital + tolerance:
+        failures.append(f"a symbol holds {held.max():.2f}, over the per-symbol limit")
+    if held.sum() > engine.max_gross_exposure * capital + tolerance:
+        failures.append(f"gross exposure {held.sum():.2f} over the limit")
+    if at_risk.sum() > engine.max_portfolio_risk * capital + tolerance:
+        failures.append(f"stop losses add up to {at_risk.sum():.2f}, over the limit")
+    volatility = float(np.sqrt(max(held @ cov @ held, 0)))
+    if volatility > engine.max_volatility * capital + tolerance:
+        failures.append(f"book volatility {volatility:.2f} over the limit")
+    return failures
+
+
+class RecordingEngine(RiskEngine):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.sized = []  # (symbol, price, quantity) of every order sized
+
+    def size(self, symbols, prices, reserve=False):
+        quantities, stops = super().size(symbols, prices, reserve)
+        self.sized += zip(symbols, np.asarray(prices).tolist(), quantities.tolist())
+        return quantities, stops
+
+
+def replay_fills(count, candles, seed, root):
+    # a MultiSymbolBot sharing one engine through the replay exchange: its buys are the engine's sizes
+    engine = RecordingEngine(INTERVAL, TradeConfig(total_capital=10_000))
+    klines = market(count, candles, seed)
+    _, exchange, bot, _ = replay(klines, None, 0, root, risk=engine)
+    limit = engine.max_symbol_exposure * engine.capital
+    failures = [f"replay: {symbol} sized {quantity} at {price:.2f}, over the per-symbol limit"
+                for symbol, price, quantity in engine.sized if quantity * price > limit * (1 + 1e-9)]
+    buys = [(order['symbol'], float(order['executedQty'])) for order in exchange.fills.values() if order['side'] == 'BUY']
+    sized = [(symbol, math.floor(quantity * 100) / 100) for symbol, _, quantity in engine.sized if quantity >= 0.01]
+    if sorted(buys) != sorted(sized):
+        failures.append(f"replay: {len(buys)} buys don't match the {len(sized)} orders the engine sized")
+    return len(buys), failures
+
+
+def main(symbol_counts, candles, window, seed):
+    failures = []
+    print(f"{candles} {INTERVAL} candles, returns window {window}")
+    print(f"{'symbols':>8} {'update':>9} {'new period':>11} {'size 1':>9} {'size all':>10} {'np.cov':>10}")
+    for count in symbol_counts:
+        symbols = [f'S{i:03d}USDT' for i in range(count)]
+        timestamps, highs, lows, closes, present = correlated_klines(count, candles, seed)
+        engine = RiskEngine(INTERVAL, TradeConfig(total_capital=100_000, max_risk_per_trade=0.02), window=window)
+        timings, firsts = stream(engine, symbols, timestamps, highs, lows, closes, present, seed)
+
+        prices = np.array([engine.last_close[engine.symbols[symbol]] for symbol in symbols])
+        size_one = []
+        for symbol, price in zip(symbols[:100], prices[:100].tolist()):
+            begin = time.perf_counter()
+            engine.size([symbol], [price])
+            size_one.append(time.perf_counter() - begin)
+        size_one = np.median(size_one)
+        size_all = fill(engine, symbols, prices)
+        returns = reference_returns(closes, present)[-window:]
+        begin = time.perf_counter()
+        expected = np.cov(returns, rowvar=False).reshape(count, count)
+        recompute = time.perf_counter() - begin
+        print(f"{count:>8} {np.median(timings[~firsts]) * 1e6:>6.1f} µs {np.median(timings[firsts]) * 1e6:>8.1f} µs "
+              f"{size_one * 1e6:>6.1f} µs {size_all * 1e6:>7.0f} µs {recompute * 1e6:>7.0f} µs")
+
+        if not np.allclose(engine.covariance(symbols), expected, rtol=1e-8, atol=1e-14):
+            failures.append(f"{count} symbols: covariance differs from np.cov")
+        for s in range(count):
+            rows = present[:, s]
+            atr = atr_batch(highs[rows, s], lows[rows, s], closes[rows, s], engine.atr_period)[-1]
+            if not np.isclose(engine.atr[engine.symbols[symbols[s]]], atr, rtol=1e-9):
+                failures.append(f"{symbols[s]}: ATR differs from atr_batch")
+                break
+        failures += [f"{count} symbols: {failure}" for failure in check_limits(engine, symbols)]
+
+    logging.disable(logging.INFO)
+    with tempfile.TemporaryDirectory() as root:
+        orders, replay_failures = replay_fills(10, 300, seed, root)
+    logging.disable(logging.NOTSET)
+    failures += replay_failures
+    if failures:
+        print("MISMATCH:\n  " + "\n  ".join(failures))
+        return 1
+    print(f"covariance matches np.cov, stops match atr_batch, every limit holds, {orders} replayed buys sized by the engine")
+    return 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--symbols', type=int, nargs='+', default=[10, 100, 500])
+    parser.add_argument('--candles', type=int, default=1000)
+    parser.add_argument('--window', type=int, default=500)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+    sys.exit(main(args.symbols, args.candles, args.window, args.seed))
@@ -0,0 +1,105 @@
+"""
+Walk-forward and Monte Carlo robustness analysis: cold, cached and incremental runs.
+
+Runs WalkForward over synthetic 15m klines on one worker and on --workers
+processes, then again on the warm cache (nothing should be computed) and
+after appending candles (only the new windows should be). Times
+monte_carlo on the out-of-sample ledger inline and on a process pool.
+Checks the parallel windows match the serial ones, cached and incremental
+runs match a fresh run, and the Monte Carlo draws don't depend on the
+number of workers. Prints the stability metrics and the drawdown and
+return distributions. Exits non-zero on any mismatch.
+
+    python -m benchmarks.robustness --candles 60000 --workers 8
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+from benchmarks.backtest_parity import synthetic_klines
+from utils.backtest.robustness import ResultCache, WalkForward, monte_carlo
+
+GRID = {'rsi_oversold': [20, 25, 30, 35], 'rsi_reentry_high': [35, 40, 45], 'bandwidth_roc_threshold': [0.0, 0.15]}
+
+
+def walk_forward(klines, workers, cache, train, test, runs):
+    analysis = WalkForward(GRID, train, test, workers=workers, cache=ResultCache(cache), runs=runs)
+    begin = time.perf_counter()
+    result = analysis.run(klines)
+    return result, time.perf_counter() - begin
+
+
+def head(klines, count):
+    return {name: column[:count] for name, column in klines.items()}
+
+
+def main(candles, appended, workers, train, test, runs, seed):
+    klines = synthetic_klines(candles + appended, seed)
+    failures = []
+    combinations = int(np.prod([len(values) for values in GRID.values()]))
+    print(f"{candles} candles, windows of {train} + {test}, {combinations} combinations, {os.cpu_count()} cpu(s)")
+    with tempfile.TemporaryDirectory() as root:
+        serial, serial_seconds = walk_forward(head(klines, candles), 1, os.path.join(root, 'serial'), train, test, runs)
+        parallel, parallel_seconds = walk_forward(head(klines, candles), workers, os.path.join(root, 'cache'), train, test, runs)
+        cached, cached_seconds = walk_forward(head(klines, candles), workers, os.path.join(root, 'cache'), train, test, runs)
+        grown, grown_seconds = walk_forward(klines, workers, os.path.join(root, 'cache'), train, test, runs)
+        fresh, _ = walk_forward(klines, workers, os.path.join(root, 'fresh'), train, test, runs)
+
+    windows = len(parallel.windows)
+    new_windows = len(grown.windows) - windows
+    print(f"{'run':<34} {'seconds':>8} {'backtests run':>14}")
+    for name, result, seconds in (('cold, 1 worker', serial, serial_seconds),
+                                  (f'cold, {workers} workers', parallel, parallel_seconds),
+                                  ('cached rerun', cached, cached_seconds),
+                                  (f'{appended} candles appended (+{new_windows} windows)', grown, grown_seconds)):
+        print(f"{name:<34} {seconds:>8.2f} {result.computed:>14}")
+
+    if not parallel.windows.equals(serial.windows):
+        failures.append("parallel windows differ from the serial run")
+    if cached.computed != 0 or not cached.windows.equals(parallel.windows):
+        failures.append(f"cached rerun computed {cached.computed} backtests or differs")
+    if grown.computed != new_windows * (combinations + 1):
+        failures.append(f"after appending, {grown.computed} backtests ran, expected {new_windows * (combinations + 1)}")
+    if not grown.windows.equals(fresh.windows) or not np.array_equal(grown.ledger, fresh.ledger):
+        failures.append("incremental run differs from a fresh run over the same candles")
+
+    ledger = fresh.ledger
+    begin = time.perf_counter()
+    inline = monte_carlo(ledger, fresh.initial_balance, runs, seed=seed)
+    inline_seconds = time.perf_counter() - begin
+    with ProcessPoolExecutor(workers) as pool:
+        begin = time.perf_counter()
+        pooled = monte_carlo(ledger, fresh.initial_balance, runs, seed=seed, pool=pool)
+        pooled_seconds = time.perf_counter() - begin
+    print(f"monte carlo, {runs} runs x 2 methods over {len(ledger)} trades: {inline_seconds:.2f} s inline, "
+          f"{pooled_seconds:.2f} s on {workers} workers")
+    if any(not np.array_equal(inline.columns[name], pooled.columns[name]) for name in inline.columns):
+        failures.append("monte carlo draws depend on the pool")
+
+    print("stability: " + ", ".join(f"{name} {value:.3g}" for name, value in fresh.stability().items()))
+    summary = fresh.monte_carlo.summary()
+    for name in ('shuffle_max_drawdown', 'bootstrap_max_drawdown', 'bootstrap_return'):
+        print(f"{name:<24} " + "  ".join(f"{q} {value:+.4f}" for q, value in summary[name].items()))
+    print(f"bootstrap loss probability {summary['bootstrap_loss_probability']:.3f}")
+
+    if failures:
+        print("MISMATCH:\n  " + "\n  ".join(failures))
+        return 1
+    print("parallel, cached and incremental runs match, monte carlo draws are the same on any pool")
+    return 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--candles', type=int, default=60_000)
+    parser.add_argument('--appended', type=int, default=4_000)
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1)
+    parser.add_argument('--train', type=int, default=8_000)
+    parser.add_argument('--test', type=int, default=2_000)
+    parser.add_argument('--runs', type=int, default=10_000)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+    sys.exit(main(args.candles, args.appended, args.workers, args.train, args.test, args.runs, args.seed))
@@ -0,0 +1,55 @@
+"""
+Write and read throughput of the kline store.
+
+Pushes `--years` of 1m candles for one symbol through PersistenceWriter (the
+same queue the bot uses), closes it, then times KlineStore.read() for the
+whole range. The read should stay well under a second for multiple years.
+
+    python -m benchmarks.store_read --years 3
+"""
+import argparse
+import tempfile
+import time
+import numpy as np
+from utils.data.kline_window import KLINE_COLUMNS
+from utils.data.store import KlineStore, PersistenceWriter
+
+MINUTE_MS = 60 * 1000
+
+
+def main(years, symbol='BTCUSDT'):
+    candles = int(years * 365 * 24 * 60)
+    rng = np.random.default_rng(0)
+    close = 30000 * np.exp(np.cumsum(rng.normal(0, 0.001, candles)))
+    rows = np.column_stack([
+        1_600_000_000_000 + np.arange(candles) * MINUTE_MS,
+        close, close * 1.001, close * 0.999, close, rng.random(candles),
+        np.full((candles, len(KLINE_COLUMNS) - 6), np.nan),
+    ]).tolist()
+
+    with tempfile.TemporaryDirectory() as root:
+        writer = PersistenceWriter(root, flush_rows=50_000)
+        start = time.perf_counter()
+        for row in rows:
+            writer.write_kline(symbol, row)
+        enqueued = time.perf_counter() - start
+        writer.close()
+        written = time.perf_counter() - start
+
+        store = KlineStore(root)
+        start = time.perf_counter()
+        klines = store.read(symbol)
+        read = time.perf_counter() - start
+        assert len(klines['close']) == candles and np.array_equal(klines['close'], close)
+
+    print(f"candles:      {candles:,}")
+    print(f"enqueue:      {enqueued:7.3f}s  {candles / enqueued:>12,.0f} rows/s on the caller thread")
+    print(f"write+close:  {written:7.3f}s")
+    print(f"read:         {read:7.3f}s  {candles / read:>12,.0f} rows/s")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--years', type=float, default=3)
+    args = parser.parse_args()
+    main(args.years)
@@ -0,0 +1,78 @@
+"""
+StrategyGraph: shared indicator nodes vs one indicator set per strategy.
+
+Builds 1, 10 and 50 RsiBbExpansion variants over a few RSI periods and
+Bollinger windows, then streams synthetic candles through one StrategyGraph
+holding all of them (each distinct indicator computed once) and through one
+graph per strategy (what running the strategies side by side used to cost).
+Prints the node count and per-candle cost of both, and checks that the
+streamed signals match StrategyGraph.signals over the whole history. Exits
+non-zero on any mismatch.
+
+    python -m benchmarks.strategy_graph --candles 5000
+"""
+import argparse
+import itertools
+import logging
+import sys
+import time
+from benchmarks.backtest_parity import synthetic_klines
+from utils.signals.graph import StrategyGraph, RsiBbExpansion
+
+SOURCES = ('open', 'high', 'low', 'close', 'volume')
+
+
+def variants(count):
+    # a handful of indicator settings, many threshold combinations on top of them
+    settings = itertools.cycle(itertools.product((14, 21), (20, 30), (20, 25, 30), (0.10, 0.15)))
+    return [RsiBbExpansion(f'variant_{i}', rsi_period=rsi_period, bb_window=bb_window, rsi_oversold=oversold,
+                           bandwidth_roc_threshold=roc)
+            for i, (rsi_period, bb_window, oversold, roc) in zip(range(count), settings)]
+
+
+def stream(graphs, candles):
+    fired = {}
+    start = time.perf_counter()
+    for i, candle in enumerate(candles):
+        for graph in graphs:
+            graph.update(candle)
+            for name in graph.evaluate():
+                fired.setdefault(name, []).append(i)
+    return fired, time.perf_counter() - start
+
+
+def main(count, seed):
+    klines = synthetic_klines(count, seed)
+    candles = [dict(zip(SOURCES, values)) for values in zip(*(klines[name].tolist() for name in SOURCES))]
+    logging.disable(logging.INFO)
+
+    failures = []
+    print(f"{'strategies':>10} {'shared nodes':>13} {'separate nodes':>15} {'shared us/candle':>17} {'separate us/candle':>19}")
+    for strategies in (1, 10, 50):
+        shared = StrategyGraph(variants(strategies))
+        separate = [StrategyGraph([strategy]) for strategy in variants(strategies)]
+        shared_fired, shared_seconds = stream([shared], candles)
+        separate_fired, separate_seconds = stream(separate, candles)
+        print(f"{strategies:>10} {len(shared):>13} {sum(len(graph) for graph in separate):>15} "
+              f"{shared_seconds / count * 1e6:>17.1f} {separate_seconds / count * 1e6:>19.1f}")
+
+        batch = StrategyGraph(variants(strategies)).signals(klines)
+        for strategy in shared.strategies:
+            streamed = shared_fired.get(strategy.name, [])
+            if streamed != separate_fired.get(strategy.name, []) or streamed != list(batch[strategy.name]):
+                failures.append(f"{strategies} strategies, {strategy.name}: streamed {streamed[:5]} batch {list(batch[strategy.name])[:5]}")
+    logging.disable(logging.NOTSET)
+
+    if failures:
+        print("MISMATCH:\n  " + "\n  ".join(failures))
+        return 1
+    print("shared, separate and batch signals agree")
+    return 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--candles', type=int, default=5000)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+    sys.exit(main(args.candles, args.seed))
@@ -0,0 +1,100 @@
+"""
+SupportResistance: monotonic deques vs the old pandas implementation.
+
+Runs the same random candles through the previous SupportResistance (list
+pop(0) plus two pd.Series and a rolling max/min per candle), the deque-based
+class and support_resistance_batch, then times find_support_resistance against
+the old rolling(center=True).apply version. All results must agree; exits
+non-zero if they don't.
+
+    python -m benchmarks.support_resistance --candles 20000 --window 14
+"""
+import argparse
+import sys
+import time
+import numpy as np
+import pandas as pd
+from utils.indicators.sup_res import SupportResistance, find_support_resistance, support_resistance_batch
+
+
+class PandasSupportResistance:
+    # the implementation SupportResistance replaced, kept here as the reference
+    def __init__(self, window=14):
+        self.window = window
+        self.highs = []
+        self.lows = []
+
+    def update(self, new_high, new_low):
+        self.highs.append(new_high)
+        self.lows.append(new_low)
+        if len(self.highs) > self.window:
+            self.highs.pop(0)
+            self.lows.pop(0)
+        resistance = pd.Series(self.highs).rolling(window=self.window).max().iloc[-1]
+        support = pd.Series(self.lows).rolling(window=self.window).min().iloc[-1]
+        return support, resistance
+
+
+def pandas_find_support_resistance(prices, window=14):
+    minima = prices['low'].rolling(window=window, center=True).apply(
+        lambda x: np.nan if np.nanmin(x) != x[int(window / 2)] else np.nanmin(x), raw=True)
+    maxima = prices['high'].rolling(window=window, center=True).apply(
+        lambda x: np.nan if np.nanmax(x) != x[int(window / 2)] else np.nanmax(x), raw=True)
+    return pd.DataFrame({'support': minima.dropna(), 'resistance': maxima.dropna()})
+
+
+def candles(count, seed):
+    rng = np.random.default_rng(seed)
+    close = np.round(30000 * np.exp(np.cumsum(rng.normal(0, 0.003, count))), 2)
+    spread = np.round(np.abs(rng.normal(0, 0.002, count)) * close, 2)
+    return close + spread, close - spread
+
+
+def timed(fn):
+    start = time.perf_counter()
+    result = fn()
+    return result, time.perf_counter() - start
+
+
+def stream(sr, highs, lows):
+    return np.array([sr.update(high, low) for high, low in zip(highs.tolist(), lows.tolist())]).T
+
+
+def main(count, window, seed):
+    highs, lows = candles(count, seed)
+    (old_support, old_resistance), old_seconds = timed(lambda: stream(PandasSupportResistance(window), highs, lows))
+    (support, resistance), new_seconds = timed(lambda: stream(SupportResistance(window), highs, lows))
+    (batch_support, batch_resistance), batch_seconds = timed(lambda: support_resistance_batch(highs, lows, window))
+
+    frame = pd.DataFrame({'high': highs, 'low': lows})
+    old_levels, old_find_seconds = timed(lambda: pandas_find_support_resistance(frame, window))
+    levels, find_seconds = timed(lambda: find_support_resistance(frame, window))
+
+    print(f"{'':<28} {'seconds':>10} {'us/candle':>10}")
+    for name, seconds in (('pandas update()', old_seconds), ('deque update()', new_seconds),
+                          ('support_resistance_batch', batch_seconds),
+                          ('pandas find_support_res.', old_find_seconds), ('find_support_resistance', find_seconds)):
+        print(f"{name:<28} {seconds:>10.4f} {seconds / count * 1e6:>10.3f}")
+
+    failures = []
+    for name, values, expected in (('support', support, old_support), ('resistance', resistance, old_resistance),
+                                   ('batch support', batch_support, old_support),
+                                   ('batch resistance', batch_resistance, old_resistance)):
+        if not np.array_equal(values, expected, equal_nan=True):
+            failures.append(name)
+    if not levels.equals(old_levels):
+        failures.append('find_support_resistance')
+    if failures:
+        print("MISMATCH: " + ", ".join(failures))
+        return 1
+    print(f"all implementations agree ({len(levels)} local levels)")
+    return 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--candles', type=int, default=20_000)
+    parser.add_argument('--window', type=int, default=14)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+    sys.exit(main(args.candles, args.window, args.seed))
@@ -0,0 +1,115 @@
+"""
+Trade-stream bar aggregation: replay recorded trades and measure throughput.
+
+Loads a binance trade dump (--file) or writes a synthetic one to a temporary
+file and loads it back, then replays the trades through each bar type
+(time, tick, volume, dollar) one trade at a time, checks the streamed time
+bars against time_bars() over the whole history, and finally feeds raw trade
+messages through Bot.handle_trade_message (PaperClient, inline orders,
+klines persisted to a temporary directory) to time the full path from trade
+message to finished bar, indicators and trigger. Exits non-zero if the
+streamed and batch bars differ.
+
+    python -m benchmarks.trade_bars --trades 1000000
+    python -m benchmarks.trade_bars --file BTCUSDT-trades-2024-01-01.csv
+"""
+import argparse
+import logging
+import os
+import sys
+import tempfile
+import time
+import numpy as np
+import pandas as pd
+from utils.backtest.engine import PaperClient
+from utils.bot import Bot
+from utils.data.bars import DollarBars, TickBars, TimeBars, VolumeBars, load_trades, time_bars
+from utils.data.store import PersistenceWriter
+from utils.safety.order_executor import OrderExecutor
+
+
+def synthetic_trades(path, count, seed):
+    # a binance-style dump: about 200 trades a second, random walk prices, heavy-tailed sizes
+    rng = np.random.default_rng(seed)
+    timestamps = 1_700_000_000_000 + np.cumsum(rng.exponential(5, count)).astype(np.int64)
+    prices = np.round(30000 * np.exp(np.cumsum(rng.normal(0, 0.0002, count))), 2)
+    quantities = np.round(rng.lognormal(-6, 1.5, count), 6) + 0.00001
+    pd.DataFrame({
+        'id': np.arange(count), 'price': prices, 'qty': quantities, 'quote_qty': np.round(prices * quantities, 8),
+        'time': timestamps, 'is_buyer_maker': rng.random(count) < 0.5, 'is_best_match': True,
+    }).to_csv(path, header=False, index=False)
+
+
+def replay(bars, rows):
+    emitted = []
+    start = time.perf_counter()
+    for timestamp, price, quantity in rows:
+        bar = bars.add(timestamp, price, quantity)
+        if bar is not None:
+            emitted.append(bar)
+    seconds = time.perf_counter() - start
+    last = bars.flush()
+    if last is not None:
+        emitted.append(last)
+    return emitted, seconds
+
+
+def replay_bot(trades, count, root):
+    logging.disable(logging.INFO)
+    client = PaperClient()
+    bot = Bot('BTCUSDT', '1m', None, None, client=client, writer=PersistenceWriter(root=root),
+              executor=OrderExecutor(client, max_workers=0), bars=TimeBars('1m'))
+    messages = [{'e': 'trade', 's': 'BTCUSDT', 'p': repr(price), 'q': repr(quantity), 'T': timestamp}
+                for timestamp, price, quantity in zip(trades['timestamp'][:count].tolist(), trades['price'][:count].tolist(),
+                                                      trades['quantity'][:count].tolist())]
+    start = time.perf_counter()
+    for msg in messages:
+        bot.handle_trade_message(msg)
+    seconds = time.perf_counter() - start
+    bot.close()
+    logging.disable(logging.NOTSET)
+    return len(messages), bot.bars.count, seconds
+
+
+def main(path, count, bot_trades, seed):
+    with tempfile.TemporaryDirectory() as workdir:
+        if path is None:
+            path = os.path.join(workdir, 'trades.csv')
+            synthetic_trades(path, count, seed)
+        start = time.perf_counter()
+        trades = load_trades(path)
+        load_seconds = time.perf_counter() - start
+        rows = list(zip(trades['timestamp'].tolist(), trades['price'].tolist(), trades['quantity'].tolist()))
+        print(f"{len(rows):,} trades loaded in {load_seconds:.2f}s")
+
+        quote_per_minute = float((trades['price'] * trades['quantity']).sum()) / max(len(time_bars(trades, '1m')['time']), 1)
+        print(f"{'':<22} {'bars':>8} {'trades/s':>12} {'ns/trade':>9}")
+        streamed = None
+        for name, bars in (('time 1m', TimeBars('1m')), ('tick 1000', TickBars(1000)),
+                           ('volume', VolumeBars(float(trades['quantity'].sum()) / 500)),
+                           ('dollar', DollarBars(quote_per_minute))):
+            emitted, seconds = replay(bars, rows)
+            streamed = emitted if streamed is None else streamed
+            print(f"{name:<22} {len(emitted):>8} {len(rows) / seconds:>12,.0f} {seconds / len(rows) * 1e9:>9.0f}")
+
+        messages, bars, seconds = replay_bot(trades, min(bot_trades, len(rows)), workdir)
+        print(f"{'Bot trade messages':<22} {bars:>8} {messages / seconds:>12,.0f} {seconds / messages * 1e9:>9.0f}")
+
+    batch = time_bars(trades, '1m')
+    failures = [name for name, values in batch.items()
+                if not np.allclose(values, [bar[name] for bar in streamed], rtol=1e-12)]
+    if failures:
+        print("MISMATCH between streamed and batch time bars: " + ", ".join(failures))
+        return 1
+    print(f"streamed and batch time bars agree ({len(streamed)} bars)")
+    return 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--file', default=None, help='binance trade dump, synthetic trades when omitted')
+    parser.add_argument('--trades', type=int, default=1_000_000)
+    parser.add_argument('--bot-trades', type=int, default=200_000)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+    sys.exit(main(args.file, args.trades, args.bot_trades, args.seed))
@@ -0,0 +1,173 @@
+"""
+Warm start: snapshot cost, restore time and signal continuity across restarts.
+
+Streams synthetic klines through one Bot that never stops (the reference) and
+through a chain of Bots that are stopped every --every candles: each writes a
+snapshot, the next one is created from scratch, misses a few candles (the
+"deploy"), restores from the snapshot and catches up through the live path.
+Prints what a snapshot costs (capture, write, size, load) and how long a
+warm start takes next to a cold one, then checks every restarted bot had the
+reference's window (candles and indicators) as soon as it caught up, that the
+chain fired on exactly the reference's candles and that it ends with the same
+open orders. Exits non-zero if it doesn't.
+
+    python -m benchmarks.warm_start --candles 20000 --every 2000
+"""
+import argparse
+import logging
+import os
+import sys
+import tempfile
+import time
+import numpy as np
+from benchmarks.backtest_parity import INTERVAL_MS, synthetic_klines
+from utils.bot import Bot
+from utils.data.fake_client import FakeClient
+from utils.data.kline_cache import KlineCache
+from utils.data.snapshot import SnapshotStore, load_snapshot
+from utils.data.store import PersistenceWriter
+from utils.safety.order_executor import OrderExecutor
+
+HISTORY = 59
+
+
+def message(klines, i):
+    return {'k': {
+        't': int(klines['timestamp'][i]),
+        'o': repr(float(klines['open'][i])),
+        'h': repr(float(klines['high'][i])),
+        'l': repr(float(klines['low'][i])),
+        'c': repr(float(klines['close'][i])),
+        'v': repr(float(klines['volume'][i])),
+        'T': int(klines['timestamp'][i]) + INTERVAL_MS - 1,
+        'x': True,
+    }}
+
+
+def new_bot(klines, upto, root, snapshots=None):
+    # a bot whose exchange has closed candles up to `upto`, the next one has just opened
+    client = FakeClient(now_ms=int(klines['timestamp'][upto]) + INTERVAL_MS)
+    client.add_klines('BTCUSDT', '15m', klines)
+    bot = Bot('BTCUSDT', '15m', None, None, client=client, writer=PersistenceWriter(root=os.path.join(root, 'data')),
+              kline_cache=KlineCache(client, root=os.path.join(root, 'cache')),
+              executor=OrderExecutor(client, max_workers=0), snapshots=snapshots)
+    return bot
+
+
+def record_signals(bot, signals):
+    # note the candle of every signal, whichever graph the bot holds after a restore
+    check_signal = bot.check_signal
+
+    def recording_check_signal():
+        graph = bot.graph
+        evaluate = graph.evaluate
+
+        def recording_evaluate():
+            fired = evaluate()
+            if fired:
+                signals.append(int(bot.kline_data['timestamp'][-1]))
+            return fired
+        graph.evaluate = recording_evaluate
+        try:
+            check_signal()
+        finally:
+            del graph.evaluate
+    bot.check_signal = recording_check_signal
+
+
+def open_orders(bot):
+    return [(order['quantity'], order['stop_loss'], order['take_profit'], order['status'])
+            for order in bot.order_calculator.positions.open_orders(bot.symbol)]
+
+
+def main(count, every, missed, seed):
+    klines = synthetic_klines(count, seed)
+    rng = np.random.default_rng(seed)
+    logging.disable(logging.INFO)
+    with tempfile.TemporaryDirectory() as root:
+        snapshots = SnapshotStore(os.path.join(root, 'snapshots'))
+        signals, captures, writes, loads, warm, cold = [], [], [], [], [], []
+        resumed = {}  # last candle -> window right after a restore and catch up
+        bot = new_bot(klines, HISTORY, os.path.join(root, 'chain'), snapshots)
+        bot.fetch_historical_data()
+        record_signals(bot, signals)
+        i = HISTORY + 1
+        while i < count:
+            stop = min(i + every, count)
+            for i in range(i, stop):
+                bot.handle_socket_message(message(klines, i))
+            i = stop
+            if i >= count:
+                break
+
+            start = time.perf_counter()
+            bot.capture_state()
+            captures.append(time.perf_counter() - start)
+            start = time.perf_counter()
+            snapshots.save(bot)
+            writes.append(time.perf_counter() - start)
+            bot.close()
+            start = time.perf_counter()
+            load_snapshot(snapshots.path(bot.symbol))
+            loads.append(time.perf_counter() - start)
+
+            # the next process starts while the exchange has already moved on a few candles
+            gap = min(int(rng.integers(0, missed + 1)), count - 1 - i)
+            bot = new_bot(klines, i + gap, os.path.join(root, 'chain'), snapshots)
+            start = time.perf_counter()
+            record_signals(bot, signals)
+            bot.fetch_historical_data()
+            warm.append(time.perf_counter() - start)
+            resumed[int(klines['timestamp'][i + gap])] = bot.kline_data.values().copy()
+            i += gap + 1
+
+            cold_bot = new_bot(klines, i - 1, os.path.join(root, 'cold'))
+            start = time.perf_counter()
+            cold_bot.fetch_historical_data()
+            cold.append(time.perf_counter() - start)
+            cold_bot.close()
+        bot.close()
+
+        reference_signals, windows_differ = [], []
+        reference = new_bot(klines, HISTORY, os.path.join(root, 'reference'))
+        reference.fetch_historical_data()
+        record_signals(reference, reference_signals)
+        for i in range(HISTORY + 1, count):
+            reference.handle_socket_message(message(klines, i))
+            window = resumed.get(int(klines['timestamp'][i]))
+            if window is not None and (window.shape != reference.kline_data.values().shape
+                                       or not np.allclose(window, reference.kline_data.values(), rtol=1e-9, equal_nan=True)):
+                windows_differ.append(i)
+        reference.close()
+        size = os.path.getsize(snapshots.path(bot.symbol))
+    logging.disable(logging.NOTSET)
+
+    print(f"candles: {count}  restarts: {len(warm)}  signals: {len(reference_signals)}")
+    print(f"snapshot: {size / 1024:.1f} KiB, capture {np.median(captures) * 1e3:.2f} ms, "
+          f"write {np.median(writes) * 1e3:.2f} ms, load {np.median(loads) * 1e3:.2f} ms")
+    print(f"start up: warm {np.median(warm) * 1e3:.2f} ms (restore + catch up), cold {np.median(cold) * 1e3:.2f} ms (fetch + seed)")
+
+    failures = []
+    if signals != reference_signals:
+        failures.append(f"signals differ: restarted {signals[:10]} reference {reference_signals[:10]}")
+    if windows_differ:
+        failures.append(f"window after catching up differs at candles {windows_differ}")
+    if not np.allclose(bot.kline_data.values(), reference.kline_data.values(), rtol=1e-9, equal_nan=True):
+        failures.append("final kline windows differ")
+    if open_orders(bot) != open_orders(reference):
+        failures.append(f"open orders differ: {open_orders(bot)} vs {open_orders(reference)}")
+    if failures:
+        print("MISMATCH:\n  " + "\n  ".join(failures))
+        return 1
+    print("restarted bots fired on the same candles as the uninterrupted one")
+    return 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--candles', type=int, default=20_000)
+    parser.add_argument('--every', type=int, default=2_000)
+    parser.add_argument('--missed', type=int, default=5, help='most candles a restart misses')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+    sys.exit(main(args.candles, args.every, args.missed, args.seed))
@@ -0,0 +1,91 @@
+import numpy as np
+from utils.backtest.engine import PaperClient
+from utils.bot import Bot
+from utils.data.feeds import ReplayFeed
+from utils.safety.order_executor import OrderExecutor
+from utils.signals.graph import RsiBbExpansion
+
+INTERVAL_MS = 15 * 60 * 1000
+HISTORY = 60  # candles of every market() symbol that are history, the rest are replayed
+
+
+def synthetic_klines(candles, seed=0):
+    # random walk with volatility bursts, so the oversold/expansion setups actually occur
+    rng = np.random.default_rng(seed)
+    vol = np.where(rng.random(candles) < 0.02, 6.0, 1.0)
+    vol = np.convolve(vol, np.ones(8) / 8, mode='same')
+    close = np.round(30000 * np.exp(np.cumsum(rng.normal(0, 0.004, candles) * vol)), 2)
+    open_ = np.round(np.r_[close[0], close[:-1]] * (1 + rng.normal(0, 0.001, candles)), 2)
+    high = np.maximum(open_, close) * (1 + np.abs(rng.normal(0, 0.001, candles)))
+    low = np.minimum(open_, close) * (1 - np.abs(rng.normal(0, 0.001, candles)))
+    return {
+        'timestamp': 1_600_000_000_000 + np.arange(candles, dtype=np.int64) * INTERVAL_MS,
+        'open': open_,
+        'high': np.round(high, 2),
+        'low': np.round(low, 2),
+        'close': close,
+        'volume': np.round(rng.random(candles) * 10, 3),
+    }
+
+
+def kline_message(klines, i):
+    # candle i as a closed kline off the websocket
+    return {'k': {
+        't': int(klines['timestamp'][i]),
+        'o': repr(float(klines['open'][i])),
+        'h': repr(float(klines['high'][i])),
+        'l': repr(float(klines['low'][i])),
+        'c': repr(float(klines['close'][i])),
+        'v': repr(float(klines['volume'][i])),
+        'T': int(klines['timestamp'][i]) + INTERVAL_MS - 1,
+        'x': True,
+    }}
+
+
+def replay_live(klines, strategies=None):
+    # -> candles a signal fired on, trades and the (rsi, upper, middle, lower) row of every candle of a live Bot
+    client = PaperClient()
+    # orders are sent inline so fills land on the candle that triggered them, like the backtester
+    bot = Bot('BTCUSDT', '15m', None, None, client=client, executor=OrderExecutor(client, max_workers=0),
+              strategies=strategies)
+    signals, trades = [], []
+    evaluate = bot.graph.evaluate
+
+    def recording_evaluate():
+        fired = evaluate()
+        if fired:
+            signals.append(i)
+        return fired
+    bot.graph.evaluate = recording_evaluate
+
+    indicators = np.empty((len(klines['close']), 4))
+    for i in range(len(klines['close'])):
+        before = bot.order_calculator.active_order
+        bot.handle_socket_message(kline_message(klines, i))
+        after = bot.order_calculator.active_order
+        if before is not None and after is not before:
+            trades[-1]['exit_index'] = i
+        if after is not None and after is not before:
+            trades.append({'entry_index': i, 'quantity': after['quantity'], 'stop_loss': after['stop_loss'],
+                           'take_profit': after['take_profit'], 'exit_index': -1})
+        row = bot.kline_data.row()
+        indicators[i] = row['rsi'], row['UpperBB'], row['MiddleBB'], row['LowerBB']
+    bot.close()
+    return signals, trades, indicators
+
+
+def strategies():
+    return [RsiBbExpansion('loose', rsi_oversold=35, rsi_reentry_low=35, rsi_reentry_high=55, bandwidth_roc_threshold=0.0)]
+
+
+def market(count, candles, seed):
+    return {f'S{i:03d}USDT': synthetic_klines(HISTORY + candles, seed + i) for i in range(count)}
+
+
+def new_feed(klines, speed):
+    # replays every candle of `klines` after the first HISTORY
+    symbol = next(iter(klines))
+    feed = ReplayFeed(speed=speed, start=int(klines[symbol]['timestamp'][HISTORY]))
+    for symbol, data in klines.items():
+        feed.add_klines(symbol, '15m', data)
+    return feed
@@ -0,0 +1,40 @@
+import logging
+import numpy as np
+import pytest
+from tests.conftest import replay_live, synthetic_klines
+from utils.backtest.engine import Backtester
+from utils.signals.graph import RsiBbExpansion
+from utils.signals.trigger import Triggers
+
+# thresholds that fire often enough to give a couple of dozen trades on a short series
+LOOSE = {'rsi_oversold': 35, 'rsi_reentry_low': 35, 'rsi_reentry_high': 55, 'bandwidth_roc_threshold': 0.0}
+
+COLUMNS = ['entry_index', 'quantity', 'stop_loss', 'take_profit', 'exit_index']
+
+
+@pytest.fixture
+def live(tmp_path, monkeypatch):
+    # the live path persists klines and orders under ./data
+    monkeypatch.chdir(tmp_path)
+    logging.disable(logging.INFO)
+    yield replay_live
+    logging.disable(logging.NOTSET)
+
+
+@pytest.mark.parametrize('params, seed', [({}, 1), (LOOSE, 0), (LOOSE, 3)])
+def test_backtester_matches_live_path(live, params, seed):
+    klines = synthetic_klines(3000, seed)
+    result = Backtester(**params).run(klines)
+    live_signals, live_trades, live_indicators = live(klines, [RsiBbExpansion(**params)])
+
+    batch_indicators = np.column_stack([result.indicators[name] for name in ('rsi', 'UpperBB', 'MiddleBB', 'LowerBB')])
+    np.testing.assert_allclose(live_indicators, batch_indicators, rtol=1e-9, atol=1e-9, equal_nan=True)
+
+    batch_signals = Triggers(**params).rsi_and_bb_expansion_signals(
+        klines['open'], klines['close'], result.indicators['LowerBB'], result.indicators['rsi'], result.indicators['bandwidth_roc'])
+    assert list(batch_signals) == live_signals
+
+    batch_trades = result.trades[COLUMNS].to_dict('records')
+    assert len(batch_trades) == len(live_trades) > 0
+    for batch, streamed in zip(batch_trades, live_trades):
+        np.testing.assert_allclose([batch[c] for c in COLUMNS], [streamed[c] for c in COLUMNS])
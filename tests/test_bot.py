@@ -0,0 +1,52 @@
+import logging
+import pytest
+from tests.conftest import synthetic_klines
+from utils.backtest.engine import PaperClient
+from utils.bot import Bot
+from utils.data.fake_client import FakeClient
+from utils.data.kline_cache import KlineCache
+from utils.data.store import PersistenceWriter
+from utils.safety.order_executor import OrderExecutor
+
+INTERVAL_MS = 15 * 60 * 1000
+
+
+@pytest.fixture(autouse=True)
+def quiet():
+    logging.disable(logging.INFO)
+    yield
+    logging.disable(logging.NOTSET)
+
+
+def message(open_time, close, closed):
+    return {'k': {'t': open_time, 'o': close, 'h': close, 'l': close, 'c': close, 'v': '1',
+                  'T': open_time + INTERVAL_MS - 1, 'x': closed}}
+
+
+def new_bot(client, tmp_path):
+    return Bot('BTCUSDT', '15m', None, None, client=client, writer=PersistenceWriter(root=str(tmp_path / 'data')),
+               kline_cache=KlineCache(client, root=str(tmp_path / 'cache')), executor=OrderExecutor(client, max_workers=0))
+
+
+def test_only_closed_klines_reach_the_window(tmp_path):
+    bot = new_bot(PaperClient(), tmp_path)
+    bot.handle_socket_message(message(0, '100', False))
+    bot.handle_socket_message(message(0, '101', False))
+    assert len(bot.kline_data) == 0
+    bot.handle_socket_message(message(0, '102', True))
+    bot.handle_socket_message(message(0, '102', True))  # sent again, e.g. after a reconnect
+    bot.handle_socket_message(message(INTERVAL_MS, '103', False))
+    assert bot.kline_data['close'].tolist() == [102.0]
+    bot.close()
+
+
+def test_history_leaves_the_open_candle_to_the_stream(tmp_path):
+    klines = synthetic_klines(100)
+    client = FakeClient(now_ms=int(klines['timestamp'][80]) + INTERVAL_MS // 2)  # candle 80 is open
+    client.add_klines('BTCUSDT', '15m', klines)
+    bot = new_bot(client, tmp_path)
+    bot.fetch_historical_data()
+    assert bot.kline_data['timestamp'][-1] == klines['timestamp'][79]
+    bot.handle_socket_message(message(int(klines['timestamp'][80]), repr(float(klines['close'][80])), True))
+    assert bot.kline_data['timestamp'][-1] == klines['timestamp'][80]
+    bot.close()
@@ -0,0 +1,155 @@
+import numpy as np
+import pytest
+from utils.indicators.atr import ATR, atr_batch
+from utils.indicators.bollinger_bands import BollingerBands, bollinger_bands_batch, bandwidth_roc_batch
+from utils.indicators.macd import MACD, macd_batch
+from utils.indicators.moving_average import EMA, SMA, ema_batch, sma_batch
+from utils.indicators.rsi import WilderRSI, wilder_rsi_batch
+from utils.indicators.stochastic import Stochastic, stochastic_batch
+
+RTOL = 1e-9
+
+
+def _bollinger_update(bands, high, low, close):
+    upper, middle, lower = bands.update(close)
+    if upper is None:
+        return np.nan, np.nan, np.nan, np.nan
+    roc = bands.calculate_bandwidth_roc()
+    return upper, middle, lower, np.nan if roc is None else roc
+
+
+def _bollinger_batch(high, low, close, window, num_of_std):
+    upper, middle, lower, band_width = bollinger_bands_batch(close, window, num_of_std)
+    return upper, middle, lower, bandwidth_roc_batch(band_width)
+
+
+# name -> (parameter sets, new streaming instance, update on one candle, seed on arrays, batch on arrays)
+INDICATORS = {
+    'sma': ([{'period': 1}, {'period': 5}, {'period': 20}],
+            lambda p: SMA(p['period']),
+            lambda o, h, l, c: (o.update(c),),
+            lambda o, h, l, c: (o.seed(c),),
+            lambda h, l, c, p: (sma_batch(c, p['period']),)),
+    'ema': ([{'period': 1}, {'period': 5}, {'period': 20}],
+            lambda p: EMA(p['period']),
+            lambda o, h, l, c: (o.update(c),),
+            lambda o, h, l, c: (o.seed(c),),
+            lambda h, l, c, p: (ema_batch(c, p['period']),)),
+    'wilder_rsi': ([{'period': 2}, {'period': 14}],
+                   lambda p: WilderRSI(p['period']),
+                   lambda o, h, l, c: (o.update(c),),
+                   lambda o, h, l, c: (o.seed(c),),
+                   lambda h, l, c, p: (wilder_rsi_batch(c, p['period']),)),
+    'macd': ([{'fast': 3, 'slow': 7, 'signal': 4}, {'fast': 12, 'slow': 26, 'signal': 9}],
+             lambda p: MACD(p['fast'], p['slow'], p['signal']),
+             lambda o, h, l, c: o.update(c),
+             lambda o, h, l, c: o.seed(c),
+             lambda h, l, c, p: macd_batch(c, p['fast'], p['slow'], p['signal'])),
+    'atr': ([{'period': 1}, {'period': 14}],
+            lambda p: ATR(p['period']),
+            lambda o, h, l, c: (o.update(h, l, c),),
+            lambda o, h, l, c: (o.seed(h, l, c),),
+            lambda h, l, c, p: (atr_batch(h, l, c, p['period']),)),
+    'stochastic': ([{'k_period': 1, 'd_period': 1}, {'k_period': 14, 'd_period': 3}],
+                   lambda p: Stochastic(p['k_period'], p['d_period']),
+                   lambda o, h, l, c: o.update(h, l, c),
+                   lambda o, h, l, c: o.seed(h, l, c),
+                   lambda h, l, c, p: stochastic_batch(h, l, c, p['k_period'], p['d_period'])),
+    'bollinger': ([{'window': 2, 'num_of_std': 1.5}, {'window': 20, 'num_of_std': 2}],
+                  lambda p: BollingerBands(p['window'], p['num_of_std']),
+                  _bollinger_update,
+                  lambda o, h, l, c: o.seed(c) + (np.full(len(c), np.nan),),
+                  lambda h, l, c, p: _bollinger_batch(h, l, c, p['window'], p['num_of_std'])),
+}
+
+# indicators whose update() skips NaN inputs
+SKIP_NANS = ('sma', 'ema', 'atr')
+
+CASES = [(name, params) for name, (param_sets, *_) in INDICATORS.items() for params in param_sets]
+
+
+def candles(count, seed):
+    # random walk with a drift, a few gaps and a flat stretch
+    rng = np.random.default_rng(seed)
+    steps = rng.normal(1, 20, count)
+    steps[rng.random(count) < 0.02] *= 20
+    close = 30000 + np.cumsum(steps)
+    spread = np.abs(rng.normal(0, 5, count))
+    high, low = close + spread, close - spread
+    if count > 20:
+        high[count // 2:count // 2 + 10] = low[count // 2:count // 2 + 10] = close[count // 2:count // 2 + 10] = close[count // 2]
+    return high, low, close
+
+
+def assert_agree(values, expected):
+    values = np.asarray(values, dtype=np.float64)
+    expected = np.asarray(expected, dtype=np.float64)
+    scale = np.nanmax(np.abs(expected), initial=1.0)
+    assert values.shape == expected.shape
+    np.testing.assert_allclose(values, expected, rtol=RTOL, atol=RTOL * scale, equal_nan=True)
+
+
+def outputs(name, params):
+    # how many lines the indicator puts out
+    empty = np.array([])
+    return len(INDICATORS[name][4](empty, empty, empty, params))
+
+
+def streamed(name, params, high, low, close):
+    _, make, update, _, _ = INDICATORS[name]
+    indicator = make(params)
+    rows = [update(indicator, h, l, c) for h, l, c in zip(high.tolist(), low.tolist(), close.tolist())]
+    return np.array(rows, dtype=np.float64).reshape(len(close), outputs(name, params)).T
+
+
+def seeded(name, params, high, low, close, cuts):
+    # seed() the chunks between cuts, then update() the rest
+    _, make, update, seed, _ = INDICATORS[name]
+    indicator = make(params)
+    parts, start = [], 0
+    for cut in cuts:
+        parts.append(np.array(seed(indicator, high[start:cut], low[start:cut], close[start:cut]), dtype=np.float64).reshape(outputs(name, params), cut - start))
+        start = cut
+    rest = [update(indicator, h, l, c) for h, l, c in zip(high[start:].tolist(), low[start:].tolist(), close[start:].tolist())]
+    parts.append(np.array(rest, dtype=np.float64).reshape(len(close) - start, outputs(name, params)).T)
+    return np.concatenate(parts, axis=1), start
+
+
+@pytest.mark.parametrize('count', [0, 3, 150])
+@pytest.mark.parametrize('name, params', CASES)
+def test_update_matches_batch(name, params, count):
+    high, low, close = candles(count, seed=count)
+    expected = np.array(INDICATORS[name][4](high, low, close, params), dtype=np.float64)
+    for got, want in zip(streamed(name, params, high, low, close), expected):
+        assert_agree(got, want)
+
+
+@pytest.mark.parametrize('cuts', [(0,), (1, 40), (75, 149)])
+@pytest.mark.parametrize('name, params', CASES)
+def test_seed_then_update_matches_batch(name, params, cuts):
+    high, low, close = candles(150, seed=1)
+    expected = np.array(INDICATORS[name][4](high, low, close, params), dtype=np.float64)
+    mixed, start = seeded(name, params, high, low, close, cuts)
+    if name == 'bollinger':
+        mixed[3, :start] = expected[3, :start]  # seed() has no ROC, only the updates after it are compared
+    for got, want in zip(mixed, expected):
+        assert_agree(got, want)
+
+
+@pytest.mark.parametrize('name, params', [case for case in CASES if case[0] in SKIP_NANS])
+def test_nan_candles_are_skipped_in_both_modes(name, params):
+    high, low, close = candles(150, seed=2)
+    holes = [0, 7, 8, 60, 149]
+    high[holes] = low[holes] = close[holes] = np.nan
+    expected = INDICATORS[name][4](high, low, close, params)
+    assert_agree(streamed(name, params, high, low, close)[0], expected[0])
+    assert_agree(seeded(name, params, high, low, close, (30, 100))[0][0], expected[0])
+
+
+@pytest.mark.parametrize('make', [EMA, SMA])
+def test_nan_in_the_middle(make):
+    values = np.array([1, 2, np.nan, 4, 5])
+    expected = [np.nan, np.nan, np.nan, 7 / 3, 11 / 3]
+    indicator = make(3)
+    assert_agree([indicator.update(value) for value in values.tolist()], expected)
+    assert_agree(make(3).seed(values), expected)
@@ -0,0 +1,45 @@
+import numpy as np
+from tests.conftest import INTERVAL_MS, synthetic_klines
+from utils.data.fake_client import FakeClient
+from utils.data.kline_cache import KlineCache
+
+
+def client_at(klines, i):
+    # candle i is the open one
+    client = FakeClient(now_ms=int(klines['timestamp'][i]) + INTERVAL_MS // 2)
+    client.add_klines('BTCUSDT', '15m', klines)
+    return client
+
+
+def test_a_later_run_only_fetches_the_new_candles(tmp_path):
+    klines = synthetic_klines(300)
+    cache = KlineCache(client_at(klines, 199), root=str(tmp_path))
+    first = cache.get('BTCUSDT', '15m', limit=100)
+    assert first['timestamp'].tolist() == klines['timestamp'][100:200].tolist()
+    assert np.array_equal(first['close'], klines['close'][100:200])
+    assert cache.load('BTCUSDT', '15m')[0][-1] == klines['timestamp'][198]  # the open candle isn't cached
+
+    cache.client = client_at(klines, 249)
+    later = cache.get('BTCUSDT', '15m', limit=100)
+    assert later['timestamp'].tolist() == klines['timestamp'][150:250].tolist()
+    assert [request['startTime'] for request in cache.client.requests] == [int(klines['timestamp'][199])]
+
+
+def test_a_gap_in_the_cache_is_fetched_again(tmp_path):
+    klines = synthetic_klines(300)
+    cache = KlineCache(client_at(klines, 199), root=str(tmp_path))
+    cache.get('BTCUSDT', '15m', limit=100)
+    cached = np.load(cache.path('BTCUSDT', '15m'))
+    np.save(cache.path('BTCUSDT', '15m'), np.delete(cached, np.flatnonzero(cached[0] == klines['timestamp'][150]), axis=1))
+    cache.client = client_at(klines, 199)
+    again = cache.get('BTCUSDT', '15m', limit=100, closed_only=True)
+    assert again['timestamp'].tolist() == klines['timestamp'][100:199].tolist()
+    assert [request['startTime'] for request in cache.client.requests] == [int(klines['timestamp'][150])]
+
+
+def test_long_histories_are_fetched_page_by_page(tmp_path):
+    klines = synthetic_klines(2500)
+    cache = KlineCache(client_at(klines, 2499), root=str(tmp_path))
+    fetched = cache.get('BTCUSDT', '15m', limit=2400)
+    assert fetched['timestamp'].tolist() == klines['timestamp'][100:].tolist()
+    assert len(cache.client.requests) == 3
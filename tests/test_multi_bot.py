@@ -0,0 +1,73 @@
+import asyncio
+import logging
+import os
+import threading
+import pytest
+from tests.conftest import HISTORY, market, new_feed, strategies
+from utils.backtest.engine import PaperClient
+from utils.data.kline_cache import KlineCache
+from utils.data.store import PersistenceWriter
+from utils.multi_bot import MultiSymbolBot
+from utils.safety.mock_exchange import ReplayExchange
+from utils.safety.order_executor import OrderExecutor
+
+
+@pytest.fixture(autouse=True)
+def quiet():
+    logging.disable(logging.INFO)
+    yield
+    logging.disable(logging.NOTSET)
+
+
+def kline(symbol, open_time, close, closed=True):
+    return {'stream': f'{symbol.lower()}@kline_15m', 'data': {'e': 'kline', 's': symbol, 'k': {'t': open_time, 'c': close, 'x': closed}}}
+
+
+def test_open_candles_are_dropped_and_a_full_queue_pushes_out_the_oldest(tmp_path):
+    bot = MultiSymbolBot(['BTCUSDT'], '15m', None, None, client=PaperClient(), writer=PersistenceWriter(root=str(tmp_path)),
+                         queue_size=2)
+    queue = bot.queues['BTCUSDT'] = asyncio.Queue(bot.queue_size)
+    bot.dispatch(kline('BTCUSDT', 0, '1', closed=False))  # the candle is still open
+    bot.dispatch(kline('BTCUSDT', 0, '2'))
+    bot.dispatch(kline('BTCUSDT', 1, '3', closed=False))
+    bot.dispatch(kline('BTCUSDT', 1, '4'))
+    assert [msg['k']['c'] for msg in queue._queue] == ['2', '4']
+    bot.dispatch(kline('BTCUSDT', 2, '5'))
+    assert [msg['k']['c'] for msg in queue._queue] == ['4', '5']
+    bot.close()
+
+
+def fills(klines, root, queue_size):
+    feed = new_feed(klines, None)
+    exchange = ReplayExchange(feed)
+    bot = MultiSymbolBot(list(klines), '15m', None, None, client=exchange, writer=PersistenceWriter(root=os.path.join(root, 'data')),
+                         order_executor=OrderExecutor(exchange, max_workers=0, method='create_order'),
+                         kline_cache=KlineCache(exchange, root=os.path.join(root, 'cache')), feed=feed, strategies=strategies,
+                         queue_size=queue_size)
+    bot.start()
+    assert feed.sent == sum(len(data['close']) for data in klines.values()) - HISTORY * len(klines)
+    return sorted((order['symbol'], order['side'], order['executedQty']) for order in exchange.fills.values())
+
+
+def test_feed_waits_for_room_instead_of_dropping(tmp_path):
+    klines = market(3, 200, 0)
+    expected = fills(klines, str(tmp_path / 'unbounded'), 100_000)
+    assert expected
+    assert fills(klines, str(tmp_path / 'one'), 1) == expected
+
+
+def test_history_is_fetched_over_a_client_per_thread(tmp_path):
+    pytest.importorskip('binance')
+    from utils.safety.mock_exchange import MockExchange
+    with MockExchange() as exchange:
+        bot = MultiSymbolBot(['BTCUSDT', 'ETHUSDT'], '15m', None, None, client=exchange.client(),
+                             writer=PersistenceWriter(root=str(tmp_path)))
+        assert {id(symbol_bot.kline_cache.client) for symbol_bot in bot.bots.values()} == {id(bot.client)}
+        sessions = []
+        threads = [threading.Thread(target=lambda: sessions.append(bot.client.session)) for _ in range(2)]
+        for thread in threads:
+            thread.start()
+            thread.join()
+        assert bot.client.session is bot.client.session
+        assert len({id(session) for session in sessions + [bot.client.session]}) == 3
+        bot.close()
@@ -0,0 +1,116 @@
+import logging
+import threading
+import time
+import pytest
+from utils.safety.mock_exchange import MockExchange
+from utils.safety.order_executor import OrderExecutor, OrderQueueFull
+
+
+def orders(prefix, count):
+    return [{'symbol': 'BTCUSDT', 'side': 'BUY', 'type': 'MARKET', 'quantity': 0.01,
+             'newClientOrderId': f'{prefix}-{i}'} for i in range(count)]
+
+
+@pytest.fixture
+def exchange():
+    pytest.importorskip('binance')
+    logging.disable(logging.WARNING)
+    with MockExchange(latency=0.001) as exchange:
+        yield exchange
+    logging.disable(logging.NOTSET)
+
+
+@pytest.fixture
+def slow_replies(monkeypatch):
+    # Client._request stores the reply on self.response and reads it back to parse it,
+    # a pause in between lets any other thread sharing the client overwrite it
+    from binance.client import Client
+
+    def store(self, response):
+        self.__dict__['_response'] = response
+        time.sleep(0.001)
+    monkeypatch.setattr(Client, 'response', property(lambda self: self.__dict__.get('_response'), store), raising=False)
+
+
+def test_every_future_gets_its_own_order_under_retries(exchange, slow_replies):
+    exchange.fail_next(10, status=503)
+    exchange.fail_next(5, after_processing=True)
+    executor = OrderExecutor(exchange.client(), max_workers=8, method='create_order', max_retries=8, retry_delay=0.001)
+    params = orders('retry', 60)
+    futures = [executor.submit(order) for order in params]
+    executor.wait()
+    executor.close()
+    assert [future.result()['clientOrderId'] for future in futures] == [order['newClientOrderId'] for order in params]
+    assert sorted(exchange.orders) == sorted(order['newClientOrderId'] for order in params)
+
+
+def test_a_lost_response_is_looked_up_instead_of_placed_again(exchange):
+    exchange.fail_next(1, after_processing=True)
+    executor = OrderExecutor(exchange.client(), max_workers=0, method='create_order', retry_delay=0.001)
+    result = executor.submit(orders('lost', 1)[0]).result()
+    assert result['clientOrderId'] == 'lost-0'
+    assert list(exchange.orders) == ['lost-0']
+    assert [method for method, path, _ in exchange.requests if path == '/api/v3/order'] == ['POST', 'GET']
+
+
+def test_a_duplicate_answers_with_the_order_already_placed(exchange):
+    executor = OrderExecutor(exchange.client(), max_workers=0, method='create_order')
+    order = orders('twice', 1)[0]
+    first = executor.submit(order).result()
+    assert executor.submit(order).result() == first
+    assert len(exchange.orders) == 1
+
+
+def test_retries_stop_at_max_retries_and_rejections_are_not_retried(exchange):
+    from binance.exceptions import BinanceAPIException
+    executor = OrderExecutor(exchange.client(), max_workers=0, max_retries=2, retry_delay=0.001)
+    exchange.fail_next(3)
+    with pytest.raises(BinanceAPIException):
+        executor.submit(orders('down', 1)[0]).result()
+    assert sum(path == '/api/v3/order/test' for _, path, _ in exchange.requests) == 3
+    exchange.fail_next(1, status=400, code=-1013, msg='Filter failure: LOT_SIZE')
+    with pytest.raises(BinanceAPIException):
+        executor.submit(orders('rejected', 1)[0]).result()
+    assert sum(path == '/api/v3/order/test' for _, path, _ in exchange.requests) == 4
+
+
+class BlockingClient:
+    # holds every order until `release` is set
+    def __init__(self):
+        self.started = threading.Event()
+        self.release = threading.Event()
+        self.threads = set()
+
+    def create_test_order(self, **params):
+        self.threads.add(threading.current_thread())
+        self.started.set()
+        self.release.wait()
+        return {'clientOrderId': params['newClientOrderId']}
+
+
+def test_a_full_queue_raises_instead_of_blocking():
+    client = BlockingClient()
+    executor = OrderExecutor(client, max_workers=1, max_pending=1)
+    params = orders('full', 3)
+    first = executor.submit(params[0])
+    client.started.wait()
+    second = executor.submit(params[1])
+    with pytest.raises(OrderQueueFull):
+        executor.submit(params[2])
+    assert 'full-2' not in executor.in_flight
+    assert executor.submit(params[1]) is second  # still in flight, the same Future
+    client.release.set()
+    executor.wait()
+    executor.close()
+    assert [first.result()['clientOrderId'], second.result()['clientOrderId']] == ['full-0', 'full-1']
+    assert executor.in_flight == {}
+    assert threading.current_thread() not in client.threads
+
+
+def test_no_workers_sends_on_the_calling_thread():
+    client = BlockingClient()
+    client.release.set()
+    done = []
+    future = OrderExecutor(client, max_workers=0).submit(orders('inline', 1)[0], callback=done.append)
+    assert future.done() and done == [future]
+    assert client.threads == {threading.current_thread()}
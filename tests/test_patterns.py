@@ -0,0 +1,53 @@
+import numpy as np
+import pandas as pd
+import pytest
+from tests.conftest import synthetic_klines
+from utils.indicators.engulfing_ptrn import EngulfingPatternDetector
+from utils.indicators.patterns import PATTERNS, PatternScanner, match_last, register_pattern, scan_patterns
+
+
+@pytest.fixture
+def klines():
+    klines = synthetic_klines(2000)
+    # coarse prices so dojis, hammers and equal opens/closes actually occur
+    return {name: np.round(klines[name], -1) for name in ('open', 'high', 'low', 'close')}
+
+
+def test_scanner_and_match_last_agree_with_the_scan(klines):
+    masks = scan_patterns(klines['open'], klines['high'], klines['low'], klines['close'])
+    assert all(mask.any() for mask in masks.values())
+    scanner = PatternScanner()
+    for i in range(len(klines['close'])):
+        matched = scanner.update(*(float(klines[name][i]) for name in ('open', 'high', 'low', 'close')))
+        assert matched == {name: bool(mask[i]) for name, mask in masks.items()}
+    for i in np.flatnonzero(masks['bullish_engulfing'] | masks['bearish_engulfing'])[:20]:
+        window = pd.DataFrame({name: values[:i + 1] for name, values in klines.items()})
+        detector = EngulfingPatternDetector(window)
+        assert detector.is_bullish_engulfing() == masks['bullish_engulfing'][i]
+        assert detector.is_bearish_engulfing() == masks['bearish_engulfing'][i]
+        assert match_last(window, 'morning_star') == masks['morning_star'][i]
+
+
+def test_replace_last_reevaluates_the_open_candle():
+    scanner = PatternScanner(['bullish_engulfing'])
+    scanner.update(10.0, 10.5, 8.5, 9.0)
+    assert scanner.update(9.0, 9.5, 8.9, 9.2) == {'bullish_engulfing': False}
+    assert scanner.replace_last(8.9, 11.0, 8.8, 10.5) == {'bullish_engulfing': True}
+    assert len(scanner.candles) == 2
+
+
+def test_a_registered_pattern_runs_in_both_modes(klines):
+    @register_pattern('three_up', 3)
+    def three_up(c, p, pp):
+        return (c.close > p.close) & (p.close > pp.close)
+    try:
+        mask = scan_patterns(klines['open'], None, None, klines['close'], names=['three_up'])['three_up']
+        close = klines['close']
+        expected = np.zeros(len(close), dtype=bool)
+        expected[2:] = (close[2:] > close[1:-1]) & (close[1:-1] > close[:-2])
+        np.testing.assert_array_equal(mask, expected)
+        scanner = PatternScanner(['three_up'])
+        assert [scanner.update(o, max(o, c), min(o, c), c)['three_up']
+                for o, c in zip(klines['open'].tolist(), close.tolist())] == expected.tolist()
+    finally:
+        del PATTERNS['three_up']
@@ -0,0 +1,63 @@
+import numpy as np
+from utils.backtest.engine import PaperClient
+from utils.safety.order_calculation import OrderCalculator
+from utils.safety.position_book import PositionBook
+
+
+def order(order_id, stop_loss, take_profit, symbol='BTCUSDT', status='NEW'):
+    return {'order_id': order_id, 'symbol': symbol, 'quantity': 1.0, 'entry_price': (stop_loss + take_profit) / 2,
+            'stop_loss': stop_loss, 'take_profit': take_profit, 'status': status}
+
+
+def test_triggered_matches_a_scan_of_every_order():
+    rng = np.random.default_rng(0)
+    book = PositionBook()
+    orders = []
+    for i in range(300):
+        entry = rng.uniform(90, 110)
+        placed = order(str(i), entry * rng.uniform(0.95, 0.99), entry * rng.uniform(1.01, 1.05), symbol=f'S{i % 3}')
+        book.add(placed)
+        book.arm(placed)
+        orders.append(placed)
+    for low, high in [(99.0, 101.0), (96.0, 104.0), (90.0, 112.0)]:
+        for symbol in ('S0', 'S1', 'S2'):
+            expected = {o['order_id']: 'stop_loss' if o['stop_loss'] >= low else 'take_profit'
+                        for o in orders if o['symbol'] == symbol and o['status'] == 'NEW'
+                        and (o['stop_loss'] >= low or o['take_profit'] <= high)}
+            hits = book.triggered(symbol, low, high)
+            assert {o['order_id']: reason for o, reason in hits} == expected
+            for hit, _ in hits:
+                hit['status'] = 'SOLD'
+                book.remove(hit['order_id'])
+    assert len(book) == sum(o['status'] == 'NEW' for o in orders)
+
+
+def test_levels_are_reported_once_until_armed_again():
+    book = PositionBook()
+    pending, armed = order('pending', 95.0, 105.0, status='PENDING'), order('armed', 95.0, 105.0)
+    for placed in (pending, armed):
+        book.add(placed)
+    book.arm(armed)
+    assert book.triggered('BTCUSDT', 94.0) == [(armed, 'stop_loss')]
+    assert book.triggered('BTCUSDT', 94.0) == []
+    book.arm(armed)  # e.g. the sell failed
+    assert book.triggered('BTCUSDT', 106.0) == [(armed, 'take_profit')]
+    book.arm(armed)
+    book.remove('armed')
+    assert book.triggered('BTCUSDT', 90.0, 110.0) == []
+    assert book.open_orders('BTCUSDT') == [pending]
+
+
+def test_manage_orders_sells_the_orders_a_candle_crossed():
+    client = PaperClient()
+    calculator = OrderCalculator(1000, client=client, max_positions_per_symbol=3)
+    ids = [calculator.buy_order('BTCUSDT', 1.0, 100.0, take_profit, stop_loss)
+           for stop_loss, take_profit in [(99.0, 101.0), (97.0, 103.0), (95.0, 105.0)]]
+    assert not calculator.can_open('BTCUSDT')
+    calculator.manage_orders(100.5, symbol='BTCUSDT', low=98.0, high=102.0)
+    assert list(calculator.active_orders) == ids[1:]
+    assert [params['side'] for params in client.orders] == ['BUY'] * 3 + ['SELL']
+    assert calculator.can_open('BTCUSDT')
+    calculator.manage_orders(106.0, symbol='BTCUSDT')
+    assert list(calculator.active_orders) == []
+    assert [params['newClientOrderId'] for params in client.orders[4:]] == [f'{ids[1]}_SELL', f'{ids[2]}_SELL']
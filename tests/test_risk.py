@@ -0,0 +1,110 @@
+import threading
+import time
+import numpy as np
+import pytest
+from utils.data.intervals import interval_to_ms
+from utils.indicators.atr import atr_batch
+from utils.safety.order_calculation import TradeConfig
+from utils.safety.position_book import PositionBook
+from utils.safety.risk import RiskEngine
+
+INTERVAL_MS = interval_to_ms('15m')
+
+
+def correlated(count, periods, seed=0):
+    # closes, highs and lows per (period, symbol) following one market factor, ~5% of the candles missing
+    rng = np.random.default_rng(seed)
+    returns = rng.uniform(0.5, 1.5, count) * rng.normal(0, 0.004, (periods, 1)) + rng.normal(0, 0.003, (periods, count))
+    closes = rng.uniform(10, 1000, count) * np.exp(np.cumsum(returns, axis=0))
+    highs, lows = closes * 1.002, closes * 0.998
+    present = rng.random(closes.shape) > 0.05
+    present[0] = True
+    return closes, highs, lows, present
+
+
+def stream(engine, closes, highs, lows, present, seed=0):
+    rng = np.random.default_rng(seed)
+    for period in range(closes.shape[0]):
+        for col in rng.permutation(closes.shape[1]).tolist():
+            if present[period, col]:
+                engine.update(f'S{col}', period * INTERVAL_MS, highs[period, col], lows[period, col], closes[period, col])
+
+
+@pytest.mark.parametrize('periods', [30, 250])
+def test_covariance_matches_np_cov_over_the_window(periods):
+    closes, highs, lows, present = correlated(5, periods)
+    engine = RiskEngine('15m', window=50, capacity=2)  # grows twice on the way
+    stream(engine, closes, highs, lows, present)
+    returns = np.zeros(closes.shape)
+    for col in range(closes.shape[1]):
+        rows = np.flatnonzero(present[:, col])
+        returns[rows[1:], col] = np.log(closes[rows[1:], col] / closes[rows[:-1], col])
+    expected = np.cov(returns[-50:], rowvar=False)
+    # columns are handed out in the order symbols first show up
+    np.testing.assert_allclose(engine.covariance([f'S{col}' for col in range(5)]), expected, rtol=1e-9, atol=1e-15)
+    np.testing.assert_allclose(engine.covariance(['S3', 'S1']), expected[np.ix_([3, 1], [3, 1])], rtol=1e-9, atol=1e-15)
+
+
+def test_stops_follow_the_atr_and_the_book_stays_within_every_limit():
+    closes, highs, lows, present = correlated(8, 200, seed=1)
+    present[:] = True
+    engine = RiskEngine('15m', TradeConfig(total_capital=10_000), max_gross_exposure=0.8, max_portfolio_risk=0.03)
+    stream(engine, closes, highs, lows, present)
+    symbols, prices = [f'S{col}' for col in range(8)], closes[-1]
+    quantities, stops = engine.size(symbols, prices)
+    atr = np.array([atr_batch(highs[:, col], lows[:, col], closes[:, col], 14)[-1] for col in range(8)])
+    np.testing.assert_allclose(stops, prices - 2.0 * atr, rtol=1e-9)
+    book = PositionBook()
+    engine.track(book)
+    for i, (symbol, quantity, stop) in enumerate(zip(symbols, quantities.tolist(), stops.tolist())):
+        book_order(book, str(i), symbol, quantity, float(prices[i]), stop)
+    held, at_risk = engine.exposure()
+    assert held.max() <= 2_500.0 + 1e-6 and held.sum() <= 8_000.0 + 1e-6 and at_risk.sum() <= 300.0 + 1e-6
+    assert np.sqrt(held @ engine.covariance() @ held) <= 100.0 + 1e-6
+    assert engine.size(symbols, prices)[0].sum() == pytest.approx(0.0, abs=1e-9)  # no room left
+
+
+def book_order(book, order_id, symbol, quantity, price, stop):
+    book.add({'order_id': order_id, 'symbol': symbol, 'quantity': quantity, 'entry_price': price,
+              'stop_loss': stop, 'take_profit': price * 1.01, 'status': 'PENDING'})
+
+
+def test_reserved_room_is_not_handed_out_twice():
+    engine = RiskEngine('15m', TradeConfig(total_capital=10_000), max_symbol_exposure=0.25, max_gross_exposure=0.3)
+    book = PositionBook()
+    engine.track(book)
+    first, stops = engine.size(['BTCUSDT'], [100.0], reserve=True)
+    assert first[0] * 100.0 == 2_500.0
+    # the first order isn't booked yet, its room is still taken
+    assert engine.size(['BTCUSDT'], [100.0])[0][0] == 0.0
+    assert engine.size(['ETHUSDT'], [100.0])[0][0] * 100.0 == 500.0
+    engine.release('BTCUSDT', float(first[0]), 100.0, float(stops[0]))
+    assert engine.size(['ETHUSDT'], [100.0])[0][0] * 100.0 == 2_500.0
+
+
+def test_concurrent_sizing_stays_within_the_limits():
+    engine = RiskEngine('15m', TradeConfig(total_capital=10_000), max_symbol_exposure=0.25, max_gross_exposure=0.6)
+    books = [PositionBook() for _ in range(4)]
+    for book in books:
+        engine.track(book)
+    start = threading.Barrier(len(books))
+
+    def trade(i, book):
+        start.wait()
+        for n in range(20):
+            symbol = f'S{(i + n) % 6}USDT'
+            quantities, stops = engine.size([symbol], [100.0], reserve=True)
+            time.sleep(0.001)  # let the other threads size before this order is booked
+            if quantities[0] > 0:
+                book_order(book, f'{i}-{n}', symbol, float(quantities[0]), 100.0, float(stops[0]))
+            engine.release(symbol, float(quantities[0]), 100.0, float(stops[0]))
+
+    threads = [threading.Thread(target=trade, args=(i, book)) for i, book in enumerate(books)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    held, _ = engine.exposure()
+    assert held.max() <= 2_500.0 + 1e-6
+    assert 6_000.0 - 1e-6 <= held.sum() <= 6_000.0 + 1e-6
+    assert np.allclose(engine.reserved, 0.0)
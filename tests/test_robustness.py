@@ -0,0 +1,23 @@
+import logging
+import pytest
+from tests.conftest import synthetic_klines
+from utils.backtest.robustness import ResultCache, WalkForward
+
+
+@pytest.fixture(autouse=True)
+def quiet():
+    logging.disable(logging.INFO)
+    yield
+    logging.disable(logging.NOTSET)
+
+
+def test_whole_floats_hit_the_cache_of_their_ints(tmp_path):
+    klines = synthetic_klines(600)
+    cache = ResultCache(str(tmp_path), version='test')
+    first = WalkForward({'rsi_oversold': [25, 30]}, train=300, test=100, workers=1, cache=cache, runs=10,
+                        initial_balance=1000).run(klines)
+    assert first.computed > 0
+    again = WalkForward({'rsi_oversold': [25.0, 30.0]}, train=300, test=100, workers=1, cache=cache, runs=10,
+                        initial_balance=1000.0).run(klines)
+    assert again.computed == 0
+    assert again.windows.equals(first.windows)
@@ -0,0 +1,97 @@
+import logging
+import os
+import numpy as np
+import pytest
+from tests.conftest import INTERVAL_MS, kline_message, synthetic_klines
+from utils.bot import Bot
+from utils.data.fake_client import FakeClient
+from utils.data.kline_cache import KlineCache
+from utils.data.kline_window import KlineWindow
+from utils.data.snapshot import SnapshotStore, capture, load_snapshot, write_snapshot
+from utils.data.store import PersistenceWriter
+from utils.safety.order_executor import OrderExecutor
+from utils.signals.graph import RsiBbExpansion
+
+
+@pytest.fixture(autouse=True)
+def quiet():
+    logging.disable(logging.WARNING)
+    yield
+    logging.disable(logging.NOTSET)
+
+
+def new_bot(klines, upto, root, snapshots=None, strategies=None):
+    # a bot whose exchange has closed candles up to `upto`
+    client = FakeClient(now_ms=int(klines['timestamp'][upto]) + INTERVAL_MS)
+    client.add_klines('BTCUSDT', '15m', klines)
+    return Bot('BTCUSDT', '15m', None, None, client=client, writer=PersistenceWriter(root=os.path.join(root, 'data')),
+               kline_cache=KlineCache(client, root=os.path.join(root, 'cache')),
+               executor=OrderExecutor(client, max_workers=0), snapshots=snapshots, strategies=strategies)
+
+
+def test_arrays_and_windows_round_trip(tmp_path):
+    window = KlineWindow(capacity=4)
+    for i in range(7):
+        window.append({'timestamp': i, 'close': 100.0 + i})
+    state = {'window': window, 'ints': np.arange(5, dtype=np.int64), 'empty': np.empty(0), 'orders': [{'id': 'a'}]}
+    path = str(tmp_path / 'state.snap')
+    write_snapshot(path, capture(state))
+    loaded = load_snapshot(path)
+    assert np.array_equal(loaded['window'].values(), window.values(), equal_nan=True)
+    assert loaded['ints'].dtype == np.int64 and loaded['ints'].tolist() == [0, 1, 2, 3, 4]
+    assert loaded['empty'].shape == (0,) and loaded['orders'] == [{'id': 'a'}]
+    loaded['window'].append({'timestamp': 7, 'close': 107.0})  # copy on write, the file is left alone
+    assert load_snapshot(path)['window']['timestamp'].tolist() == [3, 4, 5, 6]
+
+
+def test_unreadable_snapshots_are_ignored(tmp_path):
+    store = SnapshotStore(str(tmp_path))
+    assert store.load('BTCUSDT') is None
+    with open(store.path('BTCUSDT'), 'wb') as f:
+        f.write(b'not a snapshot' * 10)
+    with pytest.raises(ValueError):
+        load_snapshot(store.path('BTCUSDT'))
+    assert store.load('BTCUSDT') is None
+
+
+def test_a_restarted_bot_resumes_where_the_reference_is(tmp_path):
+    klines = synthetic_klines(400)
+    reference = new_bot(klines, 59, str(tmp_path / 'reference'))
+    reference.fetch_historical_data()
+    for i in range(60, 300):
+        reference.handle_socket_message(kline_message(klines, i))
+
+    store = SnapshotStore(str(tmp_path / 'snapshots'))
+    first = new_bot(klines, 59, str(tmp_path / 'first'), store)
+    first.fetch_historical_data()
+    for i in range(60, 280):
+        first.handle_socket_message(kline_message(klines, i))
+    order = {'order_id': 'open', 'symbol': 'BTCUSDT', 'quantity': 0.1, 'entry_price': 30_000.0, 'stop_loss': 1.0,
+             'take_profit': 1e9, 'status': 'NEW'}
+    first.order_calculator.positions.add(order)
+    assert store.save(first) and not store.save(first)  # unchanged state isn't written again
+    first.close()
+
+    # down for candles 280 to 289, they are replayed from the exchange on restore
+    second = new_bot(klines, 289, str(tmp_path / 'second'), store)
+    second.seed = lambda klines: pytest.fail("seeded from history instead of resuming")
+    second.fetch_historical_data()
+    for i in range(290, 300):
+        second.handle_socket_message(kline_message(klines, i))
+    assert np.array_equal(second.kline_data.values(), reference.kline_data.values(), equal_nan=True)
+    assert second.order_calculator.positions.open_orders('BTCUSDT') == [order]
+    reference.close()
+    second.close()
+
+
+def test_a_snapshot_of_other_strategies_is_not_restored(tmp_path):
+    klines = synthetic_klines(200)
+    store = SnapshotStore(str(tmp_path / 'snapshots'))
+    first = new_bot(klines, 100, str(tmp_path / 'first'), store)
+    first.fetch_historical_data()
+    store.save(first)
+    first.close()
+    other = new_bot(klines, 100, str(tmp_path / 'other'), store,
+                    strategies=[RsiBbExpansion('loose', rsi_oversold=35, bandwidth_roc_threshold=0.0)])
+    assert not other.restore_state(store.load('BTCUSDT'))
+    other.close()
@@ -0,0 +1,13 @@
+import logging
+from utils.data.store import PersistenceWriter
+
+
+def test_writes_after_close_are_reported(tmp_path, caplog):
+    writer = PersistenceWriter(root=str(tmp_path))
+    writer.write_order({'order_id': '1', 'timestamp': 1_700_000_000_000})
+    writer.close()
+    with caplog.at_level(logging.WARNING, logger='utils.data.store'):
+        writer.write_order({'order_id': '2', 'timestamp': 1_700_000_000_000})
+        writer.write_kline('BTCUSDT', (1_700_000_000_000, 1.0, 1.0, 1.0, 1.0, 1.0))
+    assert [record.getMessage().split(' ')[0] for record in caplog.records] == ['order', 'kline']
+    assert len((tmp_path / 'orders' / '2023-11-14.jsonl').read_text().splitlines()) == 1
@@ -0,0 +1,28 @@
+import numpy as np
+import pandas as pd
+import pytest
+from tests.conftest import synthetic_klines
+from utils.indicators.sup_res import SupportResistance, support_resistance_batch
+
+
+@pytest.mark.parametrize('window', [1, 5, 14])
+def test_update_matches_batch_and_pandas(window):
+    klines = synthetic_klines(300)
+    klines['high'][100:110] = klines['high'][99]  # flat stretches, equal values in the deques
+    sr = SupportResistance(window)
+    streamed = np.array([sr.update(high, low) for high, low in zip(klines['high'].tolist(), klines['low'].tolist())])
+    support, resistance = support_resistance_batch(klines['high'], klines['low'], window)
+    np.testing.assert_array_equal(streamed[:, 0], support)
+    np.testing.assert_array_equal(streamed[:, 1], resistance)
+    np.testing.assert_array_equal(resistance, pd.Series(klines['high']).rolling(window).max().to_numpy())
+    np.testing.assert_array_equal(support, pd.Series(klines['low']).rolling(window).min().to_numpy())
+
+
+def test_levels_are_nan_until_the_window_fills():
+    support, resistance = support_resistance_batch([3.0, 2.0], [1.0, 0.5], window=3)
+    assert np.isnan(support).all() and np.isnan(resistance).all()
+    sr = SupportResistance(3)
+    assert np.isnan(sr.update(3.0, 1.0)).all()
+    assert np.isnan(sr.update(2.0, 0.5)).all()
+    assert sr.update(1.0, 0.8) == (0.5, 3.0)
+    assert sr.update(1.5, 0.9) == (0.5, 2.0)
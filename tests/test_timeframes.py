@@ -0,0 +1,91 @@
+import numpy as np
+import pandas as pd
+import pytest
+from tests.conftest import synthetic_klines
+from utils.data.intervals import interval_to_ms
+from utils.data.timeframes import CANDLE_FIELDS, RollUp
+from utils.indicators.rsi import wilder_rsi_batch
+from utils.signals.graph import RsiBbExpansion, StrategyGraph, rsi, source
+
+DAY = interval_to_ms('1d')
+
+
+def klines_with_holes(count, seed=0):
+    # 15m candles from a day boundary, about 3% of them never sent
+    klines = synthetic_klines(count, seed)
+    klines['timestamp'] = klines['timestamp'] - klines['timestamp'][0] % DAY
+    keep = np.random.default_rng(seed).random(count) > 0.03
+    keep[0] = True
+    return {name: values[keep] for name, values in klines.items()}
+
+
+def candle(klines, i):
+    return {'time': int(klines['timestamp'][i]), **{name: float(klines[name][i]) for name in CANDLE_FIELDS}}
+
+
+def streamed(rollup, klines, start=0):
+    # (base candle index, bar) of every bar add() finished
+    return [(i, bar) for i in range(start, len(klines['timestamp'])) for bar in rollup.add(candle(klines, i))]
+
+
+@pytest.mark.parametrize('interval', ['1h', '4h', '1d'])
+def test_add_matches_pandas_resample(interval):
+    klines = klines_with_holes(3000)
+    bars = [bar for _, bar in streamed(RollUp(interval, '15m'), klines)]
+    frame = pd.DataFrame({name: klines[name] for name in CANDLE_FIELDS}, index=pd.to_datetime(klines['timestamp'], unit='ms'))
+    expected = frame.resample(pd.Timedelta(milliseconds=interval_to_ms(interval))).agg(
+        {'open': 'first', 'high': 'max', 'low': 'min', 'close': 'last', 'volume': 'sum'}).dropna()
+    expected = expected.iloc[:len(bars)]  # the last period may still be in progress
+    assert len(expected) == len(bars)
+    assert [bar['time'] for bar in bars] == expected.index.as_unit('ms').asi8.tolist()
+    for name in CANDLE_FIELDS:
+        np.testing.assert_allclose([bar[name] for bar in bars], expected[name].to_numpy(), rtol=1e-12)
+
+
+def test_a_bar_is_finished_on_its_last_candle_or_the_next_periods_first():
+    rollup = RollUp('1h', '15m')
+    hour = interval_to_ms('1h')
+    quarter = interval_to_ms('15m')
+    base = {'open': 1.0, 'high': 2.0, 'low': 0.5, 'close': 1.5, 'volume': 1.0}
+    assert rollup.add({'time': 0, **base}) == ()
+    assert rollup.partial()['time'] == 0
+    assert [bar['time'] for bar in rollup.add({'time': 3 * quarter, **base})] == [0]
+    assert rollup.partial() is None
+    rollup.add({'time': hour, **base})  # the rest of this hour never comes
+    assert [bar['time'] for bar in rollup.add({'time': 2 * hour + quarter, **base})] == [hour]
+    assert rollup.add({'time': hour + quarter, **base}) == ()  # older than the candle in progress
+    with pytest.raises(ValueError):
+        RollUp('15m', '1h')
+    with pytest.raises(ValueError):
+        RollUp('1h', '7m')
+
+
+@pytest.mark.parametrize('cut', [0, 1, 5, 16, 97, 1500])
+def test_seed_then_add_matches_add_alone(cut):
+    klines = klines_with_holes(3000, seed=1)
+    reference = streamed(RollUp('4h', '15m'), klines)
+    rollup = RollUp('4h', '15m')
+    first = {name: values[:cut] for name, values in klines.items()}
+    seeded = rollup.seed(first)
+    assert seeded['available'].tolist() == [i for i, _ in reference if i < cut]
+    for name in ('time', 'close_time', 'open', 'high', 'low', 'close'):
+        assert seeded[name].tolist() == [bar[name] for i, bar in reference if i < cut]
+    # summed in another order
+    np.testing.assert_allclose(seeded['volume'], [bar['volume'] for i, bar in reference if i < cut], rtol=1e-12)
+    assert streamed(rollup, klines, cut) == [(i, bar) for i, bar in reference if i >= cut]
+    assert rollup.count == len(reference)
+
+
+def test_higher_timeframe_nodes_follow_the_resampled_candles():
+    klines = klines_with_holes(2000, seed=2)
+    node = rsi(source('close', '1h'), 14)
+    graph = StrategyGraph([RsiBbExpansion(confirm_timeframe='1h')], [node], base_interval='15m')
+    values = []
+    for i in range(len(klines['timestamp'])):
+        graph.update(candle(klines, i))
+        values.append(graph.value(node))
+    hourly = RollUp('1h', '15m').seed(klines)
+    expected = wilder_rsi_batch(hourly['close'], 14)
+    latest = np.searchsorted(hourly['available'], np.arange(len(values)), side='right') - 1
+    np.testing.assert_allclose(np.array(values, dtype=np.float64)[latest >= 0], expected[latest[latest >= 0]], rtol=1e-9)
+    np.testing.assert_allclose(graph.batch(klines)[node], values, rtol=1e-9)
@@ -0,0 +1,60 @@
+import numpy as np
+import pytest
+from utils.data.kline_window import KLINE_COLUMNS, KlineWindow
+from utils.indicators.ring_buffer import RingBuffer
+
+
+@pytest.mark.parametrize('capacity', [1, 3, 7])
+def test_ring_buffer_keeps_the_newest_values_across_wraparounds(capacity):
+    buffer = RingBuffer(capacity)
+    for value in range(4 * capacity + 1):
+        evicted = buffer.append(value)
+        assert evicted == (value - capacity if value >= capacity else None)
+        expected = list(range(max(0, value - capacity + 1), value + 1))
+        assert buffer.view().tolist() == expected
+        assert buffer[-1] == value and buffer[0] == expected[0]
+        assert buffer.last(2).tolist() == expected[-2:]
+        assert buffer[-2:].tolist() == expected[-2:]
+    assert buffer.is_full()
+
+
+def test_ring_buffer_views_are_read_only_and_extend_keeps_the_tail():
+    buffer = RingBuffer(4)
+    buffer.extend([1, 2, 3])
+    buffer.extend(np.arange(10, 20))
+    assert buffer.view().tolist() == [16, 17, 18, 19]
+    buffer.append(20)
+    assert list(buffer) == [17, 18, 19, 20]
+    with pytest.raises(ValueError):
+        buffer.view()[0] = 0
+    with pytest.raises(IndexError):
+        buffer[4]
+    buffer.clear()
+    assert len(buffer) == 0 and buffer.view().tolist() == []
+
+
+def test_kline_window_evicts_the_oldest_row_and_keeps_columns_contiguous():
+    window = KlineWindow(capacity=5)
+    rows = np.arange(13 * len(KLINE_COLUMNS), dtype=np.float64).reshape(13, len(KLINE_COLUMNS))
+    evicted = [window.append(dict(zip(KLINE_COLUMNS, row))) for row in rows]
+    assert evicted[:5] == [None] * 5
+    assert [row['timestamp'] for row in evicted[5:]] == rows[:8, 0].tolist()
+    assert np.array_equal(window.values(), rows[-5:])
+    assert window['close'].tolist() == rows[-5:, KLINE_COLUMNS.index('close')].tolist()
+    assert window['close'].flags.c_contiguous and not window['close'].flags.writeable
+    assert window.row(0) == dict(zip(KLINE_COLUMNS, rows[-5].tolist()))
+
+
+def test_kline_window_extend_and_missing_values():
+    window = KlineWindow(capacity=3)
+    window.extend({'timestamp': [1, 2, 3, 4], 'close': [10.0, 11.0, 12.0, 13.0]})
+    assert window['timestamp'].tolist() == [2, 3, 4]
+    assert np.isnan(window['rsi']).all()
+    window.append({'timestamp': 5, 'close': 14.0, 'rsi': None})
+    assert window['close'].tolist() == [12.0, 13.0, 14.0]
+    assert np.isnan(window.row()['rsi'])
+    frame = window.to_frame()
+    assert frame['close'].tolist() == [12.0, 13.0, 14.0]
+    assert window.to_frame() is frame  # cached until the next append
+    window.append({'timestamp': 6, 'close': 15.0})
+    assert window.to_frame() is not frame
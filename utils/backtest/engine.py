@@ -0,0 +1,238 @@
+import argparse
+import logging
+import os
+import numpy as np
+from utils.data.store import KlineStore
+from utils.indicators.bollinger_bands import bollinger_bands_batch, bandwidth_roc_batch
+from utils.indicators.rsi import wilder_rsi_batch
+from utils.signals.trigger import Triggers
+from utils.safety.order_calculation import OrderCalculator, TradeConfig
+
+logger = logging.getLogger(__name__)
+
+KLINE_FIELDS = ('timestamp', 'open', 'high', 'low', 'close', 'volume')
+
+# binance kline dumps (data.binance.vision) have no header, these are the first columns
+_BINANCE_CSV_COLUMNS = ['timestamp', 'open', 'high', 'low', 'close', 'volume', 'close_time']
+
+
+def load_klines(path, symbol=None, start=None, end=None):
+    """
+    Load klines into a dict of NumPy arrays keyed by KLINE_FIELDS.
+    `path` is either a PersistenceWriter root directory (pass `symbol`, and optionally a
+    start/end day), a csv with a header (e.g. the old kline_data.csv) or a raw binance
+    kline dump. Timestamps come back as epoch milliseconds.
+    """
+    import pandas as pd  # here and below: loaded by the first backtest, not by importing the engine
+    if os.path.isdir(path):
+        klines = KlineStore(path).read(symbol, start, end)
+        return {name: klines[name] for name in KLINE_FIELDS}
+    with open(path) as f:
+        has_header = not f.readline()[:1].isdigit()
+    if has_header:
+        frame = pd.read_csv(path, usecols=list(KLINE_FIELDS))
+    else:
+        frame = pd.read_csv(path, header=None, usecols=range(len(_BINANCE_CSV_COLUMNS)), names=_BINANCE_CSV_COLUMNS)
+    return klines_from_frame(frame)
+
+
+def klines_from_frame(frame):
+    import pandas as pd
+    timestamps = frame['timestamp']
+    if not pd.api.types.is_numeric_dtype(timestamps):
+        timestamps = pd.to_datetime(timestamps).astype('datetime64[ms]').astype(np.int64)
+    klines = {'timestamp': np.asarray(timestamps, dtype=np.int64)}
+    for name in KLINE_FIELDS[1:]:
+        klines[name] = frame[name].to_numpy(dtype=np.float64)
+    return klines
+
+
+def compute_rsi(close, period):
+    # same Wilder RSI as the live bot's strategy graph
+    return wilder_rsi_batch(close, period)
+
+
+def compute_bands(close, window, num_of_std):
+    upper, middle, lower, band_width = bollinger_bands_batch(close, window, num_of_std)
+    return {
+        'UpperBB': upper,
+        'MiddleBB': middle,
+        'LowerBB': lower,
+        'band_width': band_width,
+        'bandwidth_roc': bandwidth_roc_batch(band_width),
+    }
+
+
+class PaperClient:
+    # stands in for binance.Client when orders should only be recorded, answers like create_test_order
+    def __init__(self):
+        self.orders = []
+
+    def create_test_order(self, **params):
+        self.orders.append(params)
+        return {}
+
+
+class BacktestResult:
+    def __init__(self, trades, equity, indicators):
+        self.trades = trades
+        self.equity = equity
+        self.indicators = indicators
+
+    def summary(self):
+        equity = self.equity['equity'].to_numpy()
+        running_max = np.maximum.accumulate(equity) if len(equity) else equity
+        drawdown = (running_max - equity) / running_max if len(equity) else equity
+        closed = self.trades[self.trades['status'] == 'SOLD']
+        return {
+            'trades': len(self.trades),
+            'pnl': float(equity[-1] - equity[0]) if len(equity) else 0.0,
+            'max_drawdown': float(drawdown.max()) if len(equity) else 0.0,
+            'win_rate': float((closed['profit_loss'] > 0).mean()) if len(closed) else 0.0,
+        }
+
+    def save(self, directory):
+        os.makedirs(directory, exist_ok=True)
+        self.trades.to_csv(os.path.join(directory, 'trade_ledger.csv'), index=False)
+        self.equity.to_csv(os.path.join(directory, 'equity_curve.csv'), index=False)
+
+
+class Backtester:
+    """
+Offline replay of the live strategy over historical klines.
+
+Indicators are computed for the whole series in one vectorized pass, the
+two-stage trigger is replayed with Triggers.rsi_and_bb_expansion_signals and
+entries/exits follow the same rules as Bot.check_signal: exits are checked on
+every close before the signal, one open position at a time, sized with
+OrderCalculator.calculate_order_size.
+
+    result = Backtester().run(load_klines('BTCUSDT-15m.csv'))
+    result.summary()
+    result.save('backtest_out')
+"""
+    def __init__(self, bb_window=20, num_of_std=2, rsi_period=14, initial_balance=TradeConfig().total_capital, risk_per_trade=0.01,
+                 stop_loss_percentage=0.02, rsi_oversold=25, rsi_reentry_low=30, rsi_reentry_high=35, bandwidth_roc_threshold=0.15):
+        self.bb_window = bb_window
+        self.num_of_std = num_of_std
+        self.rsi_period = rsi_period
+        self.initial_balance = initial_balance
+        self.risk_per_trade = risk_per_trade
+        self.stop_loss_percentage = stop_loss_percentage
+        # passed straight to Triggers
+        self.trigger_params = {
+            'rsi_oversold': rsi_oversold,
+            'rsi_reentry_low': rsi_reentry_low,
+            'rsi_reentry_high': rsi_reentry_high,
+            'bandwidth_roc_threshold': bandwidth_roc_threshold,
+        }
+
+    def compute_indicators(self, klines):
+        close = klines['close']
+        indicators = {'rsi': compute_rsi(close, self.rsi_period)}
+        indicators.update(compute_bands(close, self.bb_window, self.num_of_std))
+        return indicators
+
+    def run(self, klines, indicators=None):
+        # indicators: precomputed compute_indicators() output, e.g. shared across a parameter sweep
+        if indicators is None:
+            indicators = self.compute_indicators(klines)
+        signals = Triggers(**self.trigger_params).rsi_and_bb_expansion_signals(
+            klines['open'], klines['close'], indicators['LowerBB'], indicators['rsi'], indicators['bandwidth_roc'])
+        trades = self.simulate_trades(klines, indicators, signals)
+        equity = self.equity_curve(klines, trades)
+        return BacktestResult(trades, equity, indicators)
+
+    def simulate_trades(self, klines, indicators, signals):
+        close = klines['close']
+        timestamps = klines['timestamp']
+        calculator = OrderCalculator(self.initial_balance, self.risk_per_trade, stop_loss_percentage=self.stop_loss_percentage)
+        rows = []
+        free_from = 0  # first candle a new position can be opened on
+        for entry in signals:
+            if entry < free_from:
+                continue  # still holding, the live bot ignores signals until the position is sold
+            quantity, stop_loss, take_profit = calculator.calculate_order_size(
+                entry_price=close[entry], middle_band=indicators['MiddleBB'][entry])
+            if quantity <= 0:
+                continue
+            exit_at, reason = _first_exit(close, entry + 1, stop_loss, take_profit)
+            entry_price = float(close[entry])
+            row = {
+                'entry_index': int(entry),
+                'entry_time': int(timestamps[entry]),
+                'entry_price': entry_price,
+                'quantity': quantity,
+                'stop_loss': stop_loss,
+                'take_profit': take_profit,
+            }
+            if exit_at < 0:
+                row.update(exit_index=-1, exit_time=-1, exit_price=np.nan, exit_reason='', status='NEW',
+                           profit_loss=(float(close[-1]) - entry_price) * quantity, outcome='')
+                rows.append(row)
+                break
+            profit_loss = (float(close[exit_at]) - entry_price) * quantity
+            row.update(exit_index=int(exit_at), exit_time=int(timestamps[exit_at]), exit_price=float(close[exit_at]),
+                       exit_reason=reason, status='SOLD', profit_loss=profit_loss,
+                       outcome='GAIN' if profit_loss > 0 else 'LOSS')
+            rows.append(row)
+            # manage_orders runs before the trigger, so the exit candle can open the next trade
+            free_from = exit_at
+
+        import pandas as pd
+        trades = pd.DataFrame(rows, columns=_LEDGER_COLUMNS)
+        for column in ('entry_time', 'exit_time'):
+            trades[column] = pd.to_datetime(trades[column].where(trades[column] >= 0), unit='ms')
+        return trades
+
+    def equity_curve(self, klines, trades):
+        close = klines['close']
+        n = len(close)
+        realized = np.zeros(n)
+        unrealized = np.zeros(n)
+        for trade in trades.itertuples(index=False):
+            end = trade.exit_index if trade.exit_index >= 0 else n
+            unrealized[trade.entry_index:end] = (close[trade.entry_index:end] - trade.entry_price) * trade.quantity
+            if trade.exit_index >= 0:
+                realized[trade.exit_index] += trade.profit_loss
+        equity = self.initial_balance + np.cumsum(realized) + unrealized
+        import pandas as pd
+        return pd.DataFrame({'timestamp': pd.to_datetime(klines['timestamp'], unit='ms'), 'equity': equity})
+
+
+_LEDGER_COLUMNS = ['entry_index', 'entry_time', 'entry_price', 'quantity', 'stop_loss', 'take_profit',
+                   'exit_index', 'exit_time', 'exit_price', 'exit_reason', 'status', 'profit_loss', 'outcome']
+
+
+def _first_exit(close, start, stop_loss, take_profit):
+    # scan forward in growing chunks so short trades don't touch the rest of the history
+    n = len(close)
+    chunk = 256
+    while start < n:
+        segment = close[start:start + chunk]
+        hit = np.flatnonzero((segment <= stop_loss) | (segment >= take_profit))
+        if len(hit):
+            at = start + hit[0]
+            # same precedence as OrderCalculator.manage_orders
+            return at, 'stop_loss' if close[at] <= stop_loss else 'take_profit'
+        start += chunk
+        chunk = min(chunk * 2, 1 << 20)
+    return -1, ''
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Backtest the RSI + Bollinger Band expansion strategy over a kline csv")
+    parser.add_argument('klines', help="kline store directory, kline csv or binance kline dump")
+    parser.add_argument('--symbol', help="symbol to read when klines is a store directory")
+    parser.add_argument('--out', default='backtest_out', help="directory for trade_ledger.csv and equity_curve.csv")
+    parser.add_argument('--bb-window', type=int, default=20)
+    parser.add_argument('--num-of-std', type=float, default=2)
+    parser.add_argument('--rsi-period', type=int, default=14)
+    parser.add_argument('--balance', type=float, default=TradeConfig().total_capital)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    klines = load_klines(args.klines, args.symbol)
+    result = Backtester(args.bb_window, args.num_of_std, args.rsi_period, args.balance).run(klines)
+    result.save(args.out)
+    logger.info("Backtest over %d candles: %s", len(klines['close']), result.summary())
@@ -0,0 +1,349 @@
+import argparse
+import hashlib
+import json
+import logging
+import math
+import os
+import tempfile
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
+import numpy as np
+from utils.backtest.engine import KLINE_FIELDS, load_klines
+from utils.backtest.sweep import DEFAULT_PARAMS, ParameterSweep, add_grid_arguments, grid_from_args, init_worker, run_task
+from utils.safety.order_calculation import TradeConfig
+
+logger = logging.getLogger(__name__)
+
+# Monte Carlo runs per task, fixed so the same seed gives the same draws on any number of workers
+_MONTE_CARLO_CHUNK = 1000
+PERCENTILES = (5, 25, 50, 75, 95)
+# packages under utils/ whose code a cached result comes out of
+_CACHED_CODE = ('backtest', 'indicators', 'signals', 'safety')
+
+
+class ResultCache:
+    """
+Backtest results on disk, one JSON file per key.
+
+Keys are hashes of everything a result depends on: the candles it ran on
+(a hash of the whole history up to the window's last candle, so appending
+new candles leaves every earlier window's key alone), the window and the
+parameters. Every key also holds `version`, by default a hash of the
+source of the backtester, indicators, strategy and order code
+(code_version()), so results computed before a change to any of it are
+never served again. Files are replaced atomically, so an interrupted run
+never leaves half an entry.
+
+    cache = ResultCache('robustness_cache')
+    key = cache.key(data_hash, start, end, params)
+    rows = cache.get(key) or compute()
+    cache.put(key, rows)
+"""
+    def __init__(self, root=os.path.join('data', 'robustness'), version=None):
+        self.root = root
+        self.version = version if version is not None else code_version()
+
+    def key(self, *parts):
+        parts = [_number(part) for part in parts]
+        return hashlib.sha256(json.dumps([self.version, parts], sort_keys=True, default=repr).encode()).hexdigest()
+
+    def path(self, key):
+        return os.path.join(self.root, key[:2], f'{key}.json')
+
+    def get(self, key):
+        try:
+            with open(self.path(key)) as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+
+    def put(self, key, value):
+        path = self.path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp = f'{path}.{os.getpid()}.tmp'
+        with open(tmp, 'w') as f:
+            json.dump(value, f)
+        os.replace(tmp, path)
+
+
+class WalkForward:
+    """
+Walk-forward optimization of the strategy parameters with Monte Carlo
+resampling of the out-of-sample trades.
+
+The history is cut into rolling windows of `train` candles followed by
+`test` candles, moving on by `step` (default `test`). In every window each
+combination of `grid` is backtested on the train candles, the best one (by
+pnl, shallower drawdown on ties, as ParameterSweep ranks) is backtested on
+the test candles that follow, and the test trades of all windows make up
+the out-of-sample ledger. That ledger is resampled `runs` times twice: in
+shuffled trade order (same return, other drawdowns) and as a block
+bootstrap of `block` consecutive trades (other returns too).
+
+Everything runs on one process pool whose workers map the candles once
+and cache indicators, as ParameterSweep's do; windows are backtested on
+slices of indicators computed over the whole history, so every window
+starts warmed up. Results are kept in a ResultCache, so a rerun on the same
+candles computes nothing and a rerun after appending candles only computes
+the new windows.
+
+    result = WalkForward({'rsi_oversold': [20, 25, 30]}, train=8000, test=2000, workers=8).run(klines)
+    result.windows        # one row per window, params chosen and train / test summary
+    result.stability()    # share of profitable windows, efficiency, parameter stability, ...
+    result.monte_carlo.summary()
+"""
+    def __init__(self, grid, train, test, step=None, workers=None, cache=None, runs=1000, block=5, seed=0,
+                 initial_balance=TradeConfig().total_capital, risk_per_trade=0.01):
+        self.sweep = ParameterSweep(grid, workers, initial_balance, risk_per_trade)
+        self.train = train
+        self.test = test
+        self.step = step or test
+        self.workers = self.sweep.workers
+        self.cache = cache if cache is not None else ResultCache()
+        self.runs = runs
+        self.block = block
+        self.seed = seed
+        self.initial_balance = initial_balance
+        self.risk_per_trade = risk_per_trade
+
+    def windows(self, count):
+        # (train start, test start, test end) of every window that fits in `count` candles
+        return [(start, start + self.train, start + self.train + self.test)
+                for start in range(0, count - self.train - self.test + 1, self.step)]
+
+    def run(self, klines):
+        matrix = np.vstack([np.asarray(klines[name], dtype=np.float64) for name in KLINE_FIELDS])
+        windows = self.windows(matrix.shape[1])
+        if not windows:
+            raise ValueError(f"{matrix.shape[1]} candles don't fit one window of {self.train} + {self.test}")
+        hashes = prefix_hashes(matrix, sorted({end for window in windows for end in window[1:]}))
+        combinations = self.sweep.combinations()
+        computed = 0
+        with tempfile.TemporaryDirectory() as workdir:
+            path = os.path.join(workdir, 'klines.npy')
+            np.save(path, matrix)
+            pool = self._pool(path)
+            try:
+                train, count = self._backtest(pool, [(start, test_start, hashes[test_start], combinations)
+                                                     for start, test_start, _ in windows], ledger=False)
+                computed += count
+                best = [min(rows, key=lambda row: (-row['pnl'], row['max_drawdown'])) for rows in train]
+                test, count = self._backtest(pool, [(test_start, end, hashes[end], [_params(row)])
+                                                    for (_, test_start, end), row in zip(windows, best)], ledger=True)
+                computed += count
+                test = [rows[0] for rows in test]
+                ledger = np.array([pnl for row in test for pnl in row['profit_loss']], dtype=np.float64)
+                monte_carlo = self._monte_carlo(pool, ledger)
+            finally:
+                if pool is not None:
+                    pool.shutdown()
+        logger.info("Walk-forward over %d windows, %d of %d backtests computed, the rest cached",
+                    len(windows), computed, len(windows) * (len(combinations) + 1))
+
+        import pandas as pd
+        varied = [name for name, values in self.sweep.grid.items() if len(values) > 1]
+        table = pd.DataFrame([{
+            'window': i,
+            'train_start': int(matrix[0, start]),
+            'test_start': int(matrix[0, test_start]),
+            'test_end': int(matrix[0, end - 1]),
+            **{name: chosen[name] for name in varied},
+            **{f'train_{name}': chosen[name] for name in ('trades', 'pnl', 'max_drawdown', 'win_rate')},
+            **{f'test_{name}': tested[name] for name in ('trades', 'pnl', 'max_drawdown', 'win_rate')},
+        } for i, ((start, test_start, end), chosen, tested) in enumerate(zip(windows, best, test))])
+        return WalkForwardResult(table, ledger, monte_carlo, varied, self.train, self.test, self.initial_balance, computed)
+
+    def _pool(self, path):
+        if self.workers == 1:
+            init_worker(path)
+            return None
+        return ProcessPoolExecutor(self.workers, initializer=init_worker, initargs=(path,))
+
+    def _backtest(self, pool, jobs, ledger):
+        """
+        Backtest the combinations of every (start, end, data hash, combinations) job on
+        candles [start, end), from the cache where possible. Returns the rows of every job
+        in combination order and how many backtests had to run.
+        """
+        keys, cached, calls = [], [], []
+        for job, (start, end, data_hash, combinations) in enumerate(jobs):
+            key = self.cache.key(data_hash, start, end, self.initial_balance, self.risk_per_trade, ledger)
+            rows = self.cache.get(key) or {}
+            keys.append(key)
+            cached.append(rows)
+            missing = [params for params in combinations if _params_key(params) not in rows]
+            chunk = max(1, math.ceil(len(missing) / self.workers))
+            calls += [(job, (missing[i:i + chunk], self.initial_balance, self.risk_per_trade, start, end, ledger))
+                      for i in range(0, len(missing), chunk)]
+        for (job, _), rows in zip(calls, _call(pool, run_task, [args for _, args in calls])):
+            cached[job].update({_params_key(row): row for row in rows})
+        for job in sorted({job for job, _ in calls}):
+            self.cache.put(keys[job], cached[job])
+        results = [[rows[_params_key(params)] for params in combinations] for rows, (_, _, _, combinations) in zip(cached, jobs)]
+        return results, sum(len(args[0]) for _, args in calls)
+
+    def _monte_carlo(self, pool, ledger):
+        key = self.cache.key(hashlib.sha256(ledger.tobytes()).hexdigest(), self.initial_balance, self.runs, self.block,
+                             self.seed, 'monte_carlo')
+        cached = self.cache.get(key)
+        if cached is None:
+            cached = {name: column.tolist() for name, column in monte_carlo(ledger, self.initial_balance, self.runs, self.block,
+                                                                            self.seed, pool=pool).columns.items()}
+            self.cache.put(key, cached)
+        return MonteCarloResult({name: np.array(column) for name, column in cached.items()})
+
+
+class WalkForwardResult:
+    def __init__(self, windows, ledger, monte_carlo, varied, train, test, initial_balance, computed):
+        self.windows = windows
+        self.ledger = ledger  # pnl of every out-of-sample trade, in order
+        self.monte_carlo = monte_carlo
+        self.varied = varied  # the parameters the grid searched over
+        self.train = train
+        self.test = test
+        self.initial_balance = initial_balance
+        self.computed = computed  # backtests that ran, the others came from the cache
+
+    def stability(self):
+        windows = self.windows
+        train_pnl, test_pnl = windows['train_pnl'].sum(), windows['test_pnl'].sum()
+        equity = self.initial_balance + np.concatenate(([0.0], np.cumsum(self.ledger)))
+        running_max = np.maximum.accumulate(equity)
+        return {
+            'windows': len(windows),
+            'profitable_windows': float((windows['test_pnl'] > 0).mean()),
+            # out-of-sample pnl per candle over in-sample pnl per candle, 1.0 means nothing was lost out of sample
+            'efficiency': float(test_pnl / self.test / (train_pnl / self.train)) if train_pnl > 0 else math.nan,
+            'test_pnl': float(test_pnl),
+            'test_pnl_std': float(windows['test_pnl'].std(ddof=1)) if len(windows) > 1 else 0.0,
+            'test_max_drawdown': float(((running_max - equity) / running_max).max()),
+            # share of windows choosing each parameter's most common value
+            **{f'{name}_stability': Counter(windows[name]).most_common(1)[0][1] / len(windows) for name in self.varied},
+        }
+
+    def save(self, directory):
+        os.makedirs(directory, exist_ok=True)
+        self.windows.to_csv(os.path.join(directory, 'walk_forward.csv'), index=False)
+        with open(os.path.join(directory, 'robustness.json'), 'w') as f:
+            json.dump({'stability': self.stability(), 'monte_carlo': self.monte_carlo.summary()}, f, indent=2)
+
+
+class MonteCarloResult:
+    def __init__(self, columns):
+        # shuffle_/bootstrap_ max_drawdown and return of every run
+        self.columns = columns
+
+    def summary(self):
+        summary = {}
+        for name, values in self.columns.items():
+            summary[name] = {f'p{q}': float(value) for q, value in zip(PERCENTILES, np.percentile(values, PERCENTILES))}
+            summary[name]['mean'] = float(values.mean())
+        for method in ('shuffle', 'bootstrap'):
+            summary[f'{method}_loss_probability'] = float((self.columns[f'{method}_return'] < 0).mean())
+        return summary
+
+
+def monte_carlo(pnl, initial_balance, runs=1000, block=5, seed=0, pool=None):
+    """
+    Resample a trade ledger (the pnl of every trade, in order) `runs` times, shuffled and
+    as a block bootstrap of `block` consecutive trades, on `pool` when given. Drawdowns
+    are measured on the equity after every trade.
+    """
+    pnl = np.asarray(pnl, dtype=np.float64)
+    seeds = np.random.SeedSequence(seed).spawn(math.ceil(runs / _MONTE_CARLO_CHUNK))
+    sizes = [min(_MONTE_CARLO_CHUNK, runs - i * _MONTE_CARLO_CHUNK) for i in range(len(seeds))]
+    chunks = _call(pool, _monte_carlo_chunk, [(pnl, initial_balance, size, block, child) for size, child in zip(sizes, seeds)])
+    return MonteCarloResult({name: np.concatenate([chunk[name] for chunk in chunks]) for name in chunks[0]} if chunks else {})
+
+
+@lru_cache(maxsize=None)
+def code_version():
+    # hash of every module of the _CACHED_CODE packages
+    utils = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    hasher = hashlib.sha256()
+    for package in _CACHED_CODE:
+        directory = os.path.join(utils, package)
+        for name in sorted(os.listdir(directory)):
+            if name.endswith('.py'):
+                with open(os.path.join(directory, name), 'rb') as f:
+                    hasher.update(f'{package}/{name}'.encode())
+                    hasher.update(f.read())
+    return hasher.hexdigest()
+
+
+def prefix_hashes(matrix, ends):
+    # hash of candles [0, end) for every end, in one pass over the history
+    rows = np.ascontiguousarray(matrix.T)
+    hasher, hashes, done = hashlib.sha256(), {}, 0
+    for end in sorted(ends):
+        hasher.update(rows[done:end].tobytes())
+        hashes[end], done = hasher.copy().hexdigest(), end
+    return hashes
+
+
+def _monte_carlo_chunk(pnl, initial_balance, runs, block, seed):
+    rng = np.random.default_rng(seed)
+    n = len(pnl)
+    if n == 0:
+        zeros = np.zeros(runs)
+        return {'shuffle_max_drawdown': zeros, 'shuffle_return': zeros, 'bootstrap_max_drawdown': zeros, 'bootstrap_return': zeros}
+    shuffled = pnl[np.argsort(rng.random((runs, n)), axis=1)]
+    block = max(1, min(block, n))
+    starts = rng.integers(0, n - block + 1, (runs, math.ceil(n / block)))
+    bootstrapped = pnl[(starts[:, :, None] + np.arange(block)).reshape(runs, -1)[:, :n]]
+    columns = {}
+    for method, paths in (('shuffle', shuffled), ('bootstrap', bootstrapped)):
+        equity = initial_balance + np.concatenate((np.zeros((runs, 1)), np.cumsum(paths, axis=1)), axis=1)
+        running_max = np.maximum.accumulate(equity, axis=1)
+        columns[f'{method}_max_drawdown'] = ((running_max - equity) / running_max).max(axis=1)
+        columns[f'{method}_return'] = (equity[:, -1] - initial_balance) / initial_balance
+    return columns
+
+
+def _call(pool, function, calls):
+    # function(*args) for every args, spread over the pool or inline without one
+    if pool is None:
+        return [function(*args) for args in calls]
+    return [future.result() for future in [pool.submit(function, *args) for args in calls]]
+
+
+def _params(row):
+    return {name: row[name] for name in DEFAULT_PARAMS}
+
+
+def _params_key(params):
+    return json.dumps([_number(params[name]) for name in DEFAULT_PARAMS])
+
+
+def _number(value):
+    # 25 and 25.0 are the same parameter, so they make the same key
+    if isinstance(value, (int, float, np.number)) and not isinstance(value, bool):
+        return float(value)
+    return value
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Walk-forward and Monte Carlo robustness of the RSI + Bollinger Band expansion strategy")
+    parser.add_argument('klines', help="kline store directory, kline csv or binance kline dump")
+    parser.add_argument('--symbol', help="symbol to read when klines is a store directory")
+    parser.add_argument('--train', type=int, required=True, help="candles to optimize on per window")
+    parser.add_argument('--test', type=int, required=True, help="candles to test the chosen parameters on per window")
+    parser.add_argument('--step', type=int, default=None, help="candles between windows (default --test)")
+    parser.add_argument('--runs', type=int, default=1000, help="Monte Carlo runs per method")
+    parser.add_argument('--block', type=int, default=5, help="trades per bootstrap block")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--cache', default=os.path.join('data', 'robustness'))
+    parser.add_argument('--out', default='robustness_out')
+    parser.add_argument('--workers', type=int, default=None)
+    add_grid_arguments(parser)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    grid = grid_from_args(args)
+    result = WalkForward(grid, args.train, args.test, args.step, workers=args.workers, cache=ResultCache(args.cache),
+                         runs=args.runs, block=args.block, seed=args.seed).run(load_klines(args.klines, args.symbol))
+    result.save(args.out)
+    logger.info("Windows:\n%s", result.windows.to_string(index=False))
+    logger.info("Stability: %s", result.stability())
+    logger.info("Monte Carlo: %s", json.dumps(result.monte_carlo.summary(), indent=2))
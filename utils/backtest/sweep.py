@@ -0,0 +1,177 @@
+import argparse
+import itertools
+import logging
+import math
+import os
+import tempfile
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
+import numpy as np
+from utils.backtest.engine import Backtester, KLINE_FIELDS, compute_bands, compute_rsi, load_klines
+from utils.safety.order_calculation import TradeConfig
+
+logger = logging.getLogger(__name__)
+
+# the values the live bot runs with, any parameter left out of a grid stays at these
+DEFAULT_PARAMS = {
+    'bb_window': 20,
+    'num_of_std': 2.0,
+    'rsi_period': 14,
+    'rsi_oversold': 25,
+    'rsi_reentry_low': 30,
+    'rsi_reentry_high': 35,
+    'bandwidth_roc_threshold': 0.15,
+    'stop_loss_percentage': 0.02,
+}
+
+# the type each parameter is read as on the command line, windows and periods are whole candles
+PARAM_TYPES = {
+    'bb_window': int,
+    'num_of_std': float,
+    'rsi_period': int,
+    'rsi_oversold': float,
+    'rsi_reentry_low': float,
+    'rsi_reentry_high': float,
+    'bandwidth_roc_threshold': float,
+    'stop_loss_percentage': float,
+}
+
+# parameters that change indicator values; combinations sharing these share one indicator pass
+INDICATOR_PARAMS = ('bb_window', 'num_of_std', 'rsi_period')
+
+
+class ParameterSweep:
+    """
+Grid search over the strategy parameters using a process pool.
+
+The kline arrays are written once to a memory-mapped .npy file that every
+worker maps read-only in its initializer, so tasks only carry parameter
+dicts. Combinations are grouped by their indicator parameters and each
+worker caches RSI per period and bands per (window, std), so a series is
+only run through an indicator once per worker however many threshold
+combinations use it.
+
+    sweep = ParameterSweep({'bb_window': [14, 20, 30], 'rsi_oversold': [20, 25]}, workers=8)
+    table = sweep.run(load_klines('BTCUSDT-15m.csv'))   # ranked by pnl
+"""
+    def __init__(self, grid, workers=None, initial_balance=TradeConfig().total_capital, risk_per_trade=0.01):
+        unknown = set(grid) - set(DEFAULT_PARAMS)
+        if unknown:
+            raise ValueError(f"Unknown sweep parameters: {sorted(unknown)}")
+        self.grid = {name: list(grid.get(name, [default])) for name, default in DEFAULT_PARAMS.items()}
+        self.workers = workers or os.cpu_count() or 1
+        self.initial_balance = initial_balance
+        self.risk_per_trade = risk_per_trade
+
+    def combinations(self):
+        names = list(self.grid)
+        return [dict(zip(names, values)) for values in itertools.product(*self.grid.values())]
+
+    def tasks(self):
+        # group by indicator key, then split big groups so every worker gets a share
+        groups = defaultdict(list)
+        for params in self.combinations():
+            groups[tuple(params[name] for name in INDICATOR_PARAMS)].append(params)
+        total = sum(len(group) for group in groups.values())
+        chunk = max(1, math.ceil(total / (self.workers * 4)))
+        return [group[i:i + chunk] for group in groups.values() for i in range(0, len(group), chunk)]
+
+    def run(self, klines):
+        tasks = self.tasks()
+        logger.info("Sweeping %d combinations in %d tasks on %d workers",
+                    sum(len(task) for task in tasks), len(tasks), self.workers)
+        with tempfile.TemporaryDirectory() as workdir:
+            path = os.path.join(workdir, 'klines.npy')
+            np.save(path, np.vstack([np.asarray(klines[name], dtype=np.float64) for name in KLINE_FIELDS]))
+            if self.workers == 1:
+                init_worker(path)
+                results = [run_task(task, self.initial_balance, self.risk_per_trade) for task in tasks]
+            else:
+                with ProcessPoolExecutor(self.workers, initializer=init_worker, initargs=(path,)) as pool:
+                    results = list(pool.map(run_task, tasks, itertools.repeat(self.initial_balance),
+                                            itertools.repeat(self.risk_per_trade)))
+        import pandas as pd
+        return rank(pd.DataFrame([row for rows in results for row in rows]))
+
+
+def rank(table):
+    # best pnl first, shallower drawdown breaks ties
+    table = table.sort_values(['pnl', 'max_drawdown'], ascending=[False, True]).reset_index(drop=True)
+    table.insert(0, 'rank', np.arange(1, len(table) + 1))
+    return table
+
+
+# per-worker state, set once by init_worker
+_klines = None
+
+
+def init_worker(path):
+    global _klines
+    matrix = np.load(path, mmap_mode='r')
+    _klines = {name: matrix[i] for i, name in enumerate(KLINE_FIELDS)}
+    _klines['timestamp'] = _klines['timestamp'].astype(np.int64)
+    _cached_rsi.cache_clear()
+    _cached_bands.cache_clear()
+
+
+@lru_cache(maxsize=64)
+def _cached_rsi(period):
+    return compute_rsi(_klines['close'], period)
+
+
+@lru_cache(maxsize=64)
+def _cached_bands(window, num_of_std):
+    return compute_bands(_klines['close'], window, num_of_std)
+
+
+def run_task(task, initial_balance, risk_per_trade, start=0, end=None, ledger=False):
+    # candles [start, end) only, with indicators warmed on everything before start; ledger adds each trade's pnl
+    klines, window = _klines, slice(start, end)
+    if start != 0 or end is not None:
+        klines = {name: column[window] for name, column in _klines.items()}
+    rows = []
+    for params in task:
+        indicators = {'rsi': _cached_rsi(params['rsi_period'])}
+        indicators.update(_cached_bands(params['bb_window'], params['num_of_std']))
+        if klines is not _klines:
+            indicators = {name: values[window] for name, values in indicators.items()}
+        backtester = Backtester(initial_balance=initial_balance, risk_per_trade=risk_per_trade, **params)
+        result = backtester.run(klines, indicators)
+        row = {**params, **result.summary()}
+        if ledger:
+            row['profit_loss'] = result.trades['profit_loss'].tolist()
+        rows.append(row)
+    return rows
+
+
+def add_grid_arguments(parser):
+    # a --bb-window 14,20,30 style option per parameter, grid_from_args turns them back into a grid
+    for name, default in DEFAULT_PARAMS.items():
+        parser.add_argument('--' + name.replace('_', '-'), type=lambda text, cast=PARAM_TYPES[name]: _values(text, cast),
+                            default=[default], help=f"comma separated values (default {default})")
+
+
+def grid_from_args(args):
+    return {name: getattr(args, name) for name in DEFAULT_PARAMS}
+
+
+def _values(text, cast):
+    return [cast(value) for value in text.split(',')]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Grid search the RSI + Bollinger Band expansion strategy over a kline csv")
+    parser.add_argument('klines', help="kline store directory, kline csv or binance kline dump")
+    parser.add_argument('--symbol', help="symbol to read when klines is a store directory")
+    parser.add_argument('--out', default='sweep_results.csv')
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('--top', type=int, default=20, help="rows of the ranked table to log")
+    add_grid_arguments(parser)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    grid = grid_from_args(args)
+    table = ParameterSweep(grid, workers=args.workers).run(load_klines(args.klines, args.symbol))
+    table.to_csv(args.out, index=False)
+    logger.info("Top results:\n%s", table.head(args.top).to_string(index=False))
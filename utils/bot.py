@@ -1,137 +1,299 @@
-from binance import Client, ThreadedWebsocketManager
 import logging
-import pandas as pd
 import numpy as np
-import time
-import os
-# import asyncio
-from dotenv import load_dotenv
-from utils.indicators.bollinger_bands import BollingerBands
-from utils.indicators.rsi import RSI
-from utils.signals.trigger import Triggers 
+import threading
+from utils.signals.graph import StrategyGraph, RsiBbExpansion, source, rsi, bollinger, band
+from utils.data.kline_window import KlineWindow
+from utils.data.feeds import BinanceFeed
+from utils.data.store import PersistenceWriter
+from utils.data.kline_cache import KlineCache
+from utils.data.intervals import interval_to_ms
+from utils.data.snapshot import capture
+from utils.metrics.latency import LatencyRecorder, NULL_TIMER
 from utils.safety.order_calculation import OrderCalculator, TradeConfig
+from utils.safety.order_executor import OrderExecutor, binance_client, thread_safe
 
 class Bot:
-    def __init__(self, symbol, interval, api_key, api_secret):
+    def __init__(self, symbol, interval, api_key, api_secret, client=None, writer=None, kline_cache=None, latency=None, executor=None,
+                 strategies=None, bars=None, snapshots=None, feed=None, risk=None):
         self.symbol = symbol
         self.interval = interval
         self.api_key = api_key
         self.api_secret = api_secret
-        self.bbands = BollingerBands(window=20, num_of_std=2)
-        self.rsi = RSI(period=14)
-        self.kline_data = pd.DataFrame(columns=['timestamp', 'open', 'high', 'low', 'close', 'volume', 'rsi', 'UpperBB', 'MiddleBB', 'LowerBB'])
-        self.twm = ThreadedWebsocketManager(api_key=self.api_key, api_secret=self.api_secret, tld='us')
-        self.order_calculator = OrderCalculator(TradeConfig())  # 'tc' is an instance of OrderCalculator class renamed in this case to 'OrderCalculator'
-        self.client = Client(api_key=self.api_key, api_secret=self.api_secret, tld='us')
-        self.trigger = Triggers() #rsi_value exists as an attribute in both the trigger class and rsi class
-
-        logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+        # indicators are nodes of one graph shared by every strategy, the window columns are outputs of it too
+        close = source('close')
+        bands = bollinger(close, 20, 2)
+        self.columns = {'rsi': rsi(close, 14), 'upper_band': band(bands, 'upper'),
+                        'middle_band': band(bands, 'middle'), 'lower_band': band(bands, 'lower')}
+        self.bands = bands
+        # strategies may read higher timeframes too, the graph rolls them up from this interval's candles
+        self.graph = StrategyGraph(strategies if strategies is not None else [RsiBbExpansion()], self.columns.values(),
+                                   base_interval=interval)
+        self._bind_indicators()
+        self.kline_data = KlineWindow(capacity=60)
+        # every candle is queued to the background writer (shared between bots by MultiSymbolBot)
+        self.writer = writer if writer is not None else PersistenceWriter()
+        # where start() reads the market from, a BinanceFeed unless e.g. a ReplayFeed is passed in;
+        # bots driven by MultiSymbolBot never use their own
+        self.feed = feed
+        # pass a client to run without binance, e.g. the backtester's PaperClient; a binance client
+        # is shared by the socket and executor threads, so every thread gets its own copy
+        self.client = thread_safe(client if client is not None else binance_client(self.api_key, self.api_secret))
+        # closed candles are cached on disk so a restart only fetches what it missed
+        self.kline_cache = kline_cache if kline_cache is not None else KlineCache(self.client)
+        # orders are sent from the executor's threads so the socket callback never waits on HTTP
+        self.executor = executor if executor is not None else OrderExecutor(self.client)
+        # a RiskEngine (shared by MultiSymbolBot) sizes orders against the whole book, with ATR stops
+        self.risk = risk
+        self.order_calculator = OrderCalculator(risk.capital if risk is not None else TradeConfig().total_capital, client=self.client,
+                                                writer=self.writer, executor=self.executor, risk=risk)
+        # per-stage latency of every message, disabled unless a recorder is passed in
+        self.latency = latency if latency is not None else LatencyRecorder(enabled=False)
+        self.timer = NULL_TIMER  # timer of the message being handled
+        # a BarAggregator (TimeBars, VolumeBars, ...) makes start() build bars from the trade stream instead of klines
+        self.bars = bars
+        # a SnapshotStore makes start() resume from the last snapshot and keep writing new ones
+        self.snapshots = snapshots
+        self.lock = threading.Lock()  # held while a message is handled, so a snapshot never sees half of one
+
         self.logger = logging.getLogger(__name__)
 
     def fetch_historical_data(self):
+        state = self.snapshots.load(self.symbol) if self.snapshots is not None else None
+        if self.bars is not None:
+            # bars built from trades have no exchange history, only a snapshot can warm them
+            if state is not None:
+                self.restore_state(state)
+            return
         self.logger.info('Fetching historical data')
-        klines = self.client.get_historical_klines(symbol=self.symbol, interval=self.interval, limit=59)
-        for kline in klines:
-            historic_kline_data = {
-                'time': pd.to_datetime(kline[0], unit='ms'),
-                'open': float(kline[1]),
-                'high': float(kline[2]),
-                'low': float(kline[3]),
-                'close': float(kline[4]),
-                'volume': float(kline[5]),
-                'close_time': pd.to_datetime(kline[6], unit='ms')
-            }
-            # self.logger.debug(kline_data)
-            self.append_data_to_df(historic_kline_data)
+        # the live path only takes closed candles, so the one still open is left to the stream
+        klines = self.kline_cache.get(self.symbol, self.interval, limit=self.graph.history(59), closed_only=True)
+        if state is not None and self._resumable(state, klines) and self.restore_state(state):
+            self.catch_up(klines)
+            return
+        if state is not None:
+            # too old or from another setup: start the indicators over, but never drop open positions
+            self.logger.warning("Snapshot of %s can't be resumed, seeding from history", self.symbol)
+            self.order_calculator.restore_orders(state['orders'])
+        self.seed(klines)
+
+        self.logger.info("last 5 historic data:\n%s", self.kline_data.tail(5))
+
+    def capture_state(self):
+        # everything a restart needs, serialized under the lock (see utils.data.snapshot)
+        with self.lock:
+            return capture({
+                'symbol': self.symbol,
+                'interval': self.interval,
+                'graph': self.graph,
+                'kline_data': self.kline_data,
+                'bars': self.bars,
+                'orders': [dict(order) for order in self.order_calculator.positions.open_orders(self.symbol)],
+            })
+
+    def restore_state(self, state):
+        graph = state['graph']
+        if ([node.key for node in graph.nodes] != [node.key for node in self.graph.nodes]
+                or [strategy.name for strategy in graph.strategies] != [strategy.name for strategy in self.graph.strategies]):
+            self.logger.warning("Snapshot of %s was taken with other strategies, ignoring it", self.symbol)
+            return False
+        with self.lock:
+            self.graph = graph
+            self._bind_indicators()
+            self.kline_data = state['kline_data']
+            if self.bars is not None and type(state['bars']) is type(self.bars):
+                self.bars = state['bars']
+            self.order_calculator.restore_orders(state['orders'])
+            if self.risk is not None:
+                self.risk.seed(self.symbol, self.kline_data)
+        self.logger.info("Restored %s from snapshot, %d candles in the window", self.symbol, len(self.kline_data))
+        return True
+
+    def _bind_indicators(self):
+        # the live RSI / BollingerBands objects inside the graph
+        self.rsi = self.graph.indicator(self.columns['rsi']).rsi
+        self.bbands = self.graph.indicator(self.bands).bands
+
+    def catch_up(self, klines):
+        # candles that closed while the bot was down go through the live path, so no signal is skipped
+        last = self.kline_data['timestamp'][-1] if len(self.kline_data) else -1
+        missed = np.flatnonzero(np.asarray(klines['timestamp']) > last)
+        for i in missed.tolist():
+            with self.lock:
+                self.on_bar({
+                    'time': int(klines['timestamp'][i]),
+                    'open': float(klines['open'][i]),
+                    'high': float(klines['high'][i]),
+                    'low': float(klines['low'][i]),
+                    'close': float(klines['close'][i]),
+                    'volume': float(klines['volume'][i]),
+                    'close_time': int(klines['close_time'][i]),
+                })
+        self.logger.info("Replayed %d candle(s) missed since the snapshot", len(missed))
+
+    def _resumable(self, state, klines):
+        # the snapshot's window must reach the fetched history, otherwise candles in between are lost
+        window = state['kline_data']
+        if state['symbol'] != self.symbol or state['interval'] != self.interval or len(window) == 0:
+            return False
+        return len(klines['timestamp']) == 0 or window['timestamp'][-1] >= klines['timestamp'][0] - interval_to_ms(self.interval)
+
+    def seed(self, klines):
+        # warm the indicators and the window from a block of candles in one vectorized pass
+        close = np.asarray(klines['close'], dtype=np.float64)
+        if len(close) == 0:
+            return
+        arrays = self.graph.seed(klines)
+        if self.risk is not None:
+            self.risk.seed(self.symbol, klines)
 
-        self.logger.info("last 5 historic data:\n%s", self.kline_data.tail(5).to_string(index=False))
+        rows = np.column_stack([
+            klines['timestamp'],
+            klines['open'],
+            klines['high'],
+            klines['low'],
+            close,
+            klines['volume'],
+            *(arrays[node] for node in self.columns.values())
+        ])
+        self.kline_data.extend(rows)
+        for row in rows.tolist():
+            self.writer.write_kline(self.symbol, row)
 
     def append_data_to_df(self, kline):
-        # Calculate indicators
-        previous_price = self.kline_data['close'].iloc[-1] if len(self.kline_data) > 0 else 0
-        rsi_value = self.rsi.update(kline['close'], previous_price)
-        upper_band, middle_band, lower_band = self.bbands.update(kline['close'])
-
-        # Append new data to the DataFrame using loc
-        new_data = pd.DataFrame({
-            'timestamp': [kline['time']],
-            'open': [kline['open']],
-            'high': [kline['high']],
-            'low': [kline['low']],
-            'close': [kline['close']],
-            'volume': [kline['volume']],
-            'rsi': [rsi_value],
-            'UpperBB': [upper_band],
-            'MiddleBB': [middle_band],
-            'LowerBB': [lower_band]
-        }, index=[len(self.kline_data)])
-
-        self.kline_data = pd.concat([self.kline_data, new_data], ignore_index=True)
-        #self.logger.info(f"New data appended to DataFrame: {new_data}")
-        #self.logger.info('data appended to DataFrame')
+        # Calculate indicators, each graph node once however many strategies read it
+        self.graph.update(kline)
+        value = self.graph.value
+        self.timer.mark('indicators')
 
-    def handle_socket_message(self, msg):
-        self.logger.info('Message received')
-        self.logger.debug(msg)
+        row = (
+            kline['time'],
+            kline['open'],
+            kline['high'],
+            kline['low'],
+            kline['close'],
+            kline['volume'],
+            value(self.columns['rsi']),
+            value(self.columns['upper_band']),
+            value(self.columns['middle_band']),
+            value(self.columns['lower_band'])
+        )
+        # Append the candle to the fixed-size window and queue it for disk, nothing is written on this thread
+        self.kline_data.append(row)
+        self.writer.write_kline(self.symbol, row)
+        self.timer.mark('persistence')
 
+    def handle_socket_message(self, msg):
         kline = msg['k']
-        live_kline_data = {
-            'time': pd.to_datetime(kline['t'], unit='ms'),
-            'open': float(kline['o']),
-            'high': float(kline['h']),
-            'low': float(kline['l']),
-            'close': float(kline['c']),
-            'volume': float(kline['v']),
-            'close_time': pd.to_datetime(kline['T'], unit='ms')
-        }
-
-        # Log the received kline data
-        self.logger.info(f"Received kline data: {live_kline_data}")
-
-        # Check if the received data already exists in the DataFrame
-        if not self.kline_data.empty and self.kline_data.tail(1)['timestamp'].iloc[0] == live_kline_data['time']:
-            self.logger.warning(f"Duplicate kline data received: {live_kline_data}")
+        # the stream sends the open candle every couple of seconds, only its final message (x) is a closed candle
+        if not kline['x']:
             return
+        with self.lock:
+            self.timer = self.latency.timer(self.symbol)
+            self.logger.debug('Message received: %s', msg)
 
-        self.append_data_to_df(live_kline_data)
-        self.logger.info("Live data:\n%s", self.kline_data.tail(5).to_string(index=False))
-        self.logger.debug(self.kline_data)
-        self.check_signal()
+            # timestamps stay as epoch ms, the window stores them as numbers
+            live_kline_data = {
+                'time': kline['t'],
+                'open': float(kline['o']),
+                'high': float(kline['h']),
+                'low': float(kline['l']),
+                'close': float(kline['c']),
+                'volume': float(kline['v']),
+                'close_time': kline['T']
+            }
+            self.timer.mark('parse')
+
+            # a candle the window already holds, e.g. sent again after a reconnect
+            if not self.kline_data.empty and live_kline_data['time'] <= self.kline_data['timestamp'][-1]:
+                self.logger.debug("Duplicate kline data received: %s", live_kline_data)
+                self.timer.done()
+                return
+
+            self.on_bar(live_kline_data)
 
-        max_rows = 60
-        if len(self.kline_data) > max_rows:
-            try:
-                row_to_append = self.kline_data.iloc[0]
-                row_to_append.to_frame().T.to_csv('kline_data.csv', mode='a', header=not os.path.exists('kline_data.csv'), index=False)
-                self.kline_data.drop(self.kline_data.index[0], inplace=True)
-            except Exception as e:
-                self.logger.warning(f"Error occurred while writing to CSV: {e}")
+    def stream_names(self):
+        return [f"{self.symbol.lower()}@trade" if self.bars is not None else f"{self.symbol.lower()}@kline_{self.interval}"]
+
+    def handle_stream_message(self, msg):
+        # a feed message, combined streams wrap the event as {'stream': ..., 'data': event}
+        data = msg.get('data', msg)
+        if data.get('e') == 'trade':
+            self.handle_trade_message(data)
+        else:
+            self.handle_socket_message(data)
+
+    def handle_trade_message(self, msg):
+        # one raw trade ({'e': 'trade', 'p': price, 'q': quantity, 'T': trade time, ...}) into self.bars
+        with self.lock:
+            self.timer = self.latency.timer(self.symbol)
+            price = float(msg['p'])
+            bar = self.bars.add(msg['T'], price, float(msg['q']))
+            self.timer.mark('parse')
+            if self.order_calculator.positions.count(self.symbol):
+                # intrabar exits, stop loss and take profit are checked on every trade
+                self.order_calculator.manage_orders(price, symbol=self.symbol)
+            if bar is not None:
+                self.on_bar(bar)
+
+    def partial_bar(self):
+        # the bar still being built from trades, None on the kline stream or before its first trade
+        return self.bars.partial() if self.bars is not None else None
+
+    def on_bar(self, bar):
+        # a finished candle, from the kline stream or from self.bars
+        self.append_data_to_df(bar)
+        if self.risk is not None:
+            self.risk.update(self.symbol, bar['time'], bar['high'], bar['low'], bar['close'])
+        # the window is only formatted when debug logging is on
+        self.logger.debug("Live data:\n%s", self.kline_data.tail(5))
+        self.check_signal()
+        self.timer.done()
 
     def check_signal(self):
-        lower_band = self.bbands.lower_band[-1]
-        rsi_value = self.rsi.values[-1]
-        bandwidth_roc = self.bbands.calculate_bandwidth_roc()
-        if self.trigger.rsi_and_bb_expansion_strategy(price_data=self.kline_data, lower_band=lower_band, rsi_value=rsi_value, bandwidth_roc=bandwidth_roc):
-            print('Signal detected')
-            self.order_calculator.buy_order(
-                symbol=self.symbol,
-                order_type='market',
-                quantity=self.order_calculator.calculate_order_size(entry_price=self.kline_data['close'].iloc[-1]),
-                newClientOrderId='test_order').manage_orders(closing_price=self.kline_data['close'].iloc[-1])
+        closing_price = self.kline_data['close'][-1]
+        # sell first so a position closed on this candle doesn't block a new signal
+        self.order_calculator.manage_orders(closing_price, symbol=self.symbol)
+        self.timer.mark('exits')
+
+        if len(self.bbands.lower_band) == 0:
+            return  # not enough candles for the bands yet
+        fired = self.graph.evaluate()
+        self.timer.mark('trigger')
+        if fired:
+            self.logger.info('Signal detected: %s', ', '.join(fired))
+            if not self.order_calculator.can_open(self.symbol):
+                self.logger.info("Signal ignored, %d order(s) still open", self.order_calculator.positions.count(self.symbol))
+                return
+            quantity, stop_loss, take_profit = self.order_calculator.calculate_order_size(
+                entry_price=closing_price, middle_band=self.graph.value(self.columns['middle_band']), symbol=self.symbol)
+            self.timer.mark('sizing')
+            if quantity > 0:
+                self.order_calculator.buy_order(
+                    symbol=self.symbol,
+                    quantity=quantity,
+                    entry_price=closing_price,
+                    take_profit=take_profit,
+                    stop_loss=stop_loss)
+                self.timer.mark('submission')
 
     def start(self):
         self.fetch_historical_data()
-        self.twm.start()
-        stream_name = self.twm.start_kline_socket(
-            symbol=self.symbol,
-            interval=self.interval,
-            callback=self.handle_socket_message
-        )  # need to call fetch historical data here to fill the dataframe b4 the ws stream starts
+        if self.snapshots is not None:
+            self.snapshots.start([self])
+        if self.feed is None:
+            self.feed = BinanceFeed(self.api_key, self.api_secret)
+        self.feed.subscribe(self.stream_names(), self.handle_stream_message)
         try:
-            while True:
-                time.sleep(1)
+            self.feed.run()  # until the feed runs out (a replay) or Ctrl-C
         except KeyboardInterrupt:
-            self.twm.stop_socket(stream_name)
-            self.twm.join()
- 
+            pass
+        finally:
+            self.feed.stop()
+            if self.snapshots is not None:
+                self.snapshots.close()  # one last snapshot with whatever the feed delivered
+            self.close()
 
+    def close(self):
+        # the executor first, the orders it still sends are handed to the writer
+        self.executor.close()
+        self.writer.close()
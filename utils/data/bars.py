@@ -0,0 +1,187 @@
+import numpy as np
+from utils.data.intervals import interval_to_ms
+
+TRADE_FIELDS = ('timestamp', 'price', 'quantity')
+
+# binance trade dumps (data.binance.vision): id, price, qty, quote_qty, time, is_buyer_maker, is_best_match
+_BINANCE_TRADE_COLUMNS = ['id', 'price', 'qty', 'quote_qty', 'time', 'is_buyer_maker', 'is_best_match']
+_TRADE_RENAMES = {'qty': 'quantity', 'time': 'timestamp'}
+
+
+class BarAggregator:
+    """
+Builds bars from individual trades.
+
+add() folds one trade into the bar in progress and returns the bar it
+finished (a kline dict as Bot.on_bar takes it), or None. The bar in
+progress is a handful of float attributes, so a trade costs a few
+comparisons and additions and nothing is allocated until a bar is
+emitted. partial() snapshots the unfinished bar, e.g. for intrabar checks.
+Subclasses decide where a bar ends: TimeBars before the first trade of the
+next interval, the threshold bars on the trade that reaches the threshold
+(that trade belongs to the bar, nothing is carried over).
+
+    bars = VolumeBars(50)
+    for timestamp, price, quantity in trades:
+        bar = bars.add(timestamp, price, quantity)
+        if bar is not None:
+            bot.on_bar(bar)
+"""
+    def __init__(self):
+        self.count = 0  # bars emitted so far
+        self.trades = 0  # trades in the bar in progress
+        self.open_time = self.close_time = 0
+        self.open = self.high = self.low = self.close = 0.0
+        self.volume = self.quote_volume = 0.0
+
+    def add(self, timestamp, price, quantity):
+        finished = self._finish() if self.trades and self._ends_before(timestamp) else None
+        if not self.trades:
+            self.open_time = self._bar_start(timestamp)
+            self.open = self.high = self.low = price
+        elif price > self.high:
+            self.high = price
+        elif price < self.low:
+            self.low = price
+        self.close = price
+        self.close_time = timestamp
+        self.volume += quantity
+        self.quote_volume += price * quantity
+        self.trades += 1
+        if finished is None and self._ends_after():
+            finished = self._finish()
+        return finished
+
+    def partial(self):
+        # the unfinished bar, None before its first trade
+        return self._bar() if self.trades else None
+
+    def flush(self):
+        # finish the bar in progress early, e.g. at the end of a replay
+        return self._finish() if self.trades else None
+
+    def _bar_start(self, timestamp):
+        return timestamp
+
+    def _ends_before(self, timestamp):
+        return False
+
+    def _ends_after(self):
+        return False
+
+    def _bar(self):
+        return {
+            'time': self.open_time,
+            'open': self.open,
+            'high': self.high,
+            'low': self.low,
+            'close': self.close,
+            'volume': self.volume,
+            'close_time': self.close_time,
+            'quote_volume': self.quote_volume,
+            'trades': self.trades,
+        }
+
+    def _finish(self):
+        bar = self._bar()
+        self.count += 1
+        self.trades = 0
+        self.volume = self.quote_volume = 0.0
+        return bar
+
+
+class TimeBars(BarAggregator):
+    # klines built locally: `interval` ('1m', ...) or milliseconds, aligned like binance's, empty intervals emit nothing
+    def __init__(self, interval):
+        super().__init__()
+        self.interval_ms = interval_to_ms(interval) if isinstance(interval, str) else int(interval)
+        self._end = 0
+
+    def _bar_start(self, timestamp):
+        start = timestamp - timestamp % self.interval_ms
+        self._end = start + self.interval_ms
+        return start
+
+    def _ends_before(self, timestamp):
+        return timestamp >= self._end
+
+    def _bar(self):
+        bar = super()._bar()
+        bar['close_time'] = self._end - 1
+        return bar
+
+
+class TickBars(BarAggregator):
+    # a bar every `count` trades
+    def __init__(self, count):
+        super().__init__()
+        self.size = count
+
+    def _ends_after(self):
+        return self.trades >= self.size
+
+
+class VolumeBars(BarAggregator):
+    # a bar once `threshold` of the base asset has traded
+    def __init__(self, threshold):
+        super().__init__()
+        self.threshold = threshold
+
+    def _ends_after(self):
+        return self.volume >= self.threshold
+
+
+class DollarBars(BarAggregator):
+    # a bar once `threshold` of the quote asset has traded
+    def __init__(self, threshold):
+        super().__init__()
+        self.threshold = threshold
+
+    def _ends_after(self):
+        return self.quote_volume >= self.threshold
+
+
+def time_bars(trades, interval):
+    """
+    TimeBars over a whole trade history at once, as a dict of arrays (one entry per bar,
+    the last bar included even if its interval isn't over). Trades must be in time order.
+    """
+    interval_ms = interval_to_ms(interval) if isinstance(interval, str) else int(interval)
+    timestamps = np.asarray(trades['timestamp'], dtype=np.int64)
+    prices = np.asarray(trades['price'], dtype=np.float64)
+    quantities = np.asarray(trades['quantity'], dtype=np.float64)
+    if len(timestamps) == 0:
+        return {name: np.array([]) for name in ('time', 'open', 'high', 'low', 'close', 'volume', 'close_time', 'quote_volume', 'trades')}
+    starts = timestamps - timestamps % interval_ms
+    first = np.flatnonzero(np.r_[True, starts[1:] != starts[:-1]])
+    last = np.r_[first[1:] - 1, len(timestamps) - 1]
+    return {
+        'time': starts[first],
+        'open': prices[first],
+        'high': np.maximum.reduceat(prices, first),
+        'low': np.minimum.reduceat(prices, first),
+        'close': prices[last],
+        'volume': np.add.reduceat(quantities, first),
+        'close_time': starts[first] + interval_ms - 1,
+        'quote_volume': np.add.reduceat(prices * quantities, first),
+        'trades': np.diff(np.r_[first, len(timestamps)]),
+    }
+
+
+def load_trades(path):
+    """
+    Load recorded trades into a dict of NumPy arrays keyed by TRADE_FIELDS: a binance trade
+    dump (with or without its header) or a csv with timestamp, price and quantity columns.
+    """
+    import pandas as pd
+    with open(path) as f:
+        has_header = not f.readline()[:1].isdigit()
+    if has_header:
+        frame = pd.read_csv(path).rename(columns=_TRADE_RENAMES)
+    else:
+        frame = pd.read_csv(path, header=None, names=_BINANCE_TRADE_COLUMNS).rename(columns=_TRADE_RENAMES)
+    return {
+        'timestamp': frame['timestamp'].to_numpy(dtype=np.int64),
+        'price': frame['price'].to_numpy(dtype=np.float64),
+        'quantity': frame['quantity'].to_numpy(dtype=np.float64),
+    }
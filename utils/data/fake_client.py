@@ -0,0 +1,78 @@
+import time
+import numpy as np
+from utils.data.intervals import interval_to_ms
+
+
+class FakeClient:
+    """
+In-memory stand-in for binance.Client, for tests and offline runs.
+
+Serves klines you hand it in the REST response format (lists of
+[open time, open, high, low, close, volume, close time, ...] with prices as
+strings) and records test orders. Every REST call is logged in `requests`
+so tests can check how much was actually fetched.
+
+    client = FakeClient(now_ms=...)
+    client.add_klines('BTCUSDT', '15m', klines)   # dict of arrays, timestamp in epoch ms
+    bot = Bot('BTCUSDT', '15m', None, None, client=client)
+"""
+    def __init__(self, now_ms=None):
+        self.now_ms = now_ms  # None follows the wall clock
+        self.klines = {}
+        self.requests = []
+        self.orders = []
+
+    def now(self):
+        return self.now_ms if self.now_ms is not None else int(time.time() * 1000)
+
+    def add_klines(self, symbol, interval, klines):
+        timestamps = np.asarray(klines['timestamp'], dtype=np.int64)
+        close_times = klines.get('close_time')
+        if close_times is None:
+            close_times = timestamps + interval_to_ms(interval) - 1
+        self.klines[(symbol, interval)] = {
+            'timestamp': timestamps,
+            'close_time': np.asarray(close_times, dtype=np.int64),
+            **{name: np.asarray(klines[name], dtype=np.float64) for name in ('open', 'high', 'low', 'close', 'volume')},
+        }
+
+    def get_klines(self, symbol, interval, startTime=None, endTime=None, limit=500, **params):
+        self.requests.append({'method': 'get_klines', 'symbol': symbol, 'interval': interval,
+                              'startTime': startTime, 'endTime': endTime, 'limit': limit})
+        data = self.klines.get((symbol, interval))
+        if data is None:
+            return []
+        timestamps = data['timestamp']
+        # candles that haven't opened yet don't exist, the currently open one does
+        mask = timestamps <= self.now()
+        if startTime is not None:
+            mask &= timestamps >= int(startTime)
+        if endTime is not None:
+            mask &= timestamps <= int(endTime)
+        index = np.flatnonzero(mask)
+        index = index[:limit] if startTime is not None else index[-limit:]
+        return [self._kline(data, i) for i in index]
+
+    def get_historical_klines(self, symbol, interval, start_str=None, end_str=None, limit=None, **params):
+        if start_str is None:
+            return self.get_klines(symbol, interval, endTime=end_str, limit=limit or 1000)
+        output = []
+        start = int(start_str)
+        while True:
+            page = self.get_klines(symbol, interval, startTime=start, endTime=end_str, limit=limit or 1000)
+            output += page
+            if len(page) < (limit or 1000) or (limit and len(output) >= limit):
+                break
+            start = page[-1][0] + interval_to_ms(interval)
+        return output[:limit] if limit else output
+
+    def create_test_order(self, **params):
+        self.orders.append(params)
+        return {}
+
+    @staticmethod
+    def _kline(data, i):
+        close_time = int(data['close_time'][i])
+        return [int(data['timestamp'][i]), repr(float(data['open'][i])), repr(float(data['high'][i])),
+                repr(float(data['low'][i])), repr(float(data['close'][i])), repr(float(data['volume'][i])),
+                close_time, '0', 0, '0', '0', '0']
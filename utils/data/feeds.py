@@ -0,0 +1,169 @@
+import threading
+import time
+import numpy as np
+from utils.data.intervals import interval_to_ms
+
+
+class BinanceFeed:
+    """
+Live market data from binance's websocket streams.
+
+A feed is where Bot.start and MultiSymbolBot read the market from:
+subscribe() takes stream names ('btcusdt@kline_15m', 'btcusdt@trade') and a
+callback that gets every message in binance's combined-stream format
+({'stream': ..., 'data': event}) on the feed's thread, run() blocks until
+the feed ends or stop() is called. ReplayFeed is the offline one.
+"""
+    def __init__(self, api_key=None, api_secret=None, tld='us'):
+        self.api_key = api_key
+        self.api_secret = api_secret
+        self.tld = tld
+        self.twm = None
+        self._stop = threading.Event()
+
+    def subscribe(self, streams, callback):
+        if self.twm is None:
+            from binance import ThreadedWebsocketManager
+            self.twm = ThreadedWebsocketManager(api_key=self.api_key, api_secret=self.api_secret, tld=self.tld)
+            self.twm.start()
+        self.twm.start_multiplex_socket(callback=callback, streams=list(streams))
+
+    def run(self):
+        while not self._stop.wait(1):
+            pass
+
+    def stop(self):
+        self._stop.set()
+        if self.twm is not None:
+            self.twm.stop()
+            self.twm.join()
+            self.twm = None
+
+
+class ReplayFeed:
+    """
+Recorded klines and trades played back as binance stream messages.
+
+run() merges every subscribed stream by event time (a kline's close time, a
+trade's time) and calls back on the caller's thread, at `speed` times real
+time (1.0 real time, 60.0 an hour a minute) or, with speed=None, as fast as
+the callbacks return. Only candles opening at or after `start` are streamed,
+the ones before are history: a ReplayExchange serves them over REST, so
+Bot.fetch_historical_data warms up as it would against binance. now() is
+the replay clock and `prices` the last price of every symbol.
+
+    feed = ReplayFeed(speed=None, start=klines['timestamp'][60])
+    feed.add_klines('BTCUSDT', '15m', klines)      # dict of arrays, as load_klines returns
+    feed.add_trades('ETHUSDT', load_trades(path))
+"""
+    def __init__(self, speed=None, start=None):
+        self.speed = speed
+        self.start = start
+        self.klines = {}  # (symbol, interval) -> dict of arrays, FakeClient's layout
+        self.trades = {}  # symbol -> dict of arrays
+        self.time = start - 1 if start is not None else 0
+        self.prices = {}
+        self.sent = 0
+        self.sent_at = {}  # symbol -> perf_counter_ns() when its last message was handed over
+        self._subscriptions = []
+        self._stop = threading.Event()
+
+    def now(self):
+        return self.time
+
+    def add_klines(self, symbol, interval, klines):
+        timestamps = np.asarray(klines['timestamp'], dtype=np.int64)
+        close_times = klines.get('close_time')
+        self.klines[(symbol, interval)] = {
+            'timestamp': timestamps,
+            'close_time': np.asarray(close_times if close_times is not None else timestamps + interval_to_ms(interval) - 1,
+                                     dtype=np.int64),
+            **{name: np.asarray(klines[name], dtype=np.float64) for name in ('open', 'high', 'low', 'close', 'volume')},
+        }
+
+    def add_trades(self, symbol, trades):
+        self.trades[symbol] = {
+            'timestamp': np.asarray(trades['timestamp'], dtype=np.int64),
+            'price': np.asarray(trades['price'], dtype=np.float64),
+            'quantity': np.asarray(trades['quantity'], dtype=np.float64),
+        }
+
+    def subscribe(self, streams, callback):
+        self._subscriptions.append((list(streams), callback))
+
+    def run(self):
+        sources, times = [], []
+        for streams, callback in self._subscriptions:
+            for stream in streams:
+                source = self._source(stream, callback)
+                if source is not None:
+                    sources.append(source)
+                    times.append(source[-1])
+        if not sources:
+            return
+        counts = [len(event_times) for event_times in times]
+        times = np.concatenate(times)
+        order = np.argsort(times, kind='stable')
+        which = np.repeat(np.arange(len(sources)), counts)[order].tolist()
+        rows = np.concatenate([np.arange(count) for count in counts])[order].tolist()
+
+        started, first = time.perf_counter(), int(times[order[0]]) if len(order) else 0
+        times = times[order].tolist()
+        for source, row, event_time in zip(which, rows, times):
+            if self._stop.is_set():
+                break
+            if self.speed:
+                delay = started + (event_time - first) / 1000 / self.speed - time.perf_counter()
+                if delay > 0 and self._stop.wait(delay):
+                    break
+            name, callback, symbol, message, data, prices, offset, _ = sources[source]
+            msg = message(name, symbol, data, offset + row)
+            self.time = event_time
+            self.prices[symbol] = float(prices[offset + row])
+            self.sent_at[symbol] = time.perf_counter_ns()
+            callback(msg)
+            self.sent += 1
+
+    def stop(self):
+        self._stop.set()
+
+    def _source(self, stream, callback):
+        # (stream, callback, symbol, message builder, data, prices, first row, event times) of one stream
+        symbol, _, kind = stream.partition('@')
+        symbol = symbol.upper()
+        if kind.startswith('kline_'):
+            data = self.klines.get((symbol, kind[len('kline_'):]))
+            if data is None:
+                return None
+            offset = int(np.searchsorted(data['timestamp'], self.start)) if self.start is not None else 0
+            return stream, callback, symbol, _kline_message, data, data['close'], offset, data['close_time'][offset:]
+        if kind == 'trade':
+            data = self.trades.get(symbol)
+            if data is None:
+                return None
+            offset = int(np.searchsorted(data['timestamp'], self.start)) if self.start is not None else 0
+            return stream, callback, symbol, _trade_message, data, data['price'], offset, data['timestamp'][offset:]
+        raise ValueError(f"Can't replay stream {stream!r}")
+
+
+def _kline_message(stream, symbol, data, i):
+    close_time = int(data['close_time'][i])
+    return {'stream': stream, 'data': {'e': 'kline', 'E': close_time, 's': symbol, 'k': {
+        't': int(data['timestamp'][i]),
+        'T': close_time,
+        's': symbol,
+        'i': stream.partition('@kline_')[2],
+        'o': repr(float(data['open'][i])),
+        'c': repr(float(data['close'][i])),
+        'h': repr(float(data['high'][i])),
+        'l': repr(float(data['low'][i])),
+        'v': repr(float(data['volume'][i])),
+        'x': True,
+    }}}
+
+
+def _trade_message(stream, symbol, data, i):
+    timestamp = int(data['timestamp'][i])
+    return {'stream': stream, 'data': {'e': 'trade', 'E': timestamp, 's': symbol, 't': i,
+                                       'p': repr(float(data['price'][i])), 'q': repr(float(data['quantity'][i])),
+                                       'T': timestamp}}
@@ -0,0 +1,35 @@
+# binance kline interval strings and their length in milliseconds
+INTERVAL_MS = {
+    '1m': 60_000,
+    '3m': 3 * 60_000,
+    '5m': 5 * 60_000,
+    '15m': 15 * 60_000,
+    '30m': 30 * 60_000,
+    '1h': 60 * 60_000,
+    '2h': 2 * 60 * 60_000,
+    '4h': 4 * 60 * 60_000,
+    '6h': 6 * 60 * 60_000,
+    '8h': 8 * 60 * 60_000,
+    '12h': 12 * 60 * 60_000,
+    '1d': 24 * 60 * 60_000,
+    '3d': 3 * 24 * 60 * 60_000,
+    '1w': 7 * 24 * 60 * 60_000,
+}
+
+
+def interval_to_ms(interval):
+    try:
+        return INTERVAL_MS[interval]
+    except KeyError:
+        raise ValueError(f"Unsupported kline interval: {interval}") from None
+
+
+# binance weeks open on Monday, the epoch was a Thursday
+_WEEK_OFFSET_MS = 4 * 24 * 60 * 60_000
+
+
+def interval_start(timestamp, interval_ms):
+    # open time of the `interval_ms` candle holding `timestamp` (ints or NumPy arrays)
+    if interval_ms == INTERVAL_MS['1w']:
+        return timestamp - (timestamp - _WEEK_OFFSET_MS) % interval_ms
+    return timestamp - timestamp % interval_ms
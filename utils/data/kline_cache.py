@@ -0,0 +1,106 @@
+import logging
+import os
+import time
+import numpy as np
+from utils.data.intervals import interval_to_ms
+from utils.data.store import dedup_by_timestamp, save_atomic
+
+logger = logging.getLogger(__name__)
+
+CACHE_COLUMNS = ('timestamp', 'open', 'high', 'low', 'close', 'volume', 'close_time')
+
+# binance caps a klines request at 1000 rows
+_PAGE_LIMIT = 1000
+
+
+class KlineCache:
+    """
+On-disk cache of closed klines per symbol/interval, with incremental fetching.
+
+get() loads the cached candles in bulk (one memory-mapped .npy per
+symbol/interval), works out the first candle missing from the requested
+range (a gap, or the tail since the last run) and only asks the REST client
+for candles from there on. Closed candles are written back to the cache; the
+still-open candle is returned (unless closed_only) but never cached.
+
+    cache = KlineCache(client)
+    klines = cache.get('BTCUSDT', '15m', limit=59)   # dict of arrays, oldest first
+"""
+    def __init__(self, client, root=os.path.join('data', 'cache')):
+        self.client = client
+        self.root = root
+
+    def path(self, symbol, interval):
+        return os.path.join(self.root, symbol, f'{interval}.npy')
+
+    def load(self, symbol, interval):
+        path = self.path(symbol, interval)
+        if not os.path.exists(path):
+            return np.empty((len(CACHE_COLUMNS), 0))
+        return np.load(path, mmap_mode='r')
+
+    def get(self, symbol, interval, limit, closed_only=False):
+        now = self._now()
+        try:
+            interval_ms = interval_to_ms(interval)
+        except ValueError:
+            # irregular intervals (e.g. 1M) can't be gap-checked, go straight to the exchange
+            block = _to_block(self.client.get_klines(symbol=symbol, interval=interval, limit=limit))
+            return _columns(block[:, block[6] < now] if closed_only else block)
+
+        start = now - limit * interval_ms + 1
+        cached = self.load(symbol, interval)
+        in_range = cached[:, cached[0] >= start]
+        fetch_from = _first_missing(in_range[0], start, interval_ms)
+        fresh = self._fetch(symbol, interval, fetch_from)
+        logger.debug("%s %s: %d cached, %d fetched from %d", symbol, interval, in_range.shape[1], fresh.shape[1], fetch_from)
+
+        closed = fresh[:, fresh[6] < now]
+        if closed.shape[1]:
+            os.makedirs(os.path.dirname(self.path(symbol, interval)), exist_ok=True)
+            save_atomic(self.path(symbol, interval), dedup_by_timestamp(np.concatenate([cached, closed], axis=1)))
+
+        block = dedup_by_timestamp(np.concatenate([in_range, fresh], axis=1))
+        if closed_only:
+            block = block[:, block[6] < now]
+        return _columns(block[:, -limit:])
+
+    def _fetch(self, symbol, interval, start):
+        rows = []
+        while True:
+            page = self.client.get_klines(symbol=symbol, interval=interval, startTime=start, limit=_PAGE_LIMIT)
+            rows += page
+            if len(page) < _PAGE_LIMIT:
+                return _to_block(rows)
+            start = page[-1][0] + 1
+
+    def _now(self):
+        # a FakeClient carries its own clock, binance's client doesn't
+        now = getattr(self.client, 'now', None)
+        if now is not None:
+            return now()
+        return int(time.time() * 1000)
+
+
+def _first_missing(timestamps, start, interval_ms):
+    # open time of the first candle the cache can't provide, from `start` onwards
+    if len(timestamps) == 0 or timestamps[0] - start >= interval_ms:
+        return start
+    gaps = np.flatnonzero(np.diff(timestamps) > interval_ms)
+    if len(gaps):
+        return int(timestamps[gaps[0]]) + interval_ms
+    return int(timestamps[-1]) + interval_ms
+
+
+def _to_block(rows):
+    # REST kline rows -> (CACHE_COLUMNS, rows) float64 block
+    if not rows:
+        return np.empty((len(CACHE_COLUMNS), 0))
+    return np.array([row[:7] for row in rows], dtype=np.float64).T
+
+
+def _columns(block):
+    klines = {name: block[i] for i, name in enumerate(CACHE_COLUMNS)}
+    klines['timestamp'] = klines['timestamp'].astype(np.int64)
+    klines['close_time'] = klines['close_time'].astype(np.int64)
+    return klines
@@ -0,0 +1,147 @@
+import numpy as np
+
+KLINE_COLUMNS = ('timestamp', 'open', 'high', 'low', 'close', 'volume', 'rsi', 'UpperBB', 'MiddleBB', 'LowerBB')
+
+
+class KlineWindow:
+    """
+Fixed-size columnar window of the most recent candles.
+
+All columns live in one preallocated float64 matrix (timestamps are stored as
+epoch milliseconds, which float64 holds exactly). Like RingBuffer, each row is
+written twice so every column of the live window is one contiguous slice:
+appending and evicting are O(1) and `window['close']` is a zero-copy,
+read-only view, oldest candle first.
+
+    window = KlineWindow(capacity=60)
+    evicted = window.append({'timestamp': ms, 'open': o, ..., 'LowerBB': lb})
+    window['close'][-1]     # latest close
+    window.to_frame()       # pandas DataFrame, only built when asked for
+
+`append` returns the row that fell out of the window (as a dict) once the
+window is full, so callers can persist it; otherwise None.
+"""
+    def __init__(self, capacity=60, columns=KLINE_COLUMNS):
+        self.capacity = capacity
+        self.columns = tuple(columns)
+        self._col_index = {name: i for i, name in enumerate(self.columns)}
+        self._data = np.full((len(self.columns), capacity * 2), np.nan)
+        self._start = 0
+        self._size = 0
+        self._frame = None
+
+    def append(self, row):
+        if isinstance(row, dict):
+            row = [row.get(name, np.nan) for name in self.columns]
+        # None (e.g. bands before the window is full) is stored as NaN
+        values = [np.nan if value is None else value for value in row]
+
+        cap = self.capacity
+        evicted = None
+        if self._size < cap:
+            pos = self._start + self._size
+            self._size += 1
+        else:
+            pos = self._start
+            evicted = dict(zip(self.columns, self._data[:, pos].tolist()))
+            self._start = pos + 1 if pos + 1 < cap else 0
+        self._data[:, pos] = values
+        self._data[:, pos + cap] = values
+        self._frame = None
+        return evicted
+
+    def extend(self, rows):
+        # bulk load, e.g. a column dict or 2D array of historical candles (one row per candle)
+        if isinstance(rows, dict):
+            n = len(next(iter(rows.values())))
+            block = np.full((len(self.columns), n), np.nan)
+            for name, values in rows.items():
+                block[self._col_index[name]] = values
+        else:
+            block = np.asarray(rows, dtype=np.float64).T
+        for values in block[:, -self.capacity:].T:
+            self.append(values)
+
+    def clear(self):
+        self._start = 0
+        self._size = 0
+        self._frame = None
+
+    def __getstate__(self):
+        # snapshots carry the matrix, not the cached DataFrame
+        return dict(self.__dict__, _frame=None)
+
+    def __getitem__(self, name):
+        i = self._col_index[name]
+        out = self._data[i, self._start:self._start + self._size]
+        out.flags.writeable = False
+        return out
+
+    def __contains__(self, name):
+        return name in self._col_index
+
+    def __len__(self):
+        return self._size
+
+    @property
+    def empty(self):
+        return self._size == 0
+
+    def row(self, index=-1):
+        if index < 0:
+            index += self._size
+        if index < 0 or index >= self._size:
+            raise IndexError("KlineWindow row index out of range")
+        return dict(zip(self.columns, self._data[:, self._start + index].tolist()))
+
+    def values(self):
+        # (rows, columns) view of the whole window, oldest row first
+        out = self._data[:, self._start:self._start + self._size].T
+        out.flags.writeable = False
+        return out
+
+    def to_frame(self, copy=True):
+        """
+        Build a pandas DataFrame of the window. The frame is cached until the
+        next append. With copy=False the float columns are views into the
+        window and will change underneath the frame once new candles arrive.
+        """
+        if self._frame is None or not copy:
+            frame = rows_to_frame(self.values(), self.columns, copy=copy)
+            if not copy:
+                return frame
+            self._frame = frame
+        return self._frame
+
+    def tail(self, n=5):
+        # lazily formatted, so passing it to a disabled log level costs nothing
+        return _WindowTail(self, n)
+
+    def __repr__(self):
+        return f"KlineWindow(capacity={self.capacity}, rows={self._size})\n{self.tail(self._size)}"
+
+
+def rows_to_frame(rows, columns=KLINE_COLUMNS, copy=True):
+    import pandas as pd  # only frames need it, the window itself is NumPy
+    rows = np.asarray(rows, dtype=np.float64)
+    data = {}
+    for i, name in enumerate(columns):
+        column = rows[:, i]
+        if name == 'timestamp':
+            column = pd.to_datetime(column.astype(np.int64), unit='ms')
+        elif copy:
+            column = column.copy()
+        data[name] = column
+    return pd.DataFrame(data, copy=False)
+
+
+class _WindowTail:
+    def __init__(self, window, n):
+        self.window = window
+        self.n = n
+
+    def __str__(self):
+        n = min(self.n, len(self.window))
+        if n == 0:
+            return "<empty>"
+        return rows_to_frame(self.window.values()[-n:], self.window.columns).to_string(index=False)
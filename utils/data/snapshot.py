@@ -0,0 +1,138 @@
+import logging
+import mmap
+import os
+import pickle
+import struct
+import threading
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+_MAGIC = b'GRODSNP1'
+_HEADER = struct.Struct('<8sQQ')  # magic, pickle length, number of array buffers
+_ALIGN = 64
+
+
+def capture(state):
+    """
+    Serialize `state` into (pickle bytes, array buffers). Arrays travel out of band as raw
+    copies of their memory (pickle protocol 5), so this is a memcpy of the ring buffers and
+    windows plus a small pickle, cheap enough to run while the owner holds its lock.
+    """
+    buffers = []
+    data = pickle.dumps(state, protocol=5, buffer_callback=buffers.append)
+    return data, [bytes(buffer.raw()) for buffer in buffers]
+
+
+def write_snapshot(path, captured):
+    # header, buffer table, pickle, then every buffer 64-byte aligned; written to a temp file and renamed
+    data, buffers = captured
+    offset = _HEADER.size + 16 * len(buffers) + len(data)
+    table = []
+    for buffer in buffers:
+        offset += -offset % _ALIGN
+        table.append((offset, len(buffer)))
+        offset += len(buffer)
+
+    tmp = f'{path}.{os.getpid()}.tmp'
+    with open(tmp, 'wb') as f:
+        f.write(_HEADER.pack(_MAGIC, len(data), len(buffers)))
+        f.write(np.array(table, dtype='<u8').reshape(-1, 2).tobytes())
+        f.write(data)
+        for (start, _), buffer in zip(table, buffers):
+            f.write(b'\0' * (start - f.tell()))
+            f.write(buffer)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+
+
+def load_snapshot(path):
+    """
+    Load a snapshot written by write_snapshot. The file is memory-mapped copy-on-write and
+    the arrays are rebuilt as views of the mapping, so loading costs the unpickling of the
+    small object graph; array pages are read (and copied) only when touched.
+    Snapshots are pickles: only load files this process family wrote.
+    """
+    with open(path, 'rb') as f:
+        mapping = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_COPY)
+    magic, data_length, count = _HEADER.unpack_from(mapping)
+    if magic != _MAGIC:
+        raise ValueError(f"{path} is not a snapshot")
+    table = np.frombuffer(mapping, dtype='<u8', count=2 * count, offset=_HEADER.size).reshape(-1, 2).tolist()
+    view = memoryview(mapping)
+    start = _HEADER.size + 16 * count
+    return pickle.loads(view[start:start + data_length], buffers=[view[offset:offset + length] for offset, length in table])
+
+
+class SnapshotStore:
+    """
+Warm-start snapshots, one file per symbol.
+
+Bots hand over their state with Bot.capture_state() (taken under the bot's
+lock so it never sees half a message); a background thread writes every
+bot's snapshot each `interval` seconds, skipping bots whose state hasn't
+changed, and once more on close(). Files are replaced atomically, so a
+crash mid-write leaves the previous snapshot in place.
+
+    snapshots = SnapshotStore('data/snapshots')
+    bot = Bot('BTCUSDT', '15m', key, secret, snapshots=snapshots)
+    bot.start()   # restores BTCUSDT.snap if present, then keeps it fresh
+"""
+    def __init__(self, root=os.path.join('data', 'snapshots'), interval=10.0):
+        self.root = root
+        self.interval = interval
+        self.bots = []
+        self._written = {}  # symbol -> last captured state, to skip unchanged bots
+        self._thread = None
+        self._stop = threading.Event()
+        self._lock = threading.Lock()
+
+    def path(self, symbol):
+        return os.path.join(self.root, f'{symbol}.snap')
+
+    def load(self, symbol):
+        # the symbol's last snapshot, None if there is none or it can't be read
+        path = self.path(symbol)
+        if not os.path.exists(path):
+            return None
+        try:
+            return load_snapshot(path)
+        except Exception:
+            logger.exception("Ignoring unreadable snapshot %s", path)
+            return None
+
+    def save(self, bot):
+        captured = bot.capture_state()
+        with self._lock:
+            if self._written.get(bot.symbol) == captured:
+                return False
+            os.makedirs(self.root, exist_ok=True)
+            write_snapshot(self.path(bot.symbol), captured)
+            self._written[bot.symbol] = captured
+        return True
+
+    def save_all(self):
+        for bot in self.bots:
+            try:
+                self.save(bot)
+            except Exception:
+                logger.exception("Error writing the snapshot of %s", bot.symbol)
+
+    def start(self, bots):
+        self.bots.extend(bot for bot in bots if bot not in self.bots)
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name='snapshot-writer', daemon=True)
+            self._thread.start()
+        return self
+
+    def close(self):
+        if self._thread is not None:
+            self._stop.set()
+            self._thread.join()
+            self._thread = None
+        self.save_all()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self.save_all()
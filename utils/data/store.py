@@ -0,0 +1,262 @@
+import atexit
+import json
+import logging
+import os
+import queue
+import threading
+import time
+import uuid
+from collections import defaultdict
+from datetime import datetime, timezone
+from functools import lru_cache
+import numpy as np
+from utils.data.kline_window import KLINE_COLUMNS
+
+logger = logging.getLogger(__name__)
+
+DAY_MS = 24 * 60 * 60 * 1000
+
+
+def day_of(timestamp_ms):
+    # UTC day partition of an epoch-ms timestamp
+    return _day_name(int(timestamp_ms) // DAY_MS)
+
+
+@lru_cache(maxsize=4096)
+def _day_name(day_index):
+    return datetime.fromtimestamp(day_index * DAY_MS // 1000, tz=timezone.utc).strftime('%Y-%m-%d')
+
+
+class PersistenceWriter:
+    """
+Background writer for kline and order history.
+
+Callers only enqueue rows (write_kline / write_order), which costs a queue
+put; a single writer thread batches them and flushes once `flush_rows` rows
+are buffered or `flush_interval` seconds have passed, and on close().
+
+Layout under `root`:
+    klines/<SYMBOL>/<YYYY-MM-DD>/part-<first timestamp>.npy   one flush
+    klines/<SYMBOL>/<YYYY-MM-DD>/day.npy                      compacted day
+    orders/<YYYY-MM-DD>.jsonl                                 append log
+
+Kline parts are (columns, rows) float64 arrays, so every column of a file is
+contiguous and KlineStore can memory-map them. When a symbol moves on to a
+new UTC day its previous day is compacted into a single day.npy.
+"""
+    def __init__(self, root='data', flush_rows=10_000, flush_interval=5.0, columns=KLINE_COLUMNS):
+        self.root = root
+        self.flush_rows = flush_rows
+        self.flush_interval = flush_interval
+        self.columns = tuple(columns)
+        self._queue = queue.SimpleQueue()
+        self._thread = None
+        self._lock = threading.Lock()
+        self._closed = False
+        self._current_day = {}  # symbol -> last day written, to know when to compact
+
+    def start(self):
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='persistence-writer', daemon=True)
+                self._thread.start()
+                atexit.register(self.close)
+        return self
+
+    def write_kline(self, symbol, row):
+        # row holds the values of `columns` in order, timestamp (epoch ms) first
+        self._put(('kline', symbol, row))
+
+    def write_order(self, order):
+        self._put(('order', None, dict(order)))
+
+    def flush(self, timeout=None):
+        if self._thread is None:
+            return
+        done = threading.Event()
+        self._queue.put(('flush', None, done))
+        done.wait(timeout)
+
+    def close(self, timeout=None):
+        with self._lock:
+            self._closed = True
+            thread = self._thread
+            if thread is None or not thread.is_alive():
+                return
+            done = threading.Event()
+            self._queue.put(('stop', None, done))
+        done.wait(timeout)
+        thread.join(timeout)
+
+    def _put(self, item):
+        if self._closed:
+            # nothing reads the queue any more, close whatever still writes (e.g. an OrderExecutor) first
+            logger.warning("%s written after the writer was closed, not persisted: %s", item[0], item[2])
+            return
+        if self._thread is None:
+            self.start()
+        self._queue.put(item)
+
+    def _run(self):
+        klines = defaultdict(list)  # (symbol, day) -> rows
+        orders = defaultdict(list)  # day -> order dicts
+        buffered = 0
+        last_flush = time.monotonic()
+        while True:
+            timeout = max(0.0, self.flush_interval - (time.monotonic() - last_flush))
+            try:
+                kind, symbol, item = self._queue.get(timeout=timeout)
+            except queue.Empty:
+                kind = None
+
+            if kind == 'kline':
+                klines[(symbol, day_of(item[0]))].append(item)
+                buffered += 1
+            elif kind == 'order':
+                orders[day_of(item.get('timestamp', time.time() * 1000))].append(item)
+                buffered += 1
+
+            stopping = kind == 'stop'
+            if stopping or kind == 'flush' or buffered >= self.flush_rows or time.monotonic() - last_flush >= self.flush_interval:
+                try:
+                    self._flush(klines, orders)
+                except Exception:
+                    logger.exception("Error flushing history to %s", self.root)
+                klines.clear()
+                orders.clear()
+                buffered = 0
+                last_flush = time.monotonic()
+                if kind in ('flush', 'stop'):
+                    item.set()
+                if stopping:
+                    return
+
+    def _flush(self, klines, orders):
+        for (symbol, day), rows in sorted(klines.items()):
+            self._write_kline_part(symbol, day, rows)
+        for day, day_orders in orders.items():
+            os.makedirs(os.path.join(self.root, 'orders'), exist_ok=True)
+            with open(os.path.join(self.root, 'orders', f'{day}.jsonl'), 'a') as f:
+                f.writelines(json.dumps(order, default=_json_default) + '\n' for order in day_orders)
+
+    def _write_kline_part(self, symbol, day, rows):
+        directory = os.path.join(self.root, 'klines', symbol, day)
+        os.makedirs(directory, exist_ok=True)
+        block = np.array(rows, dtype=np.float64).T  # None (no bands yet) becomes NaN
+        name = f'part-{int(block[0, 0]):013d}'
+        if os.path.exists(os.path.join(directory, name + '.npy')):
+            name += '-' + uuid.uuid4().hex[:8]
+        save_atomic(os.path.join(directory, name + '.npy'), block)
+
+        previous = self._current_day.get(symbol)
+        if previous is None:
+            # first write since start up, tidy whatever earlier runs left uncompacted
+            for earlier in os.listdir(os.path.join(self.root, 'klines', symbol)):
+                if earlier < day:
+                    compact_day(os.path.join(self.root, 'klines', symbol, earlier))
+        elif previous < day:
+            compact_day(os.path.join(self.root, 'klines', symbol, previous))
+        if previous is None or previous < day:
+            self._current_day[symbol] = day
+
+
+def compact_day(directory):
+    # merge every part of a day into day.npy, sorted by timestamp, last write wins on duplicates
+    parts = sorted(f for f in os.listdir(directory) if f.endswith('.npy'))
+    if parts == ['day.npy'] or not parts:
+        return
+    block = dedup_by_timestamp(np.concatenate([np.load(os.path.join(directory, f)) for f in parts], axis=1))
+    save_atomic(os.path.join(directory, 'day.npy'), block)
+    for f in parts:
+        if f != 'day.npy':
+            os.remove(os.path.join(directory, f))
+
+
+class KlineStore:
+    """
+Reader for the kline files written by PersistenceWriter.
+
+    store = KlineStore('data')
+    klines = store.read('BTCUSDT')                 # dict of column arrays
+    klines = store.read('BTCUSDT', start='2023-01-01', end='2023-06-30')
+
+Files are memory-mapped and only concatenated once, so years of candles load
+in a fraction of a second.
+"""
+    def __init__(self, root='data', columns=KLINE_COLUMNS):
+        self.root = root
+        self.columns = tuple(columns)
+
+    def symbols(self):
+        directory = os.path.join(self.root, 'klines')
+        return sorted(os.listdir(directory)) if os.path.isdir(directory) else []
+
+    def days(self, symbol):
+        directory = os.path.join(self.root, 'klines', symbol)
+        return sorted(os.listdir(directory)) if os.path.isdir(directory) else []
+
+    def parts(self, symbol, start=None, end=None):
+        # memory-mapped (columns, rows) blocks in chronological order, no data is read yet
+        start, end = _as_day(start), _as_day(end)
+        for day in self.days(symbol):
+            if (start and day < start) or (end and day > end):
+                continue
+            directory = os.path.join(self.root, 'klines', symbol, day)
+            for f in sorted(os.listdir(directory), key=lambda f: (f != 'day.npy', f)):
+                if f.endswith('.npy'):
+                    yield np.load(os.path.join(directory, f), mmap_mode='r')
+
+    def read(self, symbol, start=None, end=None):
+        blocks = list(self.parts(symbol, start, end))
+        if not blocks:
+            return {name: np.array([], dtype=np.int64 if name == 'timestamp' else np.float64) for name in self.columns}
+        block = dedup_by_timestamp(np.concatenate(blocks, axis=1))
+        klines = {name: block[i] for i, name in enumerate(self.columns)}
+        klines['timestamp'] = klines['timestamp'].astype(np.int64)
+        return klines
+
+    def read_frame(self, symbol, start=None, end=None):
+        import pandas as pd
+        frame = pd.DataFrame(self.read(symbol, start, end))
+        frame['timestamp'] = pd.to_datetime(frame['timestamp'], unit='ms')
+        return frame
+
+
+def read_orders(root='data', start=None, end=None):
+    import pandas as pd
+    directory = os.path.join(root, 'orders')
+    start, end = _as_day(start), _as_day(end)
+    frames = []
+    for f in sorted(os.listdir(directory)) if os.path.isdir(directory) else []:
+        day = f[:-len('.jsonl')]
+        if f.endswith('.jsonl') and not ((start and day < start) or (end and day > end)):
+            frames.append(pd.read_json(os.path.join(directory, f), lines=True))
+    return pd.concat(frames, ignore_index=True) if frames else pd.DataFrame()
+
+
+def dedup_by_timestamp(block):
+    timestamps = block[0]
+    if len(timestamps) < 2 or np.all(np.diff(timestamps) > 0):
+        return block
+    # keep the last row written for every timestamp
+    _, last = np.unique(timestamps[::-1], return_index=True)
+    return block[:, len(timestamps) - 1 - last]
+
+
+def save_atomic(path, array):
+    tmp = f'{path}.{os.getpid()}.tmp'
+    with open(tmp, 'wb') as f:
+        np.save(f, array)
+    os.replace(tmp, path)
+
+
+def _as_day(value):
+    if value is None or isinstance(value, str):
+        return value
+    return day_of(value)
+
+
+def _json_default(value):
+    if isinstance(value, np.generic):
+        return value.item()
+    return str(value)
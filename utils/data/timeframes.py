@@ -0,0 +1,144 @@
+import numpy as np
+from utils.data.intervals import interval_start, interval_to_ms
+
+CANDLE_FIELDS = ('open', 'high', 'low', 'close', 'volume')
+
+
+class RollUp:
+    """
+Builds `interval` candles from consecutive closed candles of a smaller
+`base_interval`, the way the exchange would have reported them.
+
+add() folds one base candle into the candle in progress and returns the
+higher candles it finished: normally none, one on the last base candle of
+the period. A period whose last base candle never arrives (the exchange
+skipped it, the bot was down) is finished by the first candle of the next
+one. The candle in progress is a few floats, so a base candle costs a
+handful of comparisons whatever the higher interval.
+
+    hourly = RollUp('1h', '15m')
+    for candle in candles_15m:
+        for bar in hourly.add(candle):
+            ...
+"""
+    def __init__(self, interval, base_interval):
+        self.interval = interval
+        self.interval_ms = interval_to_ms(interval)
+        self.base_ms = interval_to_ms(base_interval)
+        if self.interval_ms <= self.base_ms or self.interval_ms % self.base_ms:
+            raise ValueError(f"Can't build {interval} candles from {base_interval} candles")
+        self.count = 0  # higher candles finished so far
+        self.candles = 0  # base candles in the candle in progress
+        self.start = 0
+        self.open = self.high = self.low = self.close = 0.0
+        self.volume = 0.0
+
+    @property
+    def ratio(self):
+        # base candles per higher candle
+        return self.interval_ms // self.base_ms
+
+    def add(self, candle):
+        timestamp = candle['time']
+        start = interval_start(timestamp, self.interval_ms)
+        finished = ()
+        if self.candles:
+            if start < self.start:
+                return finished  # older than the candle in progress
+            if start != self.start:
+                finished = (self._finish(),)
+        if not self.candles:
+            self.start = start
+            self.open = candle['open']
+            self.high = candle['high']
+            self.low = candle['low']
+        else:
+            if candle['high'] > self.high:
+                self.high = candle['high']
+            if candle['low'] < self.low:
+                self.low = candle['low']
+        self.close = candle['close']
+        self.volume += candle['volume']
+        self.candles += 1
+        if timestamp + self.base_ms >= start + self.interval_ms:
+            finished += (self._finish(),)
+        return finished
+
+    def partial(self):
+        # the unfinished higher candle, None between periods
+        return self._bar() if self.candles else None
+
+    def seed(self, klines):
+        """
+        add() over a block of base klines (dict of arrays with 'timestamp' and CANDLE_FIELDS),
+        grouped with NumPy instead of candle by candle. Returns the finished higher candles as
+        a dict of arrays, plus 'available': the index of the base candle whose add() would have
+        returned each of them. Leaves the candle in progress as add() would have.
+        """
+        timestamps = np.asarray(klines['timestamp'], dtype=np.int64)
+        columns = {name: np.asarray(klines[name], dtype=np.float64) for name in CANDLE_FIELDS}
+        starts = interval_start(timestamps, self.interval_ms)
+
+        # finish the candle in progress candle by candle, it is at most `ratio` base candles away
+        head, available, i = [], [], 0
+        while i < len(timestamps) and self.candles and starts[i] <= self.start:
+            for bar in self.add(self._candle(timestamps, columns, i)):
+                head.append(bar)
+                available.append(i)
+            i += 1
+        if self.candles and i < len(timestamps):
+            head.append(self._finish())
+            available.append(i)
+
+        starts = starts[i:]
+        first = np.flatnonzero(np.r_[True, starts[1:] != starts[:-1]]) if len(starts) else np.array([], dtype=np.int64)
+        last = np.r_[first[1:] - 1, len(starts) - 1].astype(np.int64) if len(first) else first
+        complete = timestamps[i:][last] + self.base_ms >= starts[first] + self.interval_ms
+        if len(first) and not complete[-1]:
+            # the last period is still open, it becomes the candle in progress
+            for j in range(i + first[-1], len(timestamps)):
+                self.add(self._candle(timestamps, columns, j))
+            first, last, complete = first[:-1], last[:-1], complete[:-1]
+
+        stop = i + (last[-1] + 1 if len(last) else 0)  # the finished periods' candles
+        window = {name: values[i:stop] for name, values in columns.items()}
+        reduce = (lambda ufunc, values: ufunc.reduceat(values, first)) if len(first) else (lambda ufunc, values: values[:0])
+        bars = {
+            'time': starts[first],
+            'open': window['open'][first],
+            'high': reduce(np.maximum, window['high']),
+            'low': reduce(np.minimum, window['low']),
+            'close': window['close'][last],
+            'volume': reduce(np.add, window['volume']),
+            'close_time': starts[first] + self.interval_ms - 1,
+            # a complete period is known on its last candle, one with a hole on the next period's first
+            'available': i + np.where(complete, last, last + 1),
+        }
+        self.count += len(first)
+        if head:
+            bars = {name: np.r_[[bar[name] for bar in head] if name != 'available' else available, values]
+                    for name, values in bars.items()}
+        return bars
+
+    def _candle(self, timestamps, columns, i):
+        candle = {name: float(values[i]) for name, values in columns.items()}
+        candle['time'] = int(timestamps[i])
+        return candle
+
+    def _bar(self):
+        return {
+            'time': self.start,
+            'open': self.open,
+            'high': self.high,
+            'low': self.low,
+            'close': self.close,
+            'volume': self.volume,
+            'close_time': self.start + self.interval_ms - 1,
+        }
+
+    def _finish(self):
+        bar = self._bar()
+        self.count += 1
+        self.candles = 0
+        self.volume = 0.0
+        return bar
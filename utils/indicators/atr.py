@@ -0,0 +1,52 @@
+import math
+import numpy as np
+from utils.indicators.moving_average import EMA
+
+
+class ATR:
+    """
+Average true range with Wilder's smoothing.
+
+The true range of a candle is its high - low widened to the previous
+close when the candle gapped away from it (the first candle has no previous
+close and uses high - low). The first ATR is the mean of `period` true
+ranges, then each update is one O(1) smoothing step.
+
+    atr = ATR(period=14)
+    value = atr.update(high, low, close)
+    values = atr_batch(highs, lows, closes, period=14)
+"""
+    def __init__(self, period=14):
+        self.period = period
+        self.previous_close = math.nan
+        self.average = EMA(period, 1 / period)
+
+    def update(self, high, low, close):
+        previous_close = self.previous_close
+        self.previous_close = close
+        true_range = high - low
+        if previous_close == previous_close:
+            true_range = max(true_range, abs(high - previous_close), abs(low - previous_close))
+        return self.average.update(true_range)
+
+    def seed(self, highs, lows, closes):
+        """
+        Feed a batch of candles in one vectorized pass, leaving the same state as calling
+        update() for each of them. Returns the ATR after every candle.
+        """
+        highs = np.asarray(highs, dtype=np.float64)
+        lows = np.asarray(lows, dtype=np.float64)
+        closes = np.asarray(closes, dtype=np.float64)
+        if len(closes) == 0:
+            return np.array([])
+        previous_closes = np.concatenate(([self.previous_close], closes[:-1]))
+        # high - low alone after a candle with no close (the very first one), NaN when high or low is NaN, as update()
+        true_range = highs - lows
+        true_range = np.where(np.isnan(previous_closes), true_range,
+                              np.maximum(true_range, np.maximum(np.abs(highs - previous_closes), np.abs(lows - previous_closes))))
+        self.previous_close = float(closes[-1])
+        return self.average.seed(true_range)
+
+
+def atr_batch(highs, lows, closes, period=14):
+    return ATR(period).seed(highs, lows, closes)
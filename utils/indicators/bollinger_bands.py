@@ -1,46 +1,175 @@
 
+import math
 import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+from utils.indicators.ring_buffer import RingBuffer
+
+# relative std below which a window is treated as flat (std 0) by both update() and the batch version
+FLAT_STD_TOLERANCE = 1e-8
 
 class BollingerBands:
-    def __init__(self, window=30, num_of_std=2):
+    # once per window of updates the running mean/variance is recomputed from the
+    # window itself (O(window) every `window` ticks, so still O(1) amortized);
+    # float drift can't build up over weeks of ticks
+
+    def __init__(self, window=30, num_of_std=2, history=1000):
        self.window = window
        self.num_of_std = num_of_std
-       self.prices = np.array([])
-       self.upper_band = np.array([])
-       self.middle_band = np.array([])
-       self.lower_band = np.array([])
-       self.band_width = np.array([])
+       self.history = max(history, window)
+       self.prices = RingBuffer(self.history)
+       self.upper_band = RingBuffer(self.history)
+       self.middle_band = RingBuffer(self.history)
+       self.lower_band = RingBuffer(self.history)
+       self.band_width = RingBuffer(self.history)
+       # rolling window state (Welford), updated in O(1) per tick
+       self._window_prices = RingBuffer(window)
+       self._mean = 0.0
+       self._m2 = 0.0
+       self._updates_since_resync = 0
 
     def update(self, new_price):
-        # Append the new price
-        self.prices = np.append(self.prices, new_price)
+        new_price = float(new_price)
+        self.prices.append(new_price)
+        evicted = self._window_prices.append(new_price)
+
+        if evicted is None:
+            # still filling the window, plain Welford add
+            n = len(self._window_prices)
+            delta = new_price - self._mean
+            self._mean += delta / n
+            self._m2 += delta * (new_price - self._mean)
+            if n == self.window:
+                self._resync()
+        else:
+            # slide the window: swap the oldest price for the new one
+            old_mean = self._mean
+            self._mean = old_mean + (new_price - evicted) / self.window
+            self._m2 += (new_price - evicted) * (new_price - self._mean + evicted - old_mean)
+            self._updates_since_resync += 1
+            if self._updates_since_resync >= self.window:
+                self._resync()
 
         # Ensure we have enough price data to perform calculations
-        if len(self.prices) >= self.window:
-            # Calculate mean and standard deviation over the window
-            self.middle_band = np.append(self.middle_band, np.mean(self.prices[-self.window:]))
-            std_dev = np.std(self.prices[-self.window:])
+        if len(self._window_prices) >= self.window:
+            middle = self._mean
+            std_dev = math.sqrt(self._m2 / self.window) if self._m2 > 0 else 0.0
+            if std_dev <= abs(middle) * FLAT_STD_TOLERANCE:
+                # a (near) flat window is where cancellation error lives, rebuild the
+                # state from the window so it doesn't leak into later candles
+                self._resync()
+                middle = self._mean
+                std_dev = math.sqrt(self._m2 / self.window)
+                if std_dev <= abs(middle) * FLAT_STD_TOLERANCE:
+                    std_dev = 0.0
 
             # Calculate upper and lower bands
-            self.upper_band = np.append(self.upper_band, self.middle_band[-1] + (std_dev * self.num_of_std))
-            self.lower_band = np.append(self.lower_band, self.middle_band[-1] - (std_dev * self.num_of_std))
+            upper = middle + (std_dev * self.num_of_std)
+            lower = middle - (std_dev * self.num_of_std)
+            self.middle_band.append(middle)
+            self.upper_band.append(upper)
+            self.lower_band.append(lower)
 
             # Calculate band width
-            self.band_width = np.append(self.band_width, self.upper_band[-1] - self.lower_band[-1])
+            self.band_width.append(upper - lower)
 
             # Return the latest Bollinger Bands
-            return self.upper_band[-1], self.middle_band[-1], self.lower_band[-1]
+            return upper, middle, lower
         else:
             return None, None, None
 
+    def seed(self, prices):
+        """
+        Feed a batch of prices in one vectorized pass, leaving the same state as calling
+        update() for each of them. Returns (upper, middle, lower) arrays aligned with
+        `prices`, NaN where update() would have returned None.
+        """
+        prices = np.asarray(prices, dtype=np.float64)
+        count = len(prices)
+        if count == 0:
+            return np.array([]), np.array([]), np.array([])
+        # bands only depend on the last `window` prices, so the current window is enough history
+        combined = np.concatenate([self._window_prices.view(), prices])
+        upper, middle, lower, band_width = (values[-count:] for values in bollinger_bands_batch(combined, self.window, self.num_of_std))
+        valid = ~np.isnan(middle)
+
+        self.prices.extend(prices)
+        self._window_prices.clear()
+        self._window_prices.extend(combined[-self.window:])
+        self.upper_band.extend(upper[valid])
+        self.middle_band.extend(middle[valid])
+        self.lower_band.extend(lower[valid])
+        self.band_width.extend(band_width[valid])
+        self._resync()
+        return upper, middle, lower
+
+    def _resync(self):
+        window = self._window_prices.view()
+        self._mean = float(window.mean())
+        self._m2 = float(((window - self._mean) ** 2).sum())
+        self._updates_since_resync = 0
+
     def calculate_bandwidth_roc(self, rolling_window=5, period=2):
         if len(self.band_width) >= rolling_window + period - 1:
-            # Calculate the rolling average of bandwidths
-            rolling_avg_bandwidths = np.convolve(self.band_width, np.ones(rolling_window) / rolling_window, mode='valid')
+            # only the tail that feeds the newest and the `period`-back rolling average is needed
+            recent = self.band_width.last(rolling_window + period - 1).tolist()
+            newest_avg = sum(recent[-rolling_window:]) / rolling_window
+            period_back_avg = sum(recent[:rolling_window]) / rolling_window
 
+            # flat prices give a zero bandwidth, there is no meaningful ROC then
+            if period_back_avg == 0:
+                return None
             # Calculate ROC using the specified period
-            roc = (rolling_avg_bandwidths[-1] - rolling_avg_bandwidths[-period]) / rolling_avg_bandwidths[-period]
+            roc = (newest_avg - period_back_avg) / period_back_avg
             return roc
         else:
             return None
 
+
+# rows per chunk in the batch std so the (rows, window) temporary stays small
+_BATCH_CHUNK = 1 << 16
+
+def bollinger_bands_batch(prices, window=30, num_of_std=2):
+    """
+    Vectorized BollingerBands over a whole price series.
+    Returns (upper, middle, lower, band_width) arrays aligned with `prices`,
+    NaN until the first full window, matching what update() returns per tick.
+    """
+    prices = np.asarray(prices, dtype=np.float64)
+    n = len(prices)
+    upper, middle, lower, band_width = (np.full(n, np.nan) for _ in range(4))
+    if n < window:
+        return upper, middle, lower, band_width
+
+    windows = sliding_window_view(prices, window)
+    mean = windows.mean(axis=1)
+    std = np.empty_like(mean)
+    for start in range(0, len(windows), _BATCH_CHUNK):
+        chunk = windows[start:start + _BATCH_CHUNK]
+        std[start:start + _BATCH_CHUNK] = np.sqrt(((chunk - mean[start:start + _BATCH_CHUNK, None]) ** 2).mean(axis=1))
+    std[std <= np.abs(mean) * FLAT_STD_TOLERANCE] = 0.0
+
+    middle[window - 1:] = mean
+    upper[window - 1:] = mean + std * num_of_std
+    lower[window - 1:] = mean - std * num_of_std
+    band_width[window - 1:] = upper[window - 1:] - lower[window - 1:]
+    return upper, middle, lower, band_width
+
+def bandwidth_roc_batch(band_width, rolling_window=5, period=2):
+    # vectorized calculate_bandwidth_roc, NaN wherever the streaming version returns None
+    band_width = np.asarray(band_width, dtype=np.float64)
+    roc = np.full(len(band_width), np.nan)
+    valid = np.flatnonzero(~np.isnan(band_width))
+    if len(valid) == 0:
+        return roc
+    first = valid[0]
+    bw = band_width[first:]
+    if len(bw) < rolling_window + period - 1:
+        return roc
+
+    rolling_avg = sliding_window_view(bw, rolling_window).sum(axis=1) / rolling_window
+    newest = rolling_avg[period - 1:]
+    period_back = rolling_avg[:len(rolling_avg) - period + 1]
+    with np.errstate(divide='ignore', invalid='ignore'):
+        values = np.where(period_back != 0, (newest - period_back) / period_back, np.nan)
+    roc[first + rolling_window + period - 2:] = values
+    return roc
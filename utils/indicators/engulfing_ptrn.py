@@ -1,3 +1,5 @@
+from utils.indicators.patterns import match_last
+
 
 class EngulfingPatternDetector:
     """
@@ -7,7 +9,7 @@ Instantiate the class by creating an instance of EngulfingPatternDetector:
     detector = EngulfingPatternDetector(dataframe)
 
 Args:
-    dataframe (pandas.DataFrame): A DataFrame containing candlestick data with columns 'Open' and 'Close'.
+    dataframe (pandas.DataFrame): A DataFrame (or the bot's KlineWindow) containing candlestick data with columns 'open', 'high', 'low' and 'close'.
 
 The class provides methods to check for the presence of bullish and bearish engulfing patterns in the last two candles of the DataFrame.
 
@@ -20,36 +22,13 @@ To check for a bearish engulfing pattern:
 The methods return a boolean value indicating whether the respective engulfing pattern is present (True) or not (False).
 
 Note: The DataFrame must contain at least two rows of data for the engulfing pattern detection to work.
+To scan a whole history, or other patterns, use utils.indicators.patterns.
 """
     def __init__(self, dataframe):
         self.dataframe = dataframe
 
     def is_bullish_engulfing(self):
-        if len(self.dataframe) < 2:
-            return False
-
-        # Access the last two candles
-        last_candle = self.dataframe.iloc[-1]
-        prev_candle = self.dataframe.iloc[-2]
-
-        # Bullish Engulfing Criteria
-        is_bearish_prev_candle = prev_candle['Close'] < prev_candle['Open']
-        is_bullish_last_candle = last_candle['Close'] > last_candle['Open']
-        engulfing_condition = last_candle['Open'] < prev_candle['Close'] and last_candle['Close'] > prev_candle['Open']
-
-        return is_bearish_prev_candle and is_bullish_last_candle and engulfing_condition
+        return match_last(self.dataframe, 'bullish_engulfing')
 
     def is_bearish_engulfing(self):
-        if len(self.dataframe) < 2:
-            return False
-
-        # Access the last two candles
-        last_candle = self.dataframe.iloc[-1]
-        prev_candle = self.dataframe.iloc[-2]
-
-        # Bearish Engulfing Criteria
-        is_bullish_prev_candle = prev_candle['Close'] > prev_candle['Open']
-        is_bearish_last_candle = last_candle['Close'] < last_candle['Open']
-        engulfing_condition = last_candle['Open'] > prev_candle['Close'] and last_candle['Close'] < prev_candle['Open']
-
-        return is_bullish_prev_candle and is_bearish_last_candle and engulfing_condition
+        return match_last(self.dataframe, 'bearish_engulfing')
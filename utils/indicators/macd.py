@@ -0,0 +1,40 @@
+import numpy as np
+from utils.indicators.moving_average import EMA
+
+
+class MACD:
+    """
+Moving average convergence/divergence: the fast EMA minus the slow EMA of
+the price, a signal line that is an EMA of that difference, and the
+histogram between the two. Three O(1) EMA steps per update; the line is NaN
+until the slow EMA is ready and the signal `signal_period` values later.
+
+    macd = MACD(fast=12, slow=26, signal=9)
+    line, signal, histogram = macd.update(price)
+    line, signal, histogram = macd_batch(prices)
+"""
+    def __init__(self, fast=12, slow=26, signal=9):
+        if fast >= slow:
+            raise ValueError("the fast period must be shorter than the slow one")
+        self.fast = EMA(fast)
+        self.slow = EMA(slow)
+        self.signal = EMA(signal)
+
+    def update(self, price):
+        line = self.fast.update(price) - self.slow.update(price)
+        signal = self.signal.update(line)
+        return line, signal, line - signal
+
+    def seed(self, prices):
+        """
+        Feed a batch of prices in one vectorized pass, leaving the same state as calling
+        update() for each of them. Returns (line, signal, histogram) arrays.
+        """
+        prices = np.asarray(prices, dtype=np.float64)
+        line = self.fast.seed(prices) - self.slow.seed(prices)
+        signal = self.signal.seed(line)
+        return line, signal, line - signal
+
+
+def macd_batch(prices, fast=12, slow=26, signal=9):
+    return MACD(fast, slow, signal).seed(prices)
@@ -0,0 +1,182 @@
+import math
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+from utils.indicators.ring_buffer import RingBuffer
+
+# block length of linear_filter, each block is one small matrix product
+_FILTER_BLOCK = 64
+
+
+def linear_filter(values, decay, initial=0.0):
+    """
+    y[t] = decay * y[t - 1] + values[t] with y[-1] = initial, vectorized.
+
+    The series is cut into blocks: inside a block the recursion is a product with a
+    lower-triangular matrix of decay powers (only non-negative powers, so nothing
+    overflows), and the value carried from block to block is the same recursion on
+    the block ends with decay ** block, solved the same way.
+    """
+    values = np.asarray(values, dtype=np.float64)
+    n = len(values)
+    if n == 0:
+        return np.array([])
+    block = min(n, _FILTER_BLOCK)
+    lags = np.subtract.outer(np.arange(block), np.arange(block))
+    weights = np.where(lags >= 0, decay ** np.maximum(lags, 0), 0.0)
+    carry = decay ** np.arange(1, block + 1)
+    if n <= block:
+        return weights @ values + carry * initial
+
+    blocks = np.zeros(-(-n // block) * block)
+    blocks[:n] = values
+    partial = blocks.reshape(-1, block) @ weights.T
+    ends = linear_filter(partial[:, -1], decay ** block, initial)
+    previous = np.concatenate(([initial], ends[:-1]))
+    return (partial + previous[:, None] * carry).ravel()[:n]
+
+
+class SMA:
+    """
+Simple moving average over the last `period` values.
+
+A running sum is kept next to the window (recomputed from it every
+`resync_every` updates so float drift can't build up); NaN until the
+window has filled. NaN inputs are skipped, so an SMA can sit behind an
+indicator that is still warming up.
+
+    sma = SMA(period=20)
+    value = sma.update(price)
+    values = sma_batch(prices, period=20)
+"""
+    resync_every = 4096
+
+    def __init__(self, period):
+        self.period = period
+        self.window = RingBuffer(period)
+        self.value = math.nan
+        self._sum = 0.0
+        self._updates_since_resync = 0
+
+    def update(self, value):
+        if value != value:
+            return self.value
+        evicted = self.window.append(value)
+        self._sum += value
+        if evicted is not None:
+            self._sum -= evicted
+            self._updates_since_resync += 1
+            if self._updates_since_resync >= self.resync_every:
+                self._resync()
+        if len(self.window) == self.period:
+            self.value = self._sum / self.period
+        return self.value
+
+    def seed(self, values):
+        """
+        Feed a batch of values in one vectorized pass, leaving the same state as calling
+        update() for each of them. Returns the value after every input.
+        """
+        values = np.asarray(values, dtype=np.float64)
+        valid = ~np.isnan(values)
+        if not valid.all():
+            return _skipping_nans(self.seed, self.value, values, valid)
+        out = np.full(len(values), self.value)
+        if len(values) == 0:
+            return out
+        held = len(self.window)
+        combined = np.concatenate([self.window.view(), values])
+        if len(combined) >= self.period:
+            sums = sliding_window_view(combined, self.period).sum(axis=1)
+            first = max(self.period - held - 1, 0)  # first input that completes a window
+            out[first:] = sums[-(len(values) - first):] / self.period
+            self.value = out[-1]
+        self.window.extend(values)
+        self._resync()
+        return out
+
+    def _resync(self):
+        self._sum = float(self.window.view().sum())
+        self._updates_since_resync = 0
+
+
+class EMA:
+    """
+Exponential moving average, y = y + alpha * (value - y).
+
+alpha defaults to 2 / (period + 1); Wilder's smoothing (RSI, ATR) is
+alpha = 1 / period. The first value is the simple mean of the first
+`period` inputs and every later one is the O(1) recursive step, NaN before
+that. NaN inputs are skipped, the value stays as it was, so an EMA can
+smooth another indicator's output (the MACD signal line).
+
+    ema = EMA(period=12)
+    value = ema.update(price)
+    values = ema_batch(prices, period=12)
+"""
+    def __init__(self, period, alpha=None):
+        self.period = period
+        self.alpha = 2 / (period + 1) if alpha is None else alpha
+        self.count = 0
+        self.value = math.nan
+        self._sum = 0.0
+
+    def update(self, value):
+        if value != value:
+            return self.value
+        if self.count < self.period:
+            self.count += 1
+            self._sum += value
+            if self.count == self.period:
+                self.value = self._sum / self.period
+            return self.value
+        self.value += self.alpha * (value - self.value)
+        return self.value
+
+    def seed(self, values):
+        """
+        Feed a batch of values in one vectorized pass, leaving the same state as calling
+        update() for each of them. Returns the value after every input.
+        """
+        values = np.asarray(values, dtype=np.float64)
+        valid = ~np.isnan(values)
+        if not valid.all():
+            return _skipping_nans(self.seed, self.value, values, valid)
+        out = np.full(len(values), self.value)
+        start = 0
+        if self.count < self.period:
+            head = values[start:start + self.period - self.count]
+            self.count += len(head)
+            self._sum += float(head.sum())
+            start += len(head)
+            if self.count < self.period:
+                return out
+            self.value = self._sum / self.period
+            out[start - 1] = self.value
+        tail = values[start:]
+        if len(tail):
+            out[start:] = linear_filter(self.alpha * tail, 1 - self.alpha, self.value)
+            self.value = float(out[-1])
+        return out
+
+
+def sma_batch(values, period):
+    # SMA.update over a whole series, NaN until the window has filled
+    return SMA(period).seed(values)
+
+
+def ema_batch(values, period, alpha=None):
+    # EMA.update over a whole series, NaN until `period` values have been seen
+    return EMA(period, alpha).seed(values)
+
+
+def wilder_batch(values, period):
+    return EMA(period, 1 / period).seed(values)
+
+
+def _skipping_nans(seed, value, values, valid):
+    # seed() over the valid values only, a NaN input repeats the value before it like update() does
+    computed = seed(values[valid])
+    last = np.cumsum(valid) - 1
+    if len(computed) == 0:
+        return np.full(len(values), value)
+    return np.where(last >= 0, computed[np.maximum(last, 0)], value)
@@ -0,0 +1,144 @@
+from collections import deque
+import numpy as np
+
+# name -> (function, number of candles it looks at)
+PATTERNS = {}
+
+DOJI_BODY = 0.1  # body at most this fraction of the candle's range
+HAMMER_SHADOW = 2.0  # lower shadow at least this many bodies long
+STAR_BODY = 0.3  # middle star body at most this fraction of the first candle's body
+
+
+def register_pattern(name, candles):
+    """
+    Register a candlestick pattern. The function gets one Candles per candle it looks at,
+    the latest first, and must only use operators (& | ~ < > abs, arithmetic) so the same
+    code runs on whole arrays in scan_patterns and on single floats in PatternScanner.
+    """
+    def decorator(fn):
+        PATTERNS[name] = (fn, candles)
+        return fn
+    return decorator
+
+
+class Candles:
+    """
+OHLC of one candle (floats) or of many (aligned arrays), with the derived
+values the patterns share computed once.
+"""
+    __slots__ = ('open', 'high', 'low', 'close', 'body', 'range', 'body_top', 'body_bottom',
+                 'upper_shadow', 'lower_shadow')
+
+    def __init__(self, open, high, low, close, maximum=max, minimum=min):
+        self.open = open
+        self.high = high
+        self.low = low
+        self.close = close
+        self.body = close - open
+        self.range = high - low
+        self.body_top = maximum(open, close)
+        self.body_bottom = minimum(open, close)
+        self.upper_shadow = high - self.body_top
+        self.lower_shadow = self.body_bottom - low
+
+    def shifted(self, back, length):
+        # the arrays `back` candles earlier, aligned with the last `length` candles
+        end = len(self.close) - back
+        shifted = Candles.__new__(Candles)
+        for name in Candles.__slots__:
+            setattr(shifted, name, getattr(self, name)[end - length:end])
+        return shifted
+
+
+@register_pattern('bullish_engulfing', 2)
+def bullish_engulfing(c, p):
+    # a bearish candle whose body is swallowed by the next, bullish, one
+    return (p.body < 0) & (c.body > 0) & (c.open < p.close) & (c.close > p.open)
+
+
+@register_pattern('bearish_engulfing', 2)
+def bearish_engulfing(c, p):
+    return (p.body > 0) & (c.body < 0) & (c.open > p.close) & (c.close < p.open)
+
+
+@register_pattern('doji', 1)
+def doji(c):
+    return (c.range > 0) & (abs(c.body) <= DOJI_BODY * c.range)
+
+
+@register_pattern('hammer', 1)
+def hammer(c):
+    # small body at the top of the range with a long lower shadow
+    return (c.range > 0) & (c.lower_shadow >= HAMMER_SHADOW * abs(c.body)) & (c.upper_shadow <= DOJI_BODY * c.range)
+
+
+@register_pattern('morning_star', 3)
+def morning_star(c, p, pp):
+    # long bearish candle, a small body below its close, then a bullish close past its midpoint
+    return ((pp.body < 0) & (abs(pp.body) >= 0.5 * pp.range)
+            & (abs(p.body) <= STAR_BODY * abs(pp.body)) & (p.body_top <= pp.close)
+            & (c.body > 0) & (c.close > (pp.open + pp.close) / 2))
+
+
+def scan_patterns(open_prices, high_prices, low_prices, close_prices, names=None):
+    """
+    Boolean mask per registered pattern (or just `names`) over whole OHLC arrays, mask[i] is
+    the pattern ending on candle i. The arrays are read and the shared values derived once for
+    every pattern. high/low may be None for body-only patterns such as engulfing.
+    """
+    close_prices = np.asarray(close_prices, dtype=np.float64)
+    open_prices = np.asarray(open_prices, dtype=np.float64)
+    high_prices = np.maximum(open_prices, close_prices) if high_prices is None else np.asarray(high_prices, dtype=np.float64)
+    low_prices = np.minimum(open_prices, close_prices) if low_prices is None else np.asarray(low_prices, dtype=np.float64)
+    candles = Candles(open_prices, high_prices, low_prices, close_prices, np.maximum, np.minimum)
+
+    n = len(close_prices)
+    masks = {}
+    with np.errstate(invalid='ignore'):
+        for name in names or PATTERNS:
+            fn, lookback = PATTERNS[name]
+            mask = np.zeros(n, dtype=bool)
+            length = n - lookback + 1
+            if length > 0:
+                mask[lookback - 1:] = fn(*(candles.shifted(back, length) for back in range(lookback)))
+            masks[name] = mask
+    return masks
+
+
+def match_last(price_data, name):
+    # does the pattern end on the last candle of price_data (KlineWindow, DataFrame or dict of arrays)
+    fn, lookback = PATTERNS[name]
+    if len(price_data['close']) < lookback:
+        return False
+    columns = [np.asarray(price_data[column])[-lookback:].tolist() for column in ('open', 'high', 'low', 'close')]
+    candles = [Candles(*values) for values in zip(*columns)]
+    return bool(fn(*reversed(candles)))
+
+
+class PatternScanner:
+    """
+Incremental pattern detection for live candles.
+
+Keeps the last few candles (as many as the longest registered pattern needs)
+and evaluates every pattern on plain floats when a candle is added, so each
+update costs the same however long the bot has been running.
+
+    scanner = PatternScanner(['bullish_engulfing', 'hammer'])
+    matched = scanner.update(open, high, low, close)   # {'bullish_engulfing': False, 'hammer': True}
+"""
+    def __init__(self, names=None):
+        self.names = list(names or PATTERNS)
+        self.patterns = [(name, *PATTERNS[name]) for name in self.names]
+        self.candles = deque(maxlen=max(lookback for _, _, lookback in self.patterns))
+
+    def update(self, open_price, high_price, low_price, close_price):
+        self.candles.appendleft(Candles(open_price, high_price, low_price, close_price))
+        history = len(self.candles)
+        return {name: history >= lookback and bool(fn(*[self.candles[i] for i in range(lookback)]))
+                for name, fn, lookback in self.patterns}
+
+    def replace_last(self, open_price, high_price, low_price, close_price):
+        # same candle updated again (an unclosed kline), re-evaluate without moving the history
+        if self.candles:
+            self.candles.popleft()
+        return self.update(open_price, high_price, low_price, close_price)
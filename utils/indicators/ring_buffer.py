@@ -0,0 +1,100 @@
+import numpy as np
+
+
+class RingBuffer:
+    """
+Fixed-capacity FIFO buffer backed by a single preallocated NumPy array.
+
+Every value is written twice (at `i` and `i + capacity`) so the most recent
+`len(buffer)` values are always one contiguous slice of the backing array.
+That keeps `append` O(1) with no allocation, and lets `view()`, slicing and
+negative indexing (`buffer[-1]`, `buffer[-5:]`) hand out zero-copy views.
+
+    buf = RingBuffer(capacity=100)
+    buf.append(1.5)
+    buf[-1]      # 1.5
+    buf.view()   # read-only ndarray of the current contents, oldest first
+"""
+    def __init__(self, capacity, dtype=np.float64):
+        if capacity < 1:
+            raise ValueError("capacity must be at least 1")
+        self.capacity = capacity
+        self._data = np.zeros(capacity * 2, dtype=dtype)
+        self._start = 0  # position of the oldest value
+        self._size = 0
+
+    def append(self, value):
+        # returns the value that was evicted, or None while the buffer is filling
+        cap = self.capacity
+        if self._size < cap:
+            end = self._start + self._size
+            self._data[end] = value
+            self._data[end + cap] = value
+            self._size += 1
+            return None
+        start = self._start
+        evicted = self._data[start].item()
+        self._data[start] = value
+        self._data[start + cap] = value
+        self._start = start + 1 if start + 1 < cap else 0
+        return evicted
+
+    def extend(self, values):
+        values = np.asarray(values, dtype=self._data.dtype)
+        if len(values) >= self.capacity:
+            # only the tail survives, lay it out from the start of the array
+            tail = values[-self.capacity:]
+            self._data[:self.capacity] = tail
+            self._data[self.capacity:] = tail
+            self._start = 0
+            self._size = self.capacity
+            return
+        for value in values:
+            self.append(value)
+
+    def clear(self):
+        self._start = 0
+        self._size = 0
+
+    def view(self):
+        out = self._data[self._start:self._start + self._size]
+        out.flags.writeable = False
+        return out
+
+    def last(self, n):
+        # view of the newest n values (fewer if the buffer holds less)
+        n = min(n, self._size)
+        end = self._start + self._size
+        out = self._data[end - n:end]
+        out.flags.writeable = False
+        return out
+
+    def is_full(self):
+        return self._size == self.capacity
+
+    def __len__(self):
+        return self._size
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return self.view()[index]
+        size = self._size
+        if index < 0:
+            index += size
+        if index < 0 or index >= size:
+            raise IndexError("RingBuffer index out of range")
+        return self._data[self._start + index].item()
+
+    def __array__(self, dtype=None, copy=None):
+        out = self.view()
+        if dtype is not None:
+            out = out.astype(dtype, copy=False)
+        if copy:
+            out = out.copy()
+        return out
+
+    def __iter__(self):
+        return iter(self.view())
+
+    def __repr__(self):
+        return f"RingBuffer(capacity={self.capacity}, values={self.view()!r})"
@@ -1,37 +1,67 @@
-
+import math
 import numpy as np
+from utils.indicators.moving_average import EMA
+from utils.indicators.ring_buffer import RingBuffer
+
+
+class WilderRSI:
+    """
+RSI with Wilder's smoothing, the standard definition.
 
-class RSI:
-    def __init__(self, period=13):
+The first average gain/loss is the simple mean of the first `period` price
+changes, after that each is updated recursively with alpha = 1 / period, so
+an update is O(1) with no window to keep. The first price only sets the
+reference for the next change (no made-up previous price) and the value is
+NaN until `period` changes have been seen. All gains reads 100, a flat
+market 50.
+
+    rsi = WilderRSI(period=14)
+    value = rsi.update(price)
+    values = wilder_rsi_batch(prices, period=14)
+"""
+    def __init__(self, period=14, history=1000):
         self.period = period
-        self.gains = np.array([])
-        self.losses = np.array([])
-        self.prices = np.array([])
-        self.values = np.array([])
-
-    def update(self, new_price, previous_price):
-        delta = new_price - previous_price
-        gain = max(delta, 0)
-        loss = abs(min(delta, 0))
-        
-        self.gains = np.append(self.gains, gain)
-        self.losses = np.append(self.losses, loss)
-        self.prices = np.append(self.prices, new_price)
-        
-        if len(self.gains) > self.period:
-            self.gains = self.gains[-self.period:]
-            self.losses = self.losses[-self.period:]
-        
-        avg_gain = np.mean(self.gains)
-        avg_loss = np.mean(self.losses)
-        
-        rs = avg_gain / avg_loss if avg_loss != 0 else 0
-        rsi = 100 - (100 / (1 + rs))
-        
-        self.values = np.append(self.values, rsi)
+        self.history = max(history, 2)
+        self.previous_price = math.nan
+        self.avg_gain = EMA(period, 1 / period)
+        self.avg_loss = EMA(period, 1 / period)
+        self.prices = RingBuffer(self.history)
+        self.values = RingBuffer(self.history)
 
+    def update(self, new_price):
+        delta = new_price - self.previous_price
+        self.previous_price = new_price
+        self.prices.append(new_price)
+        if delta != delta:
+            self.values.append(math.nan)
+            return math.nan
+        avg_gain = self.avg_gain.update(delta if delta > 0 else 0.0)
+        avg_loss = self.avg_loss.update(-delta if delta < 0 else 0.0)
+        if avg_loss != avg_loss:
+            rsi = math.nan
+        elif avg_loss == 0:
+            rsi = 100.0 if avg_gain > 0 else 50.0
+        else:
+            rsi = 100 - 100 / (1 + avg_gain / avg_loss)
+        self.values.append(rsi)
         return rsi
-    
+
+    def seed(self, prices):
+        """
+        Feed a batch of prices in one vectorized pass, leaving the same state as calling
+        update() for each of them. Returns the RSI value of every price.
+        """
+        prices = np.asarray(prices, dtype=np.float64)
+        if len(prices) == 0:
+            return np.array([])
+        deltas = np.diff(prices, prepend=self.previous_price)
+        # np.maximum keeps the NaN of a first price with nothing before it
+        values = _wilder_rsi(self.avg_gain.seed(np.maximum(deltas, 0.0)), self.avg_loss.seed(np.maximum(-deltas, 0.0)))
+        self.previous_price = float(prices[-1])
+        self.prices.extend(prices)
+        self.values.extend(values)
+        return values
+
     def check_divergence(self, price):
         if len(self.prices) < 2:
             return None
@@ -48,7 +78,18 @@ class RSI:
         else:
             return None
 
-# add logic to calculate divergence between the rsi and the price
+
+def wilder_rsi_batch(prices, period=14):
+    # WilderRSI.update over a whole series, NaN for the first `period` prices
+    return WilderRSI(period).seed(prices)
+
+
+def _wilder_rsi(avg_gain, avg_loss):
+    with np.errstate(divide='ignore', invalid='ignore'):
+        rsi = 100 - 100 / (1 + avg_gain / avg_loss)
+    flat = avg_loss == 0
+    rsi[flat] = np.where(avg_gain[flat] > 0, 100.0, 50.0)
+    return rsi
+
 # rsi crossover generate signals if the rsi crosses over the 30 or 70 line
 # rsi trend eg: if the rsi is consistently above 50 for a while that could mean bullish trend or vice versa
-# rsi smoothing, common smoothing teks include sma or exponential moving average    
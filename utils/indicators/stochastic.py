@@ -0,0 +1,73 @@
+import math
+import numpy as np
+from utils.indicators.moving_average import SMA
+from utils.indicators.ring_buffer import RingBuffer
+from utils.indicators.sup_res import SupportResistance, support_resistance_batch
+
+
+class Stochastic:
+    """
+Stochastic oscillator: %K is where the close sits between the lowest low
+and the highest high of the last `k_period` candles (0 at the low, 100 at
+the high, 50 when the range is flat), %D is the SMA of %K over `d_period`.
+
+The extremes come from SupportResistance's monotonic deques and %D from a
+running sum, so an update is O(1) amortized. %K is NaN until `k_period`
+candles have been seen, %D until `d_period` values of %K exist.
+
+    stochastic = Stochastic(k_period=14, d_period=3)
+    k, d = stochastic.update(high, low, close)
+    k, d = stochastic_batch(highs, lows, closes)
+"""
+    def __init__(self, k_period=14, d_period=3):
+        self.k_period = k_period
+        self.extremes = SupportResistance(k_period)
+        self.d = SMA(d_period)
+        # the last k_period highs/lows, only read by seed() to continue the window
+        self.highs = RingBuffer(k_period)
+        self.lows = RingBuffer(k_period)
+
+    def update(self, high, low, close):
+        self.highs.append(high)
+        self.lows.append(low)
+        lowest, highest = self.extremes.update(high, low)
+        if lowest != lowest:
+            k = math.nan
+        elif highest == lowest:
+            k = 50.0
+        else:
+            k = 100 * (close - lowest) / (highest - lowest)
+        return k, self.d.update(k)
+
+    def seed(self, highs, lows, closes):
+        """
+        Feed a batch of candles in one vectorized pass, leaving the same state as calling
+        update() for each of them. Returns (%K, %D) arrays.
+        """
+        highs = np.asarray(highs, dtype=np.float64)
+        lows = np.asarray(lows, dtype=np.float64)
+        closes = np.asarray(closes, dtype=np.float64)
+        count = len(closes)
+        if count == 0:
+            return np.array([]), np.array([])
+        # the ring buffers hold the candles still inside the window, enough history for the batch extremes
+        held = len(self.highs)
+        all_highs = np.concatenate([self.highs.view(), highs])
+        all_lows = np.concatenate([self.lows.view(), lows])
+        lowest, highest = (values[held:] for values in support_resistance_batch(all_highs, all_lows, self.k_period))
+        with np.errstate(divide='ignore', invalid='ignore'):
+            k = np.where(highest == lowest, 50.0, 100 * (closes - lowest) / (highest - lowest))
+        k[np.isnan(lowest)] = np.nan
+        d = self.d.seed(k)
+
+        # the deques only depend on the window, replay it into fresh ones
+        self.extremes = SupportResistance(self.k_period)
+        for high, low in zip(all_highs[-self.k_period:].tolist(), all_lows[-self.k_period:].tolist()):
+            self.extremes.update(high, low)
+        self.highs.extend(highs)
+        self.lows.extend(lows)
+        return k, d
+
+
+def stochastic_batch(highs, lows, closes, k_period=14, d_period=3):
+    return Stochastic(k_period, d_period).seed(highs, lows, closes)
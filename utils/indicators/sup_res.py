@@ -1,46 +1,86 @@
-import pandas as pd
+from collections import deque
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+
 class SupportResistance:
+    """
+Rolling support (lowest low) and resistance (highest high) over the last
+`window` candles.
+
+Highs and lows are kept in monotonic deques of (index, value): a new high
+pops every older high it beats, so the front of the deque is always the
+window's maximum and each value is pushed and popped at most once, amortized
+O(1) per update. Both levels are NaN until the window has filled, like a
+pandas rolling(window) would give.
+
+    sr = SupportResistance(window=14)
+    support, resistance = sr.update(high, low)
+"""
     def __init__(self, window=14):
         self.window = window
-        self.highs = []
-        self.lows = []
+        self.count = 0
+        self._highs = deque()  # (index, high), decreasing highs
+        self._lows = deque()  # (index, low), increasing lows
 
     def update(self, new_high, new_low):
-        self.highs.append(new_high)
-        self.lows.append(new_low)
-        
-        if len(self.highs) > self.window:
-            self.highs.pop(0)
-            self.lows.pop(0)
-        
-        recent_highs = pd.Series(self.highs)
-        recent_lows = pd.Series(self.lows)
-        
-        resistance = recent_highs.rolling(window=self.window).max().iloc[-1]
-        support = recent_lows.rolling(window=self.window).min().iloc[-1]
-        
-        return support, resistance
-
-
-
-
-
-
-# def find_support_resistance(prices, window=14):
-#     """
-#     Identify potential support and resistance levels by finding local minima and maxima.
-    
-#     :param prices: A pandas DataFrame with 'high' and 'low' price columns.
-#     :param window: The window size to identify local minima and maxima.
-#     :return: A DataFrame with potential support and resistance levels.
-#     """
-#     # Use shift to compare against future and past values within the window
-#     minima = prices['low'].rolling(window=window, center=True).apply(lambda x: np.nan if np.nanmin(x) != x[int(window/2)] else np.nanmin(x), raw=True)
-#     maxima = prices['high'].rolling(window=window, center=True).apply(lambda x: np.nan if np.nanmax(x) != x[int(window/2)] else np.nanmax(x), raw=True)
-    
-#     # Drop NaN values to clean up the DataFrame
-#     support = minima.dropna()
-#     resistance = maxima.dropna()
-    
-#     return pd.DataFrame({'support': support, 'resistance': resistance})
+        index = self.count
+        self.count += 1
+        highs, lows = self._highs, self._lows
+        while highs and highs[-1][1] <= new_high:
+            highs.pop()
+        highs.append((index, new_high))
+        while lows and lows[-1][1] >= new_low:
+            lows.pop()
+        lows.append((index, new_low))
+        # drop whatever slid out of the window
+        oldest = index - self.window
+        if highs[0][0] <= oldest:
+            highs.popleft()
+        if lows[0][0] <= oldest:
+            lows.popleft()
+
+        if self.count < self.window:
+            return np.nan, np.nan
+        return lows[0][1], highs[0][1]
+
+
+def support_resistance_batch(highs, lows, window=14):
+    """
+    Rolling support and resistance for a whole history at once, aligned with the input and
+    NaN for the first window - 1 candles. Same values as SupportResistance.update.
+    """
+    highs = np.asarray(highs, dtype=np.float64)
+    lows = np.asarray(lows, dtype=np.float64)
+    support = np.full(len(lows), np.nan)
+    resistance = np.full(len(highs), np.nan)
+    if len(highs) >= window:
+        support[window - 1:] = sliding_window_view(lows, window).min(axis=1)
+        resistance[window - 1:] = sliding_window_view(highs, window).max(axis=1)
+    return support, resistance
+
+
+def find_support_resistance(prices, window=14):
+    """
+    Identify potential support and resistance levels by finding local minima and maxima.
+
+    :param prices: A pandas DataFrame (or dict of arrays / KlineWindow) with 'high' and 'low' price columns.
+    :param window: The window size to identify local minima and maxima.
+    :return: A DataFrame with potential support and resistance levels.
+    """
+    import pandas as pd
+    highs = np.asarray(prices['high'], dtype=np.float64)
+    lows = np.asarray(prices['low'], dtype=np.float64)
+    index = prices.index if isinstance(prices, pd.DataFrame) else pd.RangeIndex(len(lows))
+    if len(lows) < window:
+        return pd.DataFrame({'support': pd.Series(dtype=float), 'resistance': pd.Series(dtype=float)})
+
+    # a candle is a level when it is the extreme of the window centred on it (pandas' rolling(center=True))
+    centre = window // 2
+    positions = np.arange(centre, len(lows) - window + 1 + centre)
+    minima = positions[lows[positions] == np.nanmin(sliding_window_view(lows, window), axis=1)]
+    maxima = positions[highs[positions] == np.nanmax(sliding_window_view(highs, window), axis=1)]
 
+    support = pd.Series(lows[minima], index=index[minima])
+    resistance = pd.Series(highs[maxima], index=index[maxima])
+    return pd.DataFrame({'support': support, 'resistance': resistance})
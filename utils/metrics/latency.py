@@ -0,0 +1,220 @@
+import json
+import logging
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# stages of the tick-to-order path, in the order Bot marks them
+STAGES = ('parse', 'indicators', 'persistence', 'exits', 'trigger', 'sizing', 'submission', 'total')
+
+# 8 sub-buckets per power of two (~12% resolution), durations past ~3 days land in the last bucket
+_SUB_BITS = 3
+_BUCKETS = 48 << _SUB_BITS
+
+
+def _bucket(ns):
+    if ns < (2 << _SUB_BITS):
+        return max(ns, 0)
+    shift = ns.bit_length() - _SUB_BITS - 1
+    return min((shift << _SUB_BITS) + (ns >> shift), _BUCKETS - 1)
+
+
+def _bucket_upper(index):
+    # largest ns that falls into `index`
+    if index < (2 << _SUB_BITS):
+        return index
+    shift = (index >> _SUB_BITS) - 1
+    mantissa = (index & ((1 << _SUB_BITS) - 1)) | (1 << _SUB_BITS)
+    return ((mantissa + 1) << shift) - 1
+
+
+_UPPER = np.array([_bucket_upper(i) for i in range(_BUCKETS)], dtype=np.int64)
+
+
+class LatencyHistogram:
+    """
+Fixed-size log-bucketed histogram of durations in nanoseconds.
+
+record() is an integer bucket lookup and a few additions, no allocation, so
+it can sit on the hot path. Percentiles are read from the buckets and are
+accurate to one bucket (~12%); max and mean are exact.
+"""
+    __slots__ = ('counts', 'count', 'total', 'max')
+
+    def __init__(self):
+        self.counts = [0] * _BUCKETS
+        self.count = 0
+        self.total = 0
+        self.max = 0
+
+    def record(self, ns):
+        self.counts[_bucket(ns)] += 1
+        self.count += 1
+        self.total += ns
+        if ns > self.max:
+            self.max = ns
+
+    def percentile(self, q):
+        if self.count == 0:
+            return None
+        cumulative = np.cumsum(self.counts)
+        index = int(np.searchsorted(cumulative, q / 100 * self.count))
+        return int(min(_UPPER[index], self.max))
+
+    def summary(self):
+        # microseconds, the unit the hot path is worth reading in
+        if self.count == 0:
+            return {'count': 0, 'p50_us': None, 'p99_us': None, 'max_us': None, 'mean_us': None}
+        return {
+            'count': self.count,
+            'p50_us': self.percentile(50) / 1000,
+            'p99_us': self.percentile(99) / 1000,
+            'max_us': self.max / 1000,
+            'mean_us': self.total / self.count / 1000,
+        }
+
+
+class StageTimer:
+    """
+Times one message through the stages of the hot path.
+
+mark(stage) records the time since the previous mark (or since the timer
+was created) under `stage`; done() records the whole message under 'total'.
+"""
+    __slots__ = ('histograms', 'start', 'last')
+
+    def __init__(self, histograms):
+        self.histograms = histograms
+        self.start = self.last = time.perf_counter_ns()
+
+    def mark(self, stage):
+        now = time.perf_counter_ns()
+        self._histogram(stage).record(now - self.last)
+        self.last = now
+
+    def done(self):
+        self._histogram('total').record(time.perf_counter_ns() - self.start)
+
+    def _histogram(self, stage):
+        histogram = self.histograms.get(stage)
+        if histogram is None:
+            histogram = self.histograms.setdefault(stage, LatencyHistogram())
+        return histogram
+
+
+class _NullTimer:
+    __slots__ = ()
+
+    def mark(self, stage):
+        pass
+
+    def done(self):
+        pass
+
+
+NULL_TIMER = _NullTimer()
+
+
+class LatencyRecorder:
+    """
+Per-symbol, per-stage latency histograms for the tick-to-order path.
+
+Each message gets a timer from timer(symbol); the bot marks the end of every
+stage on it. A disabled recorder hands out a shared no-op timer, so turning
+instrumentation off leaves an empty method call per stage.
+
+Results can be pulled with snapshot() / report(), logged periodically by
+start_dump(), or served as JSON by serve().
+
+    latency = LatencyRecorder()
+    bot = Bot('BTCUSDT', '15m', api_key, api_secret, latency=latency)
+    latency.serve(9102)        # curl localhost:9102/latency
+"""
+    def __init__(self, enabled=True):
+        self.enabled = enabled
+        self._histograms = {}  # symbol -> stage -> LatencyHistogram
+        self._lock = threading.Lock()
+        self._dump_thread = None
+        self._server = None
+
+    def timer(self, symbol):
+        if not self.enabled:
+            return NULL_TIMER
+        histograms = self._histograms.get(symbol)
+        if histograms is None:
+            with self._lock:
+                histograms = self._histograms.setdefault(symbol, {})
+        return StageTimer(histograms)
+
+    def snapshot(self):
+        with self._lock:
+            symbols = list(self._histograms.items())
+        snapshot = {}
+        for symbol, histograms in symbols:
+            histograms = dict(histograms)  # stages can be added while we read
+            snapshot[symbol] = {stage: histograms[stage].summary() for stage in _ordered(histograms)}
+        return snapshot
+
+    def report(self):
+        lines = [f"{'symbol':<12} {'stage':<12} {'count':>8} {'p50 us':>10} {'p99 us':>10} {'max us':>10}"]
+        for symbol, stages in sorted(self.snapshot().items()):
+            for stage, s in stages.items():
+                if s['count']:
+                    lines.append(f"{symbol:<12} {stage:<12} {s['count']:>8} {s['p50_us']:>10.1f} {s['p99_us']:>10.1f} {s['max_us']:>10.1f}")
+        return '\n'.join(lines)
+
+    def reset(self):
+        with self._lock:
+            self._histograms = {}
+
+    def start_dump(self, interval=60.0, reset=False):
+        # log the report every `interval` seconds from a daemon thread
+        def dump():
+            while True:
+                time.sleep(interval)
+                logger.info("Latency:\n%s", self.report())
+                if reset:
+                    self.reset()
+
+        if self._dump_thread is None:
+            self._dump_thread = threading.Thread(target=dump, name='latency-dump', daemon=True)
+            self._dump_thread.start()
+        return self._dump_thread
+
+    def serve(self, port=9102, host='127.0.0.1'):
+        # GET /latency returns snapshot() as JSON
+        recorder = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.rstrip('/') != '/latency':
+                    self.send_error(404)
+                    return
+                body = json.dumps(recorder.snapshot()).encode()
+                self.send_response(200)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                logger.debug(format, *args)
+
+        if self._server is None:
+            self._server = ThreadingHTTPServer((host, port), Handler)
+            threading.Thread(target=self._server.serve_forever, name='latency-server', daemon=True).start()
+        return self._server
+
+    def close(self):
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+
+def _ordered(histograms):
+    known = [stage for stage in STAGES if stage in histograms]
+    return known + sorted(stage for stage in histograms if stage not in STAGES)
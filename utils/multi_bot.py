@@ -0,0 +1,202 @@
+import asyncio
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from utils.bot import Bot
+from utils.data.store import PersistenceWriter
+from utils.safety.order_executor import OrderExecutor, binance_client, thread_safe
+
+logger = logging.getLogger(__name__)
+
+
+class MultiSymbolBot:
+    """
+Runs many symbols from one process on a single asyncio event loop.
+
+Every symbol keeps its own Bot (indicators, kline window, trigger stage and
+active order) but none of them opens a socket: all kline streams are read
+from combined (multiplexed) websocket connections and dispatched by symbol.
+All bots share one REST client (a copy of it per thread, see
+ThreadLocalClient), one PersistenceWriter and one OrderExecutor.
+
+Each symbol has its own queue and consumer task, and the Bot work runs on a
+shared, bounded thread pool; orders are only queued there and sent from the
+OrderExecutor's threads. A slow symbol only backs up its own queue; the
+others keep flowing. Updates of a still-open candle (the stream repeats it
+every couple of seconds, the Bot only acts on closed ones) are dropped
+before they are queued. Queues hold at most `queue_size` messages: once one
+is full, a message from the sockets pushes out the oldest one with a
+warning; messages from a `feed` wait for room instead, so a replay is slowed
+down to the bots rather than thinned out.
+
+    MultiSymbolBot(['BTCUSDT', 'ETHUSDT', ...], '15m', api_key, api_secret).start()
+
+With `bars` (a factory such as lambda: VolumeBars(50)) every symbol reads
+its trade stream instead and builds its own bars; `strategies` is a factory
+of the strategy list every symbol runs the same way. With a `feed` (see
+utils.data.feeds, e.g. a ReplayFeed with its ReplayExchange as `client`) the
+streams come from it instead of binance and start() returns once the feed
+has run out and every message was handled. A `risk` RiskEngine (see
+utils.safety.risk) sizes the orders of every symbol against the whole book.
+"""
+    # binance allows up to 1024 streams per combined connection, stay well below it
+    streams_per_socket = 200
+
+    def __init__(self, symbols, interval, api_key, api_secret, client=None, max_workers=8, writer=None, latency=None, order_executor=None,
+                 bars=None, snapshots=None, feed=None, kline_cache=None, strategies=None, risk=None, queue_size=1000):
+        self.symbols = [symbol.upper() for symbol in symbols]
+        self.interval = interval
+        self.api_key = api_key
+        self.api_secret = api_secret
+        # history is fetched and orders are sent from several threads, each gets its own copy of a binance client
+        self.client = thread_safe(client if client is not None else binance_client(api_key, api_secret))
+        # one background writer batches the history of every symbol
+        self.writer = writer if writer is not None else PersistenceWriter()
+        # one order executor sends the orders of every symbol
+        self.order_executor = order_executor if order_executor is not None else OrderExecutor(self.client, max_workers=max_workers)
+        self.latency = latency  # one LatencyRecorder keeps the stage timings of every symbol
+        self.bars = bars
+        self.snapshots = snapshots  # one SnapshotStore writes the warm-start state of every symbol
+        self.feed = feed
+        self.risk = risk  # one RiskEngine sizes the orders of every symbol against the whole book
+        self.bots = {symbol: Bot(symbol, interval, api_key, api_secret, client=self.client, writer=self.writer,
+                                 latency=latency, executor=self.order_executor, bars=bars() if bars is not None else None,
+                                 snapshots=snapshots, kline_cache=kline_cache,
+                                 strategies=strategies() if strategies is not None else None, risk=risk)
+                     for symbol in self.symbols}
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='symbol')
+        self.queue_size = queue_size
+        self.queues = {}
+        self._room = {}  # symbol -> semaphore a feed's thread takes per message, see _run_feed
+
+    def stream_names(self):
+        if self.bars is not None:
+            return [f"{symbol.lower()}@trade" for symbol in self.symbols]
+        return [f"{symbol.lower()}@kline_{self.interval}" for symbol in self.symbols]
+
+    def dispatch(self, msg):
+        # combined streams wrap every event as {'stream': ..., 'data': <kline event>}
+        data = msg.get('data', msg)
+        if data.get('e') == 'error':
+            logger.warning("Websocket error: %s", data.get('m'))
+            return
+        if _still_open(data):
+            return
+        queue = self.queues.get(data.get('s'))
+        if queue is None:
+            logger.debug("Message for unknown symbol: %s", data.get('s'))
+            return
+        if queue.full():
+            queue.get_nowait()
+            queue.task_done()
+            logger.warning("Queue of %s is full, dropped its oldest message", data.get('s'))
+        queue.put_nowait(data)
+
+    async def _symbol_worker(self, symbol, queue):
+        # messages of one symbol are handled strictly in order, one at a time
+        bot = self.bots[symbol]
+        loop = asyncio.get_running_loop()
+        while True:
+            msg = await queue.get()
+            handler = bot.handle_trade_message if msg.get('e') == 'trade' else bot.handle_socket_message
+            try:
+                await loop.run_in_executor(self.executor, handler, msg)
+            except Exception:
+                logger.exception("Error handling message for %s", symbol)
+            finally:
+                queue.task_done()
+                room = self._room.get(symbol)
+                if room is not None:
+                    room.release()
+
+    async def _read_stream(self, socket_manager, streams):
+        async with socket_manager.multiplex_socket(streams) as stream:
+            while True:
+                self.dispatch(await stream.recv())
+
+    async def _fetch_history(self):
+        loop = asyncio.get_running_loop()
+        results = await asyncio.gather(
+            *(loop.run_in_executor(self.executor, bot.fetch_historical_data) for bot in self.bots.values()),
+            return_exceptions=True)
+        for symbol, result in zip(self.bots, results):
+            if isinstance(result, Exception):
+                logger.error("Fetching historical data for %s failed: %s", symbol, result)
+
+    async def run(self):
+        await self._fetch_history()
+        if self.snapshots is not None:
+            self.snapshots.start(self.bots.values())
+        self.queues = {symbol: asyncio.Queue(self.queue_size) for symbol in self.symbols}
+        workers = [asyncio.create_task(self._symbol_worker(symbol, queue)) for symbol, queue in self.queues.items()]
+        try:
+            if self.feed is not None:
+                await self._run_feed(self.stream_names())
+            else:
+                await self._run_sockets(self.stream_names())
+        finally:
+            for task in workers:
+                task.cancel()
+            await asyncio.gather(*workers, return_exceptions=True)
+
+    async def _run_sockets(self, streams):
+        from binance import AsyncClient, BinanceSocketManager
+        # the async client is only used for the sockets, REST calls go through self.client
+        socket_client = AsyncClient(api_key=self.api_key, api_secret=self.api_secret, tld='us')
+        socket_manager = BinanceSocketManager(socket_client)
+        readers = [asyncio.create_task(self._read_stream(socket_manager, streams[i:i + self.streams_per_socket]))
+                   for i in range(0, len(streams), self.streams_per_socket)]
+        logger.info("Streaming %d symbols over %d connection(s)", len(streams), len(readers))
+        try:
+            await asyncio.gather(*readers)
+        finally:
+            for task in readers:
+                task.cancel()
+            await asyncio.gather(*readers, return_exceptions=True)
+            await socket_client.close_connection()
+
+    async def _run_feed(self, streams):
+        # the feed calls back on its own thread, messages are handed over to the loop; the thread
+        # waits while a symbol has queue_size messages queued or being handled, so its queue never overflows
+        loop = asyncio.get_running_loop()
+        self._room = {symbol: threading.Semaphore(self.queue_size) for symbol in self.queues}
+
+        def hand_over(msg):
+            data = msg.get('data', msg)
+            if _still_open(data):
+                return
+            room = self._room.get(data.get('s'))
+            if room is not None:
+                room.acquire()
+            loop.call_soon_threadsafe(self.dispatch, msg)
+        self.feed.subscribe(streams, hand_over)
+        logger.info("Streaming %d symbols from %s", len(streams), type(self.feed).__name__)
+        try:
+            await loop.run_in_executor(None, self.feed.run)
+            await asyncio.gather(*(queue.join() for queue in self.queues.values()))
+        finally:
+            self.feed.stop()
+            # a feed still waiting for room goes on and sees it was stopped
+            for room in self._room.values():
+                room.release(self.queue_size)
+
+    def start(self):
+        try:
+            asyncio.run(self.run())
+        except KeyboardInterrupt:
+            pass
+        finally:
+            self.executor.shutdown(wait=True)
+            if self.snapshots is not None:
+                self.snapshots.close()
+            self.close()
+
+    def close(self):
+        # the order executor first, the orders it still sends are handed to the writer
+        self.order_executor.close()
+        self.writer.close()
+
+
+def _still_open(data):
+    # a kline update of a candle that hasn't closed yet
+    return 'k' in data and not data['k']['x']
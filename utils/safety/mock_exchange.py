@@ -0,0 +1,225 @@
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qsl, urlsplit
+from utils.data.fake_client import FakeClient
+from utils.metrics.latency import LatencyHistogram
+
+
+class MockExchange:
+    """
+Local HTTP server that answers the part of binance's REST API the bot trades
+through: ping, time, order/test, and placing and querying orders.
+
+Orders are kept by newClientOrderId and a repeated id is rejected like binance
+does (-2010 Duplicate order sent), so retries can be checked for idempotency.
+fail_next() makes the next order requests fail, optionally after the order
+was already accepted (a lost response), and `latency` delays every answer.
+Responses are HTTP/1.1 keep-alive; `connections` counts the TCP connections
+opened, to check that clients reuse them.
+
+    with MockExchange(latency=0.02) as exchange:
+        client = exchange.client()          # a binance Client pointed at the server
+        executor = OrderExecutor(client, method='create_order')
+"""
+    def __init__(self, host='127.0.0.1', port=0, latency=0.0):
+        self.latency = latency
+        self.orders = {}  # newClientOrderId -> order
+        self.requests = []  # (method, path, params)
+        self.connections = 0
+        self._failures = []
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer((host, port), _handler(self))
+        self._server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self._server.server_address[:2]
+        return f'http://{host}:{port}'
+
+    def client(self, api_key='mock', api_secret='mock'):
+        from binance.client import Client
+        client = Client(api_key, api_secret, ping=False)
+        client.API_URL = self.url + '/api'
+        return client
+
+    def fail_next(self, count=1, status=503, code=-1007, msg='Timeout waiting for response from backend server.',
+                  after_processing=False):
+        # after_processing: the order is accepted, then the error is returned anyway
+        with self._lock:
+            self._failures += [(status, code, msg, after_processing)] * count
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._server.serve_forever, name='mock-exchange', daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self):
+        if self._thread is not None:
+            self._server.shutdown()
+            self._thread.join()
+            self._thread = None
+        self._server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def handle(self, method, path, params):
+        # -> (status, body)
+        if self.latency:
+            time.sleep(self.latency)
+        with self._lock:
+            self.requests.append((method, path, params))
+            failure = self._failures.pop(0) if self._failures and path.startswith('/api/v3/order') and method == 'POST' else None
+            if failure is not None and not failure[3]:
+                return failure[0], {'code': failure[1], 'msg': failure[2]}
+            status, body = self._route(method, path, params)
+        if failure is not None:
+            return failure[0], {'code': failure[1], 'msg': failure[2]}
+        return status, body
+
+    def _route(self, method, path, params):
+        if path == '/api/v3/ping':
+            return 200, {}
+        if path == '/api/v3/time':
+            return 200, {'serverTime': int(time.time() * 1000)}
+        if path == '/api/v3/order/test' and method == 'POST':
+            return 200, {}
+        if path == '/api/v3/order' and method == 'POST':
+            order_id = params.get('newClientOrderId')
+            if order_id in self.orders:
+                return 400, {'code': -2010, 'msg': 'Duplicate order sent.'}
+            order = {
+                'symbol': params.get('symbol'),
+                'orderId': len(self.orders) + 1,
+                'clientOrderId': order_id,
+                'transactTime': int(time.time() * 1000),
+                'origQty': params.get('quantity'),
+                'executedQty': params.get('quantity'),
+                'status': 'FILLED',
+                'type': params.get('type'),
+                'side': params.get('side'),
+            }
+            self.orders[order_id] = order
+            return 200, order
+        if path == '/api/v3/order' and method == 'GET':
+            order = self.orders.get(params.get('origClientOrderId'))
+            if order is None:
+                return 400, {'code': -2013, 'msg': 'Order does not exist.'}
+            return 200, order
+        return 404, {'code': -1, 'msg': f'Unknown endpoint {method} {path}'}
+
+
+class ReplayExchange(FakeClient):
+    """
+The exchange side of a ReplayFeed, in process: serves the feed's klines over
+REST up to the replay clock and fills market orders at once at the symbol's
+last replayed price. Every order's tick-to-order latency, from the feed
+handing over the symbol's last message to the order arriving here, goes into
+`latency`. A repeated newClientOrderId gets the first fill back.
+
+    feed = ReplayFeed(speed=None, start=start)
+    exchange = ReplayExchange(feed)
+    bot = Bot('BTCUSDT', '15m', None, None, client=exchange, feed=feed,
+              executor=OrderExecutor(exchange, method='create_order'))
+    bot.start()   # returns when the replay is over
+"""
+    def __init__(self, feed):
+        super().__init__()
+        self.feed = feed
+        self.klines = feed.klines  # the same candles the feed streams
+        self.fills = {}  # newClientOrderId -> order
+        self.latency = LatencyHistogram()
+        self._lock = threading.Lock()
+
+    def now(self):
+        return self.feed.now()
+
+    def create_order(self, **params):
+        received = time.perf_counter_ns()
+        symbol = params['symbol']
+        with self._lock:
+            order = self.fills.get(params['newClientOrderId'])
+            if order is not None:
+                return order
+            self._record(symbol, received)
+            price = self.feed.prices[symbol]
+            quantity = float(params['quantity'])
+            order = {
+                'symbol': symbol,
+                'orderId': len(self.fills) + 1,
+                'clientOrderId': params['newClientOrderId'],
+                'transactTime': self.feed.now(),
+                'origQty': repr(quantity),
+                'executedQty': repr(quantity),
+                'cummulativeQuoteQty': repr(price * quantity),
+                'status': 'FILLED',
+                'type': params.get('type'),
+                'side': params.get('side'),
+                'fills': [{'price': repr(price), 'qty': repr(quantity), 'commission': '0', 'commissionAsset': 'USDT'}],
+            }
+            self.fills[order['clientOrderId']] = order
+            return order
+
+    def create_test_order(self, **params):
+        received = time.perf_counter_ns()
+        with self._lock:
+            self._record(params['symbol'], received)
+            self.orders.append(params)
+        return {}
+
+    def get_order(self, symbol, origClientOrderId, **params):
+        order = self.fills.get(origClientOrderId)
+        if order is None:
+            raise KeyError(f"Order {origClientOrderId} does not exist")
+        return order
+
+    def _record(self, symbol, received):
+        sent = self.feed.sent_at.get(symbol)
+        if sent is not None:
+            self.latency.record(received - sent)
+
+
+def _handler(exchange):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'  # keep-alive
+        disable_nagle_algorithm = True  # headers and body go out as separate writes
+
+        def setup(self):
+            super().setup()
+            with exchange._lock:
+                exchange.connections += 1
+
+        def do_GET(self):
+            self._answer('GET')
+
+        def do_POST(self):
+            self._answer('POST')
+
+        def do_DELETE(self):
+            self._answer('DELETE')
+
+        def _answer(self, method):
+            url = urlsplit(self.path)
+            params = dict(parse_qsl(url.query))
+            length = int(self.headers.get('Content-Length') or 0)
+            if length:
+                params.update(parse_qsl(self.rfile.read(length).decode()))
+            status, body = exchange.handle(method, url.path, params)
+            data = json.dumps(body).encode()
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def log_message(self, format, *args):
+            pass
+
+    return Handler
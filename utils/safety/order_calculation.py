@@ -1,20 +1,17 @@
-from binance.client import Client
-from dotenv import load_dotenv
-import os
-import pandas as pd
+import math
 import time
 import uuid
 import logging
+from utils.safety.order_executor import OrderExecutor, OrderQueueFull
+from utils.safety.position_book import PositionBook
 
 
-logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
-# Load environment variables
-load_dotenv()
-api_key = os.getenv ('BINANCE_API_KEY')
-api_secret = os.getenv ('BINANCE_API_SECRET')
 
-client = Client(api_key, api_secret, tld='us')
+# binance's Client.SIDE_BUY, SIDE_SELL and ORDER_TYPE_MARKET, without importing binance for three strings
+SIDE_BUY = 'BUY'
+SIDE_SELL = 'SELL'
+ORDER_TYPE_MARKET = 'MARKET'
 
 class TradeConfig:
     def __init__(self, rsi_oversold=25, rsi_overbought=75, max_risk_per_trade=0.02, total_capital=1000):
@@ -24,14 +21,46 @@ class TradeConfig:
         self.total_capital = total_capital
 
 class OrderCalculator:
-    def __init__(self, initial_usdt_balance, risk_per_trade=0.01):
+    def __init__(self, initial_usdt_balance, risk_per_trade=0.01, client=None, stop_loss_percentage=0.02, writer=None, executor=None,
+                 max_positions_per_symbol=1, risk=None):
         self.usdt_balance = initial_usdt_balance # needs to get the actual usdt balance from the account since the algo will only use usdt to place orders
         self.risk_per_trade = risk_per_trade
-        self.active_orders = {}
+        self.stop_loss_percentage = stop_loss_percentage
+        # every open order, by symbol, with its stop loss / take profit indexed for manage_orders
+        self.positions = PositionBook()
+        self.active_orders = self.positions.orders
+        self.max_positions_per_symbol = max_positions_per_symbol
+        # any object with binance's create_test_order signature, e.g. the backtester's PaperClient
+        self.client = client
+        # PersistenceWriter that records sold orders, None keeps no history (e.g. backtests)
+        self.writer = writer
+        # orders go through the executor, the default one sends on the calling thread
+        self.executor = executor if executor is not None else OrderExecutor(client, max_workers=0)
+        # a RiskEngine sizes orders against every symbol's book instead of this balance alone
+        self.risk = risk
+        if risk is not None:
+            risk.track(self.positions)
+
+    @property
+    def active_order(self):
+        # the most recent open order, None when nothing is open
+        orders = list(self.active_orders.values())
+        return orders[-1] if orders else None
+
+    def can_open(self, symbol):
+        return self.positions.count(symbol) < self.max_positions_per_symbol
+
     # Calculate the size of the order to place for added safety
-    def calculate_order_size(self, entry_price, middle_band):
-        stop_loss_percentage = 0.02
-        stop_loss = entry_price * (1 - stop_loss_percentage)
+    def calculate_order_size(self, entry_price, middle_band, symbol=None):
+        if self.risk is not None and symbol is not None:
+            # the room stays reserved until buy_order() has the order in the book
+            quantities, stops = self.risk.size([symbol], [entry_price], reserve=True)
+            # rounded down, rounding up could take the order past the engine's limits
+            quantity = math.floor(float(quantities[0]) * 100) / 100
+            self.risk.release(symbol, float(quantities[0]) - quantity, entry_price, float(stops[0]))
+            return quantity, float(stops[0]), middle_band * 0.999
+
+        stop_loss = entry_price * (1 - self.stop_loss_percentage)
         take_profit = middle_band * 0.999  # Adjust the multiplier as needed
 
         risk_per_trade_amt = self.usdt_balance * self.risk_per_trade
@@ -44,75 +73,125 @@ class OrderCalculator:
         return rounded_shares, stop_loss, take_profit
     
     def buy_order(self, symbol, quantity, entry_price, take_profit, stop_loss):
+        # Generate a unique order ID, it is also what makes retries of this order idempotent
+        order_id = f"{int(time.time() * 1000)}_{symbol}_{uuid.uuid4().hex}"
+        # the order counts as open (PENDING) from here on, so can_open() sees it while it is in flight
+        order = {
+            'order_id': order_id,
+            'timestamp': int(time.time() * 1000),
+            'symbol': symbol,
+            'type': 'buy',
+            'entry_price': entry_price,
+            'take_profit': take_profit,
+            'stop_loss': stop_loss,
+            'quantity': quantity,
+            'status': 'PENDING'
+        }
+        self.positions.add(order)
+        if self.risk is not None:
+            self.risk.release(symbol, quantity, entry_price, stop_loss)
+        return order_id if self._submit_buy(order) else None
+
+    def _submit_buy(self, order):
+        symbol, order_id = order['symbol'], order['order_id']
         try:
-            # Generate a unique order ID
-            order_id = f"{int(time.time() * 1000)}_{symbol}_{uuid.uuid4().hex}"
-            order = client.create_test_order(
-                symbol=symbol,
-                side=Client.SIDE_BUY,
-                type=Client.ORDER_TYPE_MARKET,
-                quantity=quantity,
-                newClientOrderId=order_id
-            )
-            if order:
-                # Store the order details in the active_order dictionary
-                self.active_order = {
-                    'order_id': order_id,
-                    'timestamp': int(time.time() * 1000),
-                    'symbol': symbol,
-                    'type': 'buy',
-                    'entry_price': entry_price,
-                    'take_profit': take_profit,
-                    'stop_loss': stop_loss,
-                    'quantity': quantity,
-                    'status': 'NEW'
-                }
-                logger.info(f'Buy order placed: {self.active_order}')
-            return order_id # maybe update to return the dict instead of the order_id 
-        except Exception as e:
-            logger.error(f"Error placing buy order: {str(e)}")
-            return None
-
-    def sell_order(self, current_price):
-        try:
-            order = self.active_order
-            sell_order = client.create_test_order(
-                symbol=order['symbol'],
-                side=Client.SIDE_SELL,
-                type=Client.ORDER_TYPE_MARKET,
-                quantity=order['quantity'],
-                newClientOrderId=f"{order['order_id']}_SELL"
-            )
-            if sell_order:
-                # Update the status and timestamp of the sold order
-                order['status'] = 'SOLD'
-                order['sell_timestamp'] = int(time.time() * 1000)
-                order['sell_price'] = current_price
-                # Calculate the profit or loss
-                profit_loss = (current_price - order['entry_price']) * order['quantity']
-                order['profit_loss'] = profit_loss
-                # Label the order as 'GAIN' or 'LOSS'
-                if profit_loss > 0:
-                    order['outcome'] = 'GAIN'
-                else:
-                    order['outcome'] = 'LOSS'
-                logger.info(f'Sell order placed: {order}')    
-                # Convert the order dictionary to a DataFrame
-                order_df = pd.DataFrame([order])
-                # Write the DataFrame to a CSV file
-                order_df.to_csv('order_history.csv', mode='a', header=not os.path.exists('order_history.csv'), index=False)
-                # Reset the active_order to None
-                self.active_order = None
-        except Exception as e:
-            logger.error(f"Error executing sell order: {str(e)}")
-    # compares the tp/sl to the current price and sells the order if the price is reached
-    def manage_orders(self, current_price):
-        if self.active_order:
+            self.executor.submit({
+                'symbol': symbol,
+                'side': SIDE_BUY,
+                'type': ORDER_TYPE_MARKET,
+                'quantity': order['quantity'],
+                'newClientOrderId': order_id
+            }, callback=lambda future: self._buy_done(order, future))
+            return True
+        except OrderQueueFull as e:
+            logger.error("Error placing buy order: %s", e)
+            self.positions.remove(order_id)
+            return False
+
+    def _buy_done(self, order, future):
+        # runs on the executor thread once the exchange answered
+        error = future.exception()
+        if error is not None or future.result() is None:
+            logger.error("Error placing buy order: %s", error)
+            self.positions.remove(order['order_id'])
+            return
+        order['timestamp'] = int(time.time() * 1000)
+        order['status'] = 'NEW'
+        self.positions.arm(order)
+        logger.info('Buy order placed: %s', order)
+
+    def sell_order(self, current_price, order=None):
+        if order is None:
             order = self.active_order
-            if order['status'] == 'NEW':
-                if current_price <= order['stop_loss']:
-                    logger.info(f"Stop loss triggered for order {order['order_id']}")
-                    self.sell_order(current_price)
-                elif current_price >= order['take_profit']:
-                    logger.info(f"Take profit triggered for order {order['order_id']}")
-                    self.sell_order(current_price)
\ No newline at end of file
+        # SELLING keeps manage_orders from sending the sell again while this one is in flight
+        order['status'] = 'SELLING'
+        order['sell_price'] = current_price
+        try:
+            self.executor.submit({
+                'symbol': order['symbol'],
+                'side': SIDE_SELL,
+                'type': ORDER_TYPE_MARKET,
+                'quantity': order['quantity'],
+                'newClientOrderId': f"{order['order_id']}_SELL"
+            }, callback=lambda future: self._sell_done(order, current_price, future))
+        except OrderQueueFull as e:
+            logger.error("Error executing sell order: %s", e)
+            order['status'] = 'NEW'
+            self.positions.arm(order)
+
+    def _sell_done(self, order, current_price, future):
+        error = future.exception()
+        if error is not None or future.result() is None:
+            # back to NEW so the next candle tries to sell again
+            logger.error("Error executing sell order: %s", error)
+            order['status'] = 'NEW'
+            self.positions.arm(order)
+            return
+        # Update the status and timestamp of the sold order
+        order['status'] = 'SOLD'
+        order['sell_timestamp'] = int(time.time() * 1000)
+        order['sell_price'] = current_price
+        # Calculate the profit or loss
+        profit_loss = (current_price - order['entry_price']) * order['quantity']
+        order['profit_loss'] = profit_loss
+        # Label the order as 'GAIN' or 'LOSS'
+        if profit_loss > 0:
+            order['outcome'] = 'GAIN'
+        else:
+            order['outcome'] = 'LOSS'
+        logger.info('Sell order placed: %s', order)
+        # Hand the order to the background writer, the file write happens off this thread
+        if self.writer is not None:
+            self.writer.write_order(order)
+        self.positions.remove(order['order_id'])
+
+    def restore_orders(self, orders):
+        """
+        Take back the open orders of a snapshot (Bot warm start). Orders that were still in
+        flight are sent again with the same client order id, which the executor resolves to
+        the original order if the exchange already has it.
+        """
+        for order in orders:
+            self.positions.add(order)
+            if order['status'] == 'PENDING':
+                self._submit_buy(order)
+            elif order['status'] == 'SELLING':
+                self.sell_order(order['sell_price'], order)
+            else:
+                self.positions.arm(order)
+        if orders:
+            logger.info("Restored %d open order(s)", len(orders))
+
+    # sells every open order whose stop loss or take profit the price reached
+    def manage_orders(self, current_price, symbol=None, low=None, high=None):
+        """
+        Per tick, pass the price; for a whole candle also pass its low and high so levels
+        crossed inside the bar are caught too. Without a symbol every symbol is checked.
+        """
+        low = current_price if low is None else low
+        high = current_price if high is None else high
+        symbols = [symbol] if symbol is not None else {order['symbol'] for order in self.positions.open_orders()}
+        for symbol in symbols:
+            for order, reason in self.positions.triggered(symbol, low, high):
+                logger.info("%s triggered for order %s", 'Stop loss' if reason == 'stop_loss' else 'Take profit', order['order_id'])
+                self.sell_order(current_price, order)
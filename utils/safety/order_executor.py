@@ -0,0 +1,232 @@
+import copy
+import logging
+import os
+import queue
+import sys
+import threading
+import time
+from concurrent.futures import Future
+
+logger = logging.getLogger(__name__)
+
+client = None
+
+
+def binance_client(api_key=None, api_secret=None):
+    # binance is imported here, on first use: it costs most of a second and nothing offline needs it
+    from binance.client import Client
+    return Client(api_key=api_key, api_secret=api_secret, tld='us')
+
+
+def get_client():
+    # the shared client is built on first use so importing this module stays offline
+    global client
+    if client is None:
+        client = binance_client(os.getenv('BINANCE_API_KEY'), os.getenv('BINANCE_API_SECRET'))
+    return client
+
+
+def thread_safe(client):
+    """
+    `client` for use from several threads: a binance Client (anything holding a requests
+    session) is wrapped in a ThreadLocalClient, in-process clients are returned as they are.
+    """
+    if isinstance(client, ThreadLocalClient):
+        return client
+    requests = sys.modules.get('requests')  # a client with a requests session has loaded it
+    if requests is not None and isinstance(getattr(client, 'session', None), requests.Session):
+        return ThreadLocalClient(client)
+    return client
+
+
+class ThreadLocalClient:
+    """
+One binance Client per thread behind a single object.
+
+python-binance's Client keeps the reply of every request on self.response
+before parsing it, so threads sharing one can get each other's answers.
+Every attribute is looked up on this thread's copy of `client`, made on its
+first use with a requests session (and so a keep-alive connection) of its own.
+
+    client = thread_safe(binance_client(api_key, api_secret))
+    client.get_klines(symbol='BTCUSDT', interval='15m')   # from any thread
+"""
+    def __init__(self, client):
+        self.client = client
+        self._local = threading.local()
+
+    def __getattr__(self, name):
+        if name == '_local':
+            raise AttributeError(name)  # not set up yet, e.g. while copying
+        return getattr(self._thread_client(), name)
+
+    def _thread_client(self):
+        client = getattr(self._local, 'client', None)
+        if client is None:
+            client = self._local.client = copy.copy(self.client)
+            client.session = client._init_session()
+        return client
+
+
+# binance codes for "timed out, status unknown" and rate limiting, the order may or may not exist
+_RETRY_CODES = {-1001, -1003, -1007}
+_DUPLICATE_CODE = -2010
+
+
+class OrderQueueFull(Exception):
+    pass
+
+
+class OrderExecutor:
+    """
+Sends orders to the exchange off the caller's thread.
+
+submit() puts the order on a bounded queue and returns a Future straight
+away; `max_workers` threads send them, each over its own copy of a binance
+client (see ThreadLocalClient) and so its own keep-alive connection. When the
+queue is full submit() raises OrderQueueFull rather than blocking the caller.
+
+Every order must carry a newClientOrderId. Transient failures (network
+errors, 5xx, binance's "status unknown" codes) are retried with the same id,
+so the exchange rejects a resend of an order that already went through; for
+real orders the executor then looks the order up instead of placing it twice.
+Orders are tracked in `in_flight` until they complete, and a second submit of
+an id that is still in flight returns the first Future.
+
+max_workers=0 sends on the caller's thread, which keeps backtests and parity
+checks deterministic.
+
+    executor = OrderExecutor(client, max_workers=4)
+    future = executor.submit({'symbol': 'BTCUSDT', 'side': 'BUY', 'type': 'MARKET',
+                              'quantity': 0.01, 'newClientOrderId': order_id}, callback=on_done)
+"""
+    def __init__(self, client=None, max_workers=4, max_pending=256, max_retries=3, retry_delay=0.5, method='create_test_order'):
+        self.client = thread_safe(client)  # None uses the shared binance client, created on first send
+        self.max_workers = max_workers
+        self.max_retries = max_retries
+        self.retry_delay = retry_delay
+        self.method = method
+        self.in_flight = {}  # newClientOrderId -> Future
+        self._queue = queue.Queue(maxsize=max_pending)
+        self._threads = []
+        self._lock = threading.Lock()
+
+    def submit(self, params, callback=None):
+        order_id = params['newClientOrderId']
+        with self._lock:
+            future = self.in_flight.get(order_id)
+            if future is not None:
+                return future
+            future = Future()
+            self.in_flight[order_id] = future
+
+        if self.max_workers == 0:
+            self._run(params, future)
+        else:
+            if not self._threads:
+                self._start()
+            try:
+                self._queue.put_nowait((params, future))
+            except queue.Full:
+                self.in_flight.pop(order_id, None)
+                raise OrderQueueFull(f"{self._queue.maxsize} orders already queued, dropping {order_id}")
+        # callbacks added after the order completed run straight away on this thread
+        future.add_done_callback(lambda f: self.in_flight.pop(order_id, None))
+        if callback is not None:
+            future.add_done_callback(callback)
+        return future
+
+    def wait(self):
+        # block until every queued order has completed
+        self._queue.join()
+
+    def close(self):
+        threads, self._threads = self._threads, []
+        for _ in threads:
+            self._queue.put(None)
+        for thread in threads:
+            thread.join()
+
+    def _start(self):
+        with self._lock:
+            if self._threads:
+                return
+            self._threads = [threading.Thread(target=self._work, name=f'order-{i}', daemon=True)
+                             for i in range(self.max_workers)]
+            for thread in self._threads:
+                thread.start()
+
+    def _work(self):
+        while True:
+            item = self._queue.get()
+            try:
+                if item is None:
+                    return
+                self._run(*item)
+            finally:
+                self._queue.task_done()
+
+    def _run(self, params, future):
+        if not future.set_running_or_notify_cancel():
+            return
+        try:
+            result = self._send(params)
+        except Exception as e:
+            future.set_exception(e)
+        else:
+            future.set_result(result)
+
+    def _send(self, params):
+        client = self._client()
+        for attempt in range(self.max_retries + 1):
+            try:
+                return getattr(client, self.method)(**params)
+            except Exception as e:
+                failure = _classify(e)
+                if failure == 'duplicate':
+                    # an earlier attempt made it to the exchange
+                    return self._lookup(client, params)
+                if failure != 'retry' or attempt == self.max_retries:
+                    raise
+                error = e
+            logger.warning("Order %s attempt %d failed (%s), retrying", params['newClientOrderId'], attempt + 1, error)
+            if self.method == 'create_order':
+                placed = self._lookup(client, params, missing_ok=True)
+                if placed is not None:
+                    return placed
+            time.sleep(self.retry_delay * 2 ** attempt)
+
+    def _lookup(self, client, params, missing_ok=False):
+        if self.method != 'create_order':
+            return {}  # test orders are never stored, a duplicate means it was accepted
+        try:
+            return client.get_order(symbol=params['symbol'], origClientOrderId=params['newClientOrderId'])
+        except Exception:
+            # while retrying, an order that can't be found (or looked up) is simply sent again
+            if missing_ok:
+                return None
+            raise
+
+    def _client(self):
+        if self.client is None:
+            with self._lock:
+                if self.client is None:
+                    self.client = thread_safe(get_client())
+        return self.client
+
+
+def _classify(error):
+    # 'duplicate', 'retry' or None. binance and requests are only looked at if something loaded
+    # them, a client that never imported them (FakeClient, PaperClient) can't raise their errors
+    binance = sys.modules.get('binance.exceptions')
+    if binance is not None:
+        if isinstance(error, binance.BinanceAPIException):
+            if error.code == _DUPLICATE_CODE and 'duplicate' in str(error.message).lower():
+                return 'duplicate'
+            return 'retry' if error.status_code >= 500 or error.code in _RETRY_CODES else None
+        if isinstance(error, binance.BinanceRequestException):
+            return 'retry'
+    requests = sys.modules.get('requests')
+    if requests is not None and isinstance(error, (requests.ConnectionError, requests.Timeout)):
+        return 'retry'
+    return None
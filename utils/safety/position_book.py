@@ -0,0 +1,110 @@
+import heapq
+import threading
+
+
+class PositionBook:
+    """
+Open positions of every symbol, with stop-loss and take-profit levels indexed
+for fast trigger checks.
+
+Per symbol, stops sit in a max-heap (the highest stop is the first a falling
+price reaches) and take-profits in a min-heap, so triggered() only pops the
+levels that were actually crossed: O(log n) per triggered order instead of a
+scan over every position. Levels of orders that were closed or re-armed are
+dropped lazily when they surface.
+
+An order is stored with add() as soon as it is sent, and only gets its levels
+indexed by arm() once the buy went through (status 'NEW'). triggered() hands
+back each crossed order once; arm() it again if the sell fails.
+
+    book = PositionBook()
+    book.add(order); book.arm(order)
+    for order, reason in book.triggered('BTCUSDT', low, high):   # or triggered(symbol, price)
+        ...
+"""
+    def __init__(self):
+        self.orders = {}  # order_id -> order dict
+        self._symbols = {}  # symbol -> order ids
+        self._stops = {}  # symbol -> heap of (-stop_loss, order_id)
+        self._takes = {}  # symbol -> heap of (take_profit, order_id)
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.orders)
+
+    def __contains__(self, order_id):
+        return order_id in self.orders
+
+    def open_orders(self, symbol=None):
+        with self._lock:
+            if symbol is None:
+                return list(self.orders.values())
+            return [self.orders[order_id] for order_id in self._symbols.get(symbol, ())]
+
+    def levels(self):
+        # (symbol, quantity, entry price, stop loss) of every open order, read under the lock
+        with self._lock:
+            return [(order['symbol'], order['quantity'], order['entry_price'], order['stop_loss'])
+                    for order in self.orders.values()]
+
+    def count(self, symbol):
+        return len(self._symbols.get(symbol, ()))
+
+    def add(self, order):
+        with self._lock:
+            self.orders[order['order_id']] = order
+            self._symbols.setdefault(order['symbol'], set()).add(order['order_id'])
+
+    def arm(self, order):
+        # index the order's levels, triggered() only reports armed orders with status 'NEW'
+        with self._lock:
+            order_id = order['order_id']
+            heapq.heappush(self._stops.setdefault(order['symbol'], []), (-order['stop_loss'], order_id))
+            heapq.heappush(self._takes.setdefault(order['symbol'], []), (order['take_profit'], order_id))
+
+    def remove(self, order_id):
+        with self._lock:
+            order = self.orders.pop(order_id, None)
+            if order is not None:
+                self._symbols[order['symbol']].discard(order_id)
+                self._compact(order['symbol'])
+            return order
+
+    def triggered(self, symbol, low, high=None):
+        """
+        Orders of `symbol` whose stop loss is at or above `low` or whose take profit is at or
+        below `high`, as (order, 'stop_loss' | 'take_profit') pairs. Pass one price for a tick,
+        or a candle's low and high to catch levels crossed inside the bar. Stop losses win when
+        a bar crosses both levels of an order, like the per-tick check.
+        """
+        if high is None:
+            high = low
+        hits = []
+        with self._lock:
+            seen = set()
+            stops = self._stops.get(symbol)
+            while stops and -stops[0][0] >= low:
+                _, order_id = heapq.heappop(stops)
+                self._collect(order_id, 'stop_loss', seen, hits)
+            takes = self._takes.get(symbol)
+            while takes and takes[0][0] <= high:
+                _, order_id = heapq.heappop(takes)
+                self._collect(order_id, 'take_profit', seen, hits)
+        return hits
+
+    def _collect(self, order_id, reason, seen, hits):
+        order = self.orders.get(order_id)
+        # closed, in flight or already reported by the other level: a stale entry
+        if order is None or order['status'] != 'NEW' or order_id in seen:
+            return
+        seen.add(order_id)
+        hits.append((order, reason))
+
+    def _compact(self, symbol):
+        # drop the levels of closed orders once they make up most of a heap
+        live = len(self._symbols.get(symbol, ()))
+        for heaps in (self._stops, self._takes):
+            heap = heaps.get(symbol)
+            if heap is not None and len(heap) > 2 * live + 64:
+                heap[:] = [entry for entry in heap if entry[1] in self.orders]
+                heapq.heapify(heap)
@@ -0,0 +1,268 @@
+import math
+import threading
+import numpy as np
+from utils.data.intervals import interval_to_ms
+from utils.indicators.atr import ATR
+from utils.safety.order_calculation import TradeConfig
+
+
+class RiskEngine:
+    """
+Portfolio-level position sizing across every traded symbol.
+
+update() takes each closed candle of each symbol. The engine keeps the log
+returns of the last `window` candle periods as a (window, symbols) ring
+matrix together with running sums of the returns and of their cross
+products, so the covariance is always at hand: a new return changes one row
+and one column of the cross products (O(symbols)), a new period clears one
+row of the ring (O(symbols²), once per interval for all symbols). The sums
+are recomputed from the ring every `window` periods so rounding can't build
+up. Stop distances are `atr_multiple` Wilder ATRs of the symbol
+(`stop_loss_percentage` of the price until the ATR has warmed up).
+
+size() sizes a batch of new orders, one per symbol, in one vectorized pass
+against the whole book, i.e. the open orders of every PositionBook passed
+to track(). Each order risks `risk_per_trade` of the capital down to its
+stop (never more than TradeConfig.max_risk_per_trade) and no symbol holds
+more than `max_symbol_exposure` of the capital. The batch is then scaled
+down as a whole until the book stays within `max_gross_exposure` of the
+capital, its stop losses add up to at most `max_portfolio_risk` of it and
+its one-period volatility (from the covariance) to at most `max_volatility`.
+With reserve=True the sized orders count against the limits until they are
+release()d, i.e. once they are in a book, so two bots sizing at the same
+time can't both take the same room.
+
+    risk = RiskEngine('15m', TradeConfig(total_capital=10_000))
+    MultiSymbolBot(symbols, '15m', api_key, api_secret, risk=risk).start()   # or Bot(..., risk=risk)
+    quantities, stops = risk.size(['BTCUSDT', 'ETHUSDT'], [30_000.0, 2_000.0])
+"""
+    def __init__(self, interval, config=None, risk_per_trade=0.01, max_symbol_exposure=0.25, max_gross_exposure=1.0,
+                 max_portfolio_risk=0.06, max_volatility=0.01, window=500, atr_period=14, atr_multiple=2.0,
+                 stop_loss_percentage=0.02, capacity=64):
+        config = config if config is not None else TradeConfig()
+        self.capital = config.total_capital
+        self.risk_per_trade = min(risk_per_trade, config.max_risk_per_trade)
+        self.max_symbol_exposure = max_symbol_exposure
+        self.max_gross_exposure = max_gross_exposure
+        self.max_portfolio_risk = max_portfolio_risk
+        self.max_volatility = max_volatility
+        self.atr_period = atr_period
+        self.atr_multiple = atr_multiple
+        self.stop_loss_percentage = stop_loss_percentage
+        self.interval_ms = interval_to_ms(interval)
+        self.window = window
+        self.symbols = {}  # symbol -> column
+        self.returns = np.zeros((window, capacity))  # row = candle period % window
+        self.sums = np.zeros(capacity)
+        self.cross = np.zeros((capacity, capacity))  # returnsᵀ @ returns
+        self.last_close = np.full(capacity, np.nan)
+        self.last_period = np.full(capacity, -1, dtype=np.int64)
+        self.atr = np.full(capacity, np.nan)
+        self.reserved = np.zeros((2, capacity))  # notional and stop loss of sized orders not booked yet
+        self._atrs = []
+        self.first = None  # oldest and newest candle period in the ring
+        self.period = None
+        self.books = []
+        self._since_resync = 0
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.symbols)
+
+    def track(self, book):
+        # a PositionBook whose open orders count against the limits
+        if book not in self.books:
+            self.books.append(book)
+
+    def update(self, symbol, timestamp, high, low, close):
+        period = int(timestamp) // self.interval_ms
+        with self._lock:
+            col = self._column(symbol)
+            if period <= self.last_period[col]:
+                return  # seen already
+            if self.period is None:
+                self.first = self.period = period
+            elif period > self.period:
+                self._advance(period)
+            elif period <= self.period - self.window:
+                return  # older than the ring
+            self.first = min(self.first, period)
+            self.last_period[col] = period
+            self.atr[col] = self._atrs[col].update(high, low, close)  # NaN until warmed up
+            previous = self.last_close[col]
+            self.last_close[col] = close
+            if previous > 0 and close > 0:
+                self._set(period % self.window, col, math.log(close / previous))
+
+    def seed(self, symbol, klines):
+        # a symbol's history, e.g. what Bot.seed warms its indicators with
+        for timestamp, high, low, close in zip(np.asarray(klines['timestamp']).tolist(), np.asarray(klines['high']).tolist(),
+                                               np.asarray(klines['low']).tolist(), np.asarray(klines['close']).tolist()):
+            self.update(symbol, timestamp, high, low, close)
+
+    def covariance(self, symbols=None):
+        """
+        Covariance of the per-period log returns, of every symbol in column order or of
+        `symbols`. Periods a symbol had no candle in count as a zero return.
+        """
+        with self._lock:
+            cov = self._covariance()
+            if symbols is None:
+                return cov
+            cols = [self.symbols[symbol] for symbol in symbols]
+            return cov[np.ix_(cols, cols)]
+
+    def correlation(self, symbols=None):
+        cov = self.covariance(symbols)
+        std = np.sqrt(np.diag(cov))
+        with np.errstate(divide='ignore', invalid='ignore'):
+            return cov / np.outer(std, std)
+
+    def exposure(self):
+        # (notional at the last close, loss down to the stops) held per column by the tracked books and reservations
+        with self._lock:
+            return self._exposure()
+
+    def size(self, symbols, prices, reserve=False):
+        """
+        Quantities and stop-loss prices for buying each of `symbols` at `prices`, as two arrays.
+        A quantity is 0 when a limit leaves no room for the order. With reserve=True the orders
+        hold their room until each is release()d with the quantity and stop it was given.
+        """
+        prices = np.asarray(prices, dtype=np.float64)
+        with self._lock:
+            cols = np.array([self._column(symbol) for symbol in symbols], dtype=np.intp)
+            atr = self.atr[cols]
+            held, at_risk = self._exposure()
+
+            distance = np.minimum(np.where(atr > 0, self.atr_multiple * atr, self.stop_loss_percentage * prices), prices)
+            stops = prices - distance
+            quantities = self.capital * self.risk_per_trade / np.where(distance > 0, distance, np.inf)
+            room = np.maximum(self.max_symbol_exposure * self.capital - held[cols], 0.0)
+            notional = np.minimum(quantities * prices, room)
+            total = notional.sum()
+            if total > 0:
+                scale = min(1.0, max(self.max_gross_exposure * self.capital - held.sum(), 0.0) / total)
+                new_risk = (notional * distance / prices).sum()
+                if new_risk > 0:
+                    scale = min(scale, max(self.max_portfolio_risk * self.capital - at_risk.sum(), 0.0) / new_risk)
+                # only the columns held or bought enter the volatility of the book
+                new_cols, inverse = np.unique(cols, return_inverse=True)
+                new = np.bincount(inverse, weights=notional)
+                held_cols = np.flatnonzero(held)
+                held = held[held_cols]
+                a = self._quadratic(new_cols, new, new_cols, new)
+                b = self._quadratic(held_cols, held, new_cols, new)
+                c = self._quadratic(held_cols, held, held_cols, held)
+                notional = notional * min(scale, self._volatility_scale(a, b, c))
+            if reserve:
+                np.add.at(self.reserved[0], cols, notional)
+                np.add.at(self.reserved[1], cols, notional * distance / prices)
+        return notional / prices, stops
+
+    def release(self, symbol, quantity, price, stop_loss):
+        # a reserved order was booked (or dropped), the books count it from here on
+        with self._lock:
+            col = self.symbols.get(symbol)
+            if col is not None:
+                self.reserved[0, col] = max(self.reserved[0, col] - quantity * price, 0.0)
+                self.reserved[1, col] = max(self.reserved[1, col] - quantity * (price - stop_loss), 0.0)
+
+    def _exposure(self):
+        n = len(self.symbols)
+        held, at_risk = self.reserved[0, :n].copy(), self.reserved[1, :n].copy()
+        for book in self.books:
+            for symbol, quantity, entry_price, stop_loss in book.levels():
+                col = self.symbols.get(symbol)
+                if col is None:
+                    continue
+                price = self.last_close[col]
+                if not price > 0:
+                    price = entry_price
+                held[col] += quantity * price
+                at_risk[col] += quantity * max(price - stop_loss, 0.0)
+        return held, at_risk
+
+    def _quadratic(self, x_cols, x, y_cols, y):
+        # xᵀ Σ y for vectors over the columns x_cols and y_cols, straight from the running sums
+        periods = self.period - self.first + 1 if self.period is not None else 0
+        if periods < 2 or len(x_cols) == 0 or len(y_cols) == 0:
+            return 0.0
+        cross = x @ self.cross[np.ix_(x_cols, y_cols)] @ y
+        return (cross - (self.sums[x_cols] @ x) * (self.sums[y_cols] @ y) / periods) / (periods - 1)
+
+    def _volatility_scale(self, a, b, c):
+        # largest s in [0, 1] with a·s² + 2b·s + c <= limit², i.e. (held + s·new)ᵀ Σ (held + s·new) within the limit
+        limit = (self.max_volatility * self.capital) ** 2
+        if a + 2 * b + c <= limit:
+            return 1.0
+        if a <= 0:
+            return 0.0
+        discriminant = b * b - a * (c - limit)
+        if discriminant < 0:
+            return 0.0
+        return min(max((-b + math.sqrt(discriminant)) / a, 0.0), 1.0)
+
+    def _column(self, symbol):
+        col = self.symbols.get(symbol)
+        if col is None:
+            col = self.symbols[symbol] = len(self.symbols)
+            if col == len(self.sums):
+                self._grow(2 * col)
+            self._atrs.append(ATR(self.atr_period))
+        return col
+
+    def _grow(self, capacity):
+        n = len(self.sums)
+        returns, cross = np.zeros((self.window, capacity)), np.zeros((capacity, capacity))
+        returns[:, :n], cross[:n, :n] = self.returns, self.cross
+        self.returns, self.cross = returns, cross
+        self.sums = np.concatenate((self.sums, np.zeros(capacity - n)))
+        self.last_close = np.concatenate((self.last_close, np.full(capacity - n, np.nan)))
+        self.last_period = np.concatenate((self.last_period, np.full(capacity - n, -1, dtype=np.int64)))
+        self.atr = np.concatenate((self.atr, np.full(capacity - n, np.nan)))
+        self.reserved = np.concatenate((self.reserved, np.zeros((2, capacity - n))), axis=1)
+
+    def _advance(self, period):
+        # clear the rows the new periods take over
+        n = len(self.symbols)
+        gap = period - self.period
+        for p in range(period - min(gap, self.window) + 1, period + 1):
+            row = self.returns[p % self.window, :n]
+            self.cross[:n, :n] -= np.outer(row, row)
+            self.sums[:n] -= row
+            row[:] = 0
+        self.period = period
+        self.first = max(self.first, period - self.window + 1)
+        self._since_resync += gap
+        if self._since_resync >= self.window:
+            self._resync()
+
+    def _set(self, row, col, value):
+        # returns[row, col] = value, keeping sums and cross products in step
+        n = len(self.symbols)
+        returns = self.returns[row, :n]
+        delta = value - returns[col]
+        if delta == 0:
+            return
+        change = delta * returns
+        self.cross[col, :n] += change
+        self.cross[:n, col] += change
+        self.cross[col, col] += delta * delta
+        self.sums[col] += delta
+        returns[col] = value
+
+    def _resync(self):
+        n = len(self.symbols)
+        returns = self.returns[:, :n]
+        self.cross[:n, :n] = returns.T @ returns
+        self.sums[:n] = returns.sum(axis=0)
+        self._since_resync = 0
+
+    def _covariance(self):
+        n = len(self.symbols)
+        periods = self.period - self.first + 1 if self.period is not None else 0
+        if periods < 2:
+            return np.zeros((n, n))
+        mean = self.sums[:n] / periods
+        return (self.cross[:n, :n] - periods * np.outer(mean, mean)) / (periods - 1)
@@ -0,0 +1,410 @@
+import math
+import numpy as np
+from utils.indicators.bollinger_bands import BollingerBands, bollinger_bands_batch, bandwidth_roc_batch
+from utils.indicators.patterns import PATTERNS, PatternScanner, scan_patterns
+from utils.indicators.rsi import WilderRSI, wilder_rsi_batch
+from utils.data.timeframes import RollUp
+from utils.signals.trigger import Triggers
+
+SOURCES = ('open', 'high', 'low', 'close', 'volume')
+
+
+class Node:
+    """
+A declared indicator: a kind, the nodes it reads and its parameters.
+
+Nodes are compared by that key, so two strategies that both ask for
+rsi(source('close'), period=14) get the same node and it is computed once.
+Build them with the helpers below rather than directly. A node lives on the
+timeframe of its sources: None for the graph's base interval, or a higher
+interval such as '1h' that the graph rolls up from the base candles.
+"""
+    __slots__ = ('kind', 'inputs', 'params', 'key', 'timeframe')
+
+    def __init__(self, kind, inputs=(), **params):
+        self.kind = kind
+        self.inputs = tuple(inputs)
+        self.params = params
+        self.key = (kind, tuple(node.key for node in self.inputs), tuple(sorted(params.items())))
+        if kind == 'source':
+            self.timeframe = params.get('timeframe')
+        else:
+            timeframes = {node.timeframe for node in self.inputs}
+            if len(timeframes) > 1:
+                raise ValueError(f"{kind} reads nodes of different timeframes: {sorted(timeframes, key=str)}")
+            self.timeframe = timeframes.pop() if timeframes else None
+
+    def __eq__(self, other):
+        return isinstance(other, Node) and self.key == other.key
+
+    def __hash__(self):
+        return hash(self.key)
+
+    def __repr__(self):
+        params = ', '.join(f'{name}={value}' for name, value in sorted(self.params.items()))
+        inputs = ', '.join(repr(node) for node in self.inputs)
+        return f"{self.kind}({', '.join(filter(None, (inputs, params)))})"
+
+
+def source(name, timeframe=None):
+    # a candle column, of the base interval or of a higher `timeframe` ('1h', '4h', ...)
+    if name not in SOURCES:
+        raise ValueError(f"Unknown source {name!r}, expected one of {SOURCES}")
+    if timeframe is None:
+        return Node('source', name=name)
+    return Node('source', name=name, timeframe=timeframe)
+
+
+def rsi(price, period=14):
+    return Node('rsi', (price,), period=period)
+
+
+def bollinger(price, window=20, num_of_std=2):
+    return Node('bollinger', (price,), window=window, num_of_std=num_of_std)
+
+
+def band(bands, which):
+    # one line of a bollinger() node: 'upper', 'middle', 'lower' or 'band_width'
+    return Node('band', (bands,), which=which)
+
+
+def bandwidth_roc(bands, rolling_window=5, period=2):
+    return Node('bandwidth_roc', (bands,), rolling_window=rolling_window, period=period)
+
+
+def pattern(name, timeframe=None):
+    if name not in PATTERNS:
+        raise ValueError(f"Unknown pattern {name!r}")
+    return Node('pattern', tuple(source(column, timeframe) for column in ('open', 'high', 'low', 'close')), name=name)
+
+
+# How each kind is computed. update() takes the current values of the inputs and returns the
+# node's value for this candle, batch() the same over whole arrays, seed() is batch() that also
+# leaves the streaming state as if update() had run over the arrays. Intermediate values may
+# differ between modes (a bollinger node streams its BollingerBands, batches a dict of arrays),
+# only what band() and bandwidth_roc() make of them has to agree.
+
+class _Rsi:
+    def __init__(self, period):
+        self.period = period
+        self.rsi = WilderRSI(period=period)
+
+    def update(self, price):
+        return self.rsi.update(price)
+
+    def batch(self, prices):
+        return wilder_rsi_batch(prices, self.period)
+
+    def seed(self, prices):
+        return self.rsi.seed(prices)
+
+
+class _Bollinger:
+    def __init__(self, window, num_of_std):
+        self.window = window
+        self.num_of_std = num_of_std
+        self.bands = BollingerBands(window=window, num_of_std=num_of_std)
+
+    def update(self, price):
+        self.bands.update(price)
+        return self.bands
+
+    def batch(self, prices):
+        return dict(zip(('upper', 'middle', 'lower', 'band_width'), bollinger_bands_batch(prices, self.window, self.num_of_std)))
+
+    def seed(self, prices):
+        upper, middle, lower = self.bands.seed(prices)
+        return {'upper': upper, 'middle': middle, 'lower': lower, 'band_width': upper - lower}
+
+
+class _Band:
+    _rings = {'upper': 'upper_band', 'middle': 'middle_band', 'lower': 'lower_band', 'band_width': 'band_width'}
+
+    def __init__(self, which):
+        self.ring = self._rings[which]
+        self.which = which
+
+    def update(self, bands):
+        # the rings only grow once the window is full, and then on every update
+        ring = getattr(bands, self.ring)
+        return ring[-1] if len(ring) else math.nan
+
+    def batch(self, bands):
+        return bands[self.which]
+
+    seed = batch
+
+
+class _BandwidthRoc:
+    def __init__(self, rolling_window, period):
+        self.rolling_window = rolling_window
+        self.period = period
+
+    def update(self, bands):
+        roc = bands.calculate_bandwidth_roc(self.rolling_window, self.period)
+        return math.nan if roc is None else roc
+
+    def batch(self, bands):
+        return bandwidth_roc_batch(bands['band_width'], self.rolling_window, self.period)
+
+    seed = batch
+
+
+class _Pattern:
+    def __init__(self, name):
+        self.name = name
+        self.scanner = PatternScanner([name])
+
+    def update(self, open_price, high, low, close):
+        return self.scanner.update(open_price, high, low, close)[self.name]
+
+    def batch(self, open_prices, highs, lows, closes):
+        return scan_patterns(open_prices, highs, lows, closes, [self.name])[self.name]
+
+    def seed(self, open_prices, highs, lows, closes):
+        lookback = PATTERNS[self.name][1]
+        for values in zip(*(np.asarray(column)[-lookback:].tolist() for column in (open_prices, highs, lows, closes))):
+            self.scanner.update(*values)
+        return self.batch(open_prices, highs, lows, closes)
+
+
+NODE_TYPES = {
+    'rsi': _Rsi,
+    'bollinger': _Bollinger,
+    'band': _Band,
+    'bandwidth_roc': _BandwidthRoc,
+    'pattern': _Pattern,
+}
+
+
+class Strategy:
+    """
+Base class for strategies run by a StrategyGraph.
+
+inputs() declares the nodes the strategy reads, by local name. update()
+gets their values for the current candle and returns True on a signal;
+batch() gets whole arrays and returns the indices of the signal candles.
+"""
+    name = 'strategy'
+
+    def inputs(self):
+        return {}
+
+    def update(self, values):
+        return False
+
+    def batch(self, arrays):
+        return np.array([], dtype=np.int64)
+
+
+class RsiBbExpansion(Strategy):
+    """
+Triggers.rsi_and_bb_expansion_strategy as a graph strategy: close below the
+lower band with RSI oversold arms it, RSI back in the re-entry range with
+expanding bands and a bullish engulfing candle fires it. With a
+`confirm_timeframe` it only fires while the RSI of that timeframe's last
+closed candle is at least `confirm_rsi`.
+"""
+    def __init__(self, name='rsi_bb_expansion', rsi_period=14, bb_window=20, num_of_std=2, rsi_oversold=25,
+                 rsi_reentry_low=30, rsi_reentry_high=35, bandwidth_roc_threshold=0.15, confirm_timeframe=None, confirm_rsi=50):
+        self.name = name
+        self.rsi_period = rsi_period
+        self.bb_window = bb_window
+        self.num_of_std = num_of_std
+        self.confirm_timeframe = confirm_timeframe
+        self.confirm_rsi = confirm_rsi
+        self.triggers = Triggers(rsi_oversold, rsi_reentry_low, rsi_reentry_high, bandwidth_roc_threshold)
+
+    def inputs(self):
+        close = source('close')
+        bands = bollinger(close, self.bb_window, self.num_of_std)
+        inputs = {
+            'open': source('open'),
+            'close': close,
+            'lower': band(bands, 'lower'),
+            'rsi': rsi(close, self.rsi_period),
+            'roc': bandwidth_roc(bands),
+            'engulfing': pattern('bullish_engulfing'),
+        }
+        if self.confirm_timeframe is not None:
+            inputs['confirm'] = rsi(source('close', self.confirm_timeframe), self.rsi_period)
+        return inputs
+
+    def update(self, values):
+        confirmed = self.confirm_timeframe is None or values['confirm'] >= self.confirm_rsi
+        return self.triggers.rsi_and_bb_expansion_step(
+            values['close'], values['lower'], values['rsi'], values['roc'], values['engulfing'], confirmed)
+
+    def batch(self, arrays):
+        confirmed = None
+        if self.confirm_timeframe is not None:
+            with np.errstate(invalid='ignore'):
+                confirmed = arrays['confirm'] >= self.confirm_rsi
+        return self.triggers.rsi_and_bb_expansion_signals(
+            arrays['open'], arrays['close'], arrays['lower'], arrays['rsi'], arrays['roc'], confirmed)
+
+
+class StrategyGraph:
+    """
+Runs many strategies over one deduplicated indicator graph.
+
+Every strategy declares its input nodes; the graph adds them and everything
+they depend on, keeping one instance per distinct node, in dependency order.
+update() takes one candle (any subset of SOURCES) and recomputes only the
+nodes downstream of the sources it was given; evaluate() then runs the
+strategies on the fresh values. batch() / signals() run the same graph over
+whole arrays, and seed() warms the streaming state from history.
+
+Nodes on a higher timeframe (source('close', '1h') and what reads it) need
+the graph's `base_interval`: update() rolls every base candle into one
+RollUp per timeframe and only when a higher candle closes are that
+timeframe's nodes updated, from their own state. Strategies read a higher
+timeframe node as of its last closed candle; in batch() its arrays are
+spread over the base candles the same way.
+
+    graph = StrategyGraph([RsiBbExpansion(), RsiBbExpansion('tight', rsi_oversold=20)])
+    graph.update({'open': o, 'high': h, 'low': l, 'close': c, 'volume': v})
+    fired = graph.evaluate()          # names of the strategies that signalled
+    signals = graph.signals(klines)   # {name: indices} over a whole history
+
+    graph = StrategyGraph([RsiBbExpansion(confirm_timeframe='4h')], base_interval='15m')
+    graph.update({'time': t, 'open': o, ...})   # base candles need their open time
+"""
+    def __init__(self, strategies=(), outputs=(), base_interval=None):
+        self.base_interval = base_interval
+        self.rollups = {}  # timeframe -> RollUp from the base candles
+        self.nodes = []  # dependency order
+        self._index = {}  # key -> position in self.nodes
+        self._state = []  # node type instance per node, None for sources
+        self._inputs = []  # positions of each node's inputs
+        self._values = []
+        self.strategies = []
+        self._strategy_inputs = []  # (strategy, [(local name, node position)])
+        for strategy in strategies:
+            self.add_strategy(strategy)
+        for node in outputs:
+            self.add(node)
+
+    def __len__(self):
+        return len(self.nodes)
+
+    def add(self, node):
+        # register node and its inputs, returns its position; a node seen before is reused
+        position = self._index.get(node.key)
+        if position is not None:
+            return position
+        for input_node in node.inputs:
+            self.add(input_node)
+        if node.timeframe is not None and node.timeframe not in self.rollups:
+            if self.base_interval is None:
+                raise ValueError(f"{node!r} is on the {node.timeframe} timeframe, the graph needs a base_interval")
+            self.rollups[node.timeframe] = RollUp(node.timeframe, self.base_interval)
+        position = len(self.nodes)
+        self.nodes.append(node)
+        self._index[node.key] = position
+        self._state.append(None if node.kind == 'source' else NODE_TYPES[node.kind](**node.params))
+        self._inputs.append([self._index[input_node.key] for input_node in node.inputs])
+        self._values.append(math.nan)
+        return position
+
+    def add_strategy(self, strategy):
+        if any(existing.name == strategy.name for existing in self.strategies):
+            raise ValueError(f"Strategy name {strategy.name!r} is already used")
+        inputs = [(name, self.add(node)) for name, node in strategy.inputs().items()]
+        self.strategies.append(strategy)
+        self._strategy_inputs.append((strategy, inputs))
+        return strategy
+
+    def value(self, node):
+        return self._values[self._index[node.key]]
+
+    def indicator(self, node):
+        # the node's streaming state, e.g. indicator(rsi(close)).rsi is the live RSI object
+        return self._state[self._index[node.key]]
+
+    def history(self, candles):
+        # base candles to fetch so every timeframe gets about `candles` candles of warm-up
+        return candles * max((rollup.ratio for rollup in self.rollups.values()), default=1)
+
+    def update(self, candle):
+        changed = self._update(candle, None)
+        for timeframe, rollup in self.rollups.items():
+            for bar in rollup.add(candle):
+                changed |= self._update(bar, timeframe)
+        return changed
+
+    def _update(self, candle, timeframe):
+        changed = set()
+        for position, (node, state, inputs) in enumerate(zip(self.nodes, self._state, self._inputs)):
+            if state is None:
+                if node.timeframe == timeframe and node.params['name'] in candle:
+                    self._values[position] = candle[node.params['name']]
+                    changed.add(position)
+                continue
+            if changed.isdisjoint(inputs):
+                continue  # nothing it reads moved, keep the value
+            self._values[position] = state.update(*(self._values[i] for i in inputs))
+            changed.add(position)
+        return changed
+
+    def evaluate(self):
+        fired = []
+        for strategy, inputs in self._strategy_inputs:
+            if strategy.update({name: self._values[position] for name, position in inputs}):
+                fired.append(strategy.name)
+        return fired
+
+    def batch(self, columns):
+        # every node over whole arrays with fresh state, {node: array}; the streaming state is untouched
+        states = [None if node.kind == 'source' else NODE_TYPES[node.kind](**node.params) for node in self.nodes]
+        rollups = {timeframe: RollUp(timeframe, self.base_interval) for timeframe in self.rollups}
+        return self._run_batch(columns, states, rollups, 'batch')[0]
+
+    def seed(self, columns):
+        # like batch() but on the graph's own state, so update() carries on from the last row
+        arrays, own = self._run_batch(columns, self._state, self.rollups, 'seed')
+        for position, node in enumerate(self.nodes):
+            values = own[node]
+            if not isinstance(values, dict) and len(values):
+                self._values[position] = values[-1]
+        # bollinger nodes stream their BollingerBands, not the dict of arrays
+        for position, node in enumerate(self.nodes):
+            if node.kind == 'bollinger':
+                self._values[position] = self._state[position].bands
+        return arrays
+
+    def signals(self, columns, arrays=None):
+        # {strategy name: indices of the signal candles} over whole arrays
+        arrays = self.batch(columns) if arrays is None else arrays
+        return {strategy.name: strategy.batch({name: arrays[self.nodes[position]] for name, position in inputs})
+                for strategy, inputs in self._strategy_inputs}
+
+    def _run_batch(self, columns, states, rollups, method):
+        # returns ({node: array per base candle}, {node: array per candle of its own timeframe})
+        candles = {None: columns}
+        for timeframe, rollup in rollups.items():
+            candles[timeframe] = rollup.seed(columns)
+        own = {}
+        for node, state in zip(self.nodes, states):
+            if state is None:
+                own[node] = np.asarray(candles[node.timeframe][node.params['name']], dtype=np.float64)
+            else:
+                own[node] = getattr(state, method)(*(own[input_node] for input_node in node.inputs))
+        if not rollups:
+            return own, own
+        # a higher timeframe value holds from the base candle its candle closed on until the next one closes
+        count = len(columns['timestamp'])
+        latest = {timeframe: np.searchsorted(bars['available'], np.arange(count), side='right') - 1
+                  for timeframe, bars in candles.items() if timeframe is not None}
+        arrays = {node: values if node.timeframe is None else _spread(values, latest[node.timeframe])
+                  for node, values in own.items()}
+        return arrays, own
+
+
+def _spread(values, latest):
+    if isinstance(values, dict):
+        return {name: _spread(column, latest) for name, column in values.items()}
+    values = np.asarray(values, dtype=np.float64)
+    spread = values[np.maximum(latest, 0)] if len(values) else np.full(len(latest), np.nan)
+    spread[latest < 0] = np.nan
+    return spread
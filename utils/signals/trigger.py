@@ -1,53 +1,103 @@
-from utils.indicators.bollinger_bands import BollingerBands
-from utils.indicators.rsi import RSI
 import logging
-import pandas as pd
+import numpy as np
+from utils.indicators.patterns import match_last, scan_patterns
 
-logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
 class Triggers:
-    def __init__(self):
+    def __init__(self, rsi_oversold=25, rsi_reentry_low=30, rsi_reentry_high=35, bandwidth_roc_threshold=0.15):
         self.stage_one_triggered = False
+        # stage one: close below the lower band with RSI at or below rsi_oversold
+        # stage two: RSI back in [rsi_reentry_low, rsi_reentry_high) with the bands expanding
+        self.rsi_oversold = rsi_oversold
+        self.rsi_reentry_low = rsi_reentry_low
+        self.rsi_reentry_high = rsi_reentry_high
+        self.bandwidth_roc_threshold = bandwidth_roc_threshold
 
     def is_bullish_engulfing(self, price_data):
-        if len(self.price_data) < 2:
-            return False
-        current_candle_open = self.price_data['open'].iloc[-1]
-        current_candle_close = self.price_data['close'].iloc[-1]
-        previous_candle_open = self.price_data['open'].iloc[-2]
-        previous_candle_close = self.price_data['close'].iloc[-2]
-        if current_candle_close > previous_candle_open and current_candle_open < previous_candle_close:
-            return True
-        else:
-            return False
+        # price_data is the bot's KlineWindow, only its last two candles are read
+        return match_last(price_data, 'bullish_engulfing')
 
     def rsi_and_bb_expansion_strategy(self, price_data, lower_band, rsi_value, bandwidth_roc):
+        return self.rsi_and_bb_expansion_step(price_data['close'][-1], lower_band, rsi_value, bandwidth_roc,
+                                              self.is_bullish_engulfing(price_data))
+
+    def rsi_and_bb_expansion_step(self, current_price, lower_band, rsi_value, bandwidth_roc, bullish_engulfing, confirmed=True):
+        # one candle of the strategy on plain values, NaN / None indicators never trigger;
+        # `confirmed` is an extra condition to fire, e.g. a higher timeframe agreeing
         if not self.stage_one_triggered:
-            current_price = price_data['close'].iloc[-1]
-            if current_price < lower_band and rsi_value <= 25:
+            if current_price < lower_band and rsi_value <= self.rsi_oversold:
                 self.stage_one_triggered = True
-                logger.info(f"Stage 1 triggered: Price ({current_price}) below lower band ({lower_band}) and RSI ({rsi_value}) oversold")
+                logger.info("Stage 1 triggered: Price (%s) below lower band (%s) and RSI (%s) oversold", current_price, lower_band, rsi_value)
             else:
-                logger.debug(f"Stage 1 not triggered: Price ({current_price}) above lower band ({lower_band}) or RSI ({rsi_value}) not oversold")
+                logger.debug("Stage 1 not triggered: Price (%s) above lower band (%s) or RSI (%s) not oversold", current_price, lower_band, rsi_value)
             return False
 
         if self.stage_one_triggered:
-            if 30 <= rsi_value < 35:
-                if bandwidth_roc is not None and bandwidth_roc > 0.15:
-                    logger.info(f"Bollinger Bands expanding: Bandwidth ROC ({bandwidth_roc}) above threshold (0.15)")
-                    if self.is_bullish_engulfing(price_data):
+            if self.rsi_reentry_low <= rsi_value < self.rsi_reentry_high:
+                if bandwidth_roc is not None and bandwidth_roc > self.bandwidth_roc_threshold:
+                    logger.info("Bollinger Bands expanding: Bandwidth ROC (%s) above threshold (%s)", bandwidth_roc, self.bandwidth_roc_threshold)
+                    if bullish_engulfing and confirmed:
                         logger.info("Bullish engulfing pattern detected")
                         self.stage_one_triggered = False
                         logger.info("RSI and Bollinger Bands expansion strategy triggered")
                         return True
-                    else:
+                    elif not bullish_engulfing:
                         logger.debug("Bullish engulfing pattern not detected")
+                    else:
+                        logger.debug("Signal not confirmed")
                 else:
-                    logger.debug(f"Bollinger Bands not expanding: Bandwidth ROC ({bandwidth_roc}) below threshold (0.15)")
+                    logger.debug("Bollinger Bands not expanding: Bandwidth ROC (%s) below threshold (%s)", bandwidth_roc, self.bandwidth_roc_threshold)
             else:
-                logger.debug(f"RSI ({rsi_value}) not in the normal range (30-35)")
+                logger.debug("RSI (%s) not in the normal range (%s-%s)", rsi_value, self.rsi_reentry_low, self.rsi_reentry_high)
         return False
     
+    def rsi_and_bb_expansion_signals(self, open_prices, close_prices, lower_band, rsi_values, bandwidth_roc, confirmed=None):
+        """
+        Batch version of rsi_and_bb_expansion_strategy over whole arrays (one entry per candle,
+        NaN where an indicator isn't available yet, `confirmed` an optional boolean array as in
+        rsi_and_bb_expansion_step). Returns the indices of the candles the
+        per-tick strategy would have returned True on, and leaves stage_one_triggered where
+        the per-tick strategy would have left it after the last candle.
+        """
+        close_prices = np.asarray(close_prices, dtype=np.float64)
+        with np.errstate(invalid='ignore'):
+            stage_one = (close_prices < lower_band) & (rsi_values <= self.rsi_oversold)
+            stage_two = ((rsi_values >= self.rsi_reentry_low) & (rsi_values < self.rsi_reentry_high)
+                         & (bandwidth_roc > self.bandwidth_roc_threshold)
+                         & bullish_engulfing_mask(open_prices, close_prices))
+        if confirmed is not None:
+            stage_two &= np.asarray(confirmed, dtype=bool)
+
+        # the stage flag makes this a two-state machine: find the next arming candle, then the
+        # first stage two candle strictly after it, repeat from the candle after the signal
+        arm_idx = np.flatnonzero(stage_one)
+        fire_idx = np.flatnonzero(stage_two)
+        signals = []
+        start = 0
+        armed = self.stage_one_triggered
+        while True:
+            if not armed:
+                k = np.searchsorted(arm_idx, start)
+                if k == len(arm_idx):
+                    break
+                armed_at = arm_idx[k]
+                armed = True
+                k = np.searchsorted(fire_idx, armed_at, side='right')
+            else:
+                k = np.searchsorted(fire_idx, start)
+            if k == len(fire_idx):
+                break
+            signals.append(fire_idx[k])
+            armed = False
+            start = fire_idx[k] + 1
+        self.stage_one_triggered = armed
+        return np.array(signals, dtype=np.int64)
+
+
+def bullish_engulfing_mask(open_prices, close_prices):
+    # vectorized Triggers.is_bullish_engulfing, mask[i] compares candle i with candle i - 1
+    return scan_patterns(open_prices, None, None, close_prices, ['bullish_engulfing'])['bullish_engulfing']
+
 # dev note: you may need to incorporate some logic to limit the window of time stage two has to trigger, 
             # it is very possible that stage two will trigger even if it shouldn't in this current implementation
\ No newline at end of file